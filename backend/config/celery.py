@@ -0,0 +1,11 @@
+"""Celery application for the ServiceHub project."""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+app = Celery("servicehub")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
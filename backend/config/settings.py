@@ -201,6 +201,7 @@ SIMPLE_JWT = {
     "SIGNING_KEY": SECRET_KEY,
     "AUTH_HEADER_TYPES": ("Bearer",),
     "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER": "servicehub.apps.users.serializers.AuthTokenObtainPairSerializer",
 }
 
 
@@ -209,17 +210,45 @@ CORS_ALLOW_ALL_ORIGINS = env.bool("CORS_ALLOW_ALL_ORIGINS", default=False)
 CORS_ALLOW_CREDENTIALS = True
 
 
+REDIS_URL = env("REDIS_URL")
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": env("REDIS_URL"),
-        "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
-        },
+        "LOCATION": REDIS_URL,
         "KEY_PREFIX": "servicehub",
     }
 }
 
+# Channels groups and messages for the WebSocket consumers (config/asgi.py).
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [REDIS_URL], "capacity": 1500, "expiry": 10},
+    }
+}
+# Frames queued per WebSocket connection; when full, "drop" discards the oldest
+# and "close" disconnects the client.
+WEBSOCKET_SEND_QUEUE_SIZE = env.int("WEBSOCKET_SEND_QUEUE_SIZE", default=100)
+WEBSOCKET_OVERFLOW = env("WEBSOCKET_OVERFLOW", default="drop")
+# Seconds one frame may wait on the server before the connection is closed as stalled.
+WEBSOCKET_SEND_TIMEOUT = env.float("WEBSOCKET_SEND_TIMEOUT", default=10)
+# Quote, client and service order changes announced to the WebSocket groups:
+# "sync" sends on commit from the request; "coalesced" merges changes to the same
+# object within REALTIME_COALESCE_WINDOW seconds in a background thread.
+REALTIME_EVENTS_MODE = env("REALTIME_EVENTS_MODE", default="sync")
+REALTIME_COALESCE_WINDOW = env.float("REALTIME_COALESCE_WINDOW", default=0.2)
+REALTIME_QUEUE_SIZE = env.int("REALTIME_QUEUE_SIZE", default=10000)
+# Notifications kept per user in Redis for reconnecting clients (0 disables
+# sequence numbers and replay) and seconds they outlive the user's last one.
+REALTIME_REPLAY_SIZE = env.int("REALTIME_REPLAY_SIZE", default=0)
+REALTIME_REPLAY_TTL = env.int("REALTIME_REPLAY_TTL", default=86400)
+REALTIME_REPLAY_KEY_PREFIX = "realtime:replay"
+# Seconds a WebSocket connection counts as online after its last heartbeat
+# (clients ping every 25 seconds).
+PRESENCE_TTL = env.int("PRESENCE_TTL", default=60)
+PRESENCE_KEY_PREFIX = "presence"
+
 
 CELERY_BROKER_URL = env("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = env("CELERY_RESULT_BACKEND")
@@ -227,6 +256,70 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "compact-quote-rollups": {
+        "task": "analytics.compact_quote_rollups",
+        "schedule": 60.0,
+    },
+    "compact-quote-series": {
+        "task": "analytics.compact_quote_series",
+        "schedule": 60.0,
+    },
+    "compact-distinct-clients": {
+        "task": "analytics.compact_distinct_clients",
+        "schedule": 60.0,
+    },
+    "materialize-sales-metrics": {
+        "task": "analytics.materialize_sales_metrics",
+        "schedule": 15 * 60.0,
+    },
+    "materialize-quote-sketches": {
+        "task": "analytics.materialize_quote_sketches",
+        "schedule": 15 * 60.0,
+    },
+    "maintain-log-partitions": {
+        "task": "servicehub.maintain_log_partitions",
+        "schedule": 24 * 60 * 60.0,
+    },
+}
+
+
+# Audit log delivery: "sync" inserts entries inside the request (tests, local
+# development); "stream" queues them in Redis for the run_audit_writer command.
+AUDIT_LOG_MODE = env("AUDIT_LOG_MODE", default="sync")
+AUDIT_LOG_STREAM = "servicehub:audit-log"
+AUDIT_LOG_BATCH_SIZE = env.int("AUDIT_LOG_BATCH_SIZE", default=500)
+AUDIT_LOG_FLUSH_INTERVAL = env.float("AUDIT_LOG_FLUSH_INTERVAL", default=1.0)
+
+# DailyActivity ingestion: "sync" inserts each event in the request; "buffered"
+# queues events per process and writes them in micro-batches from a thread.
+# When the queue is full, ACTIVITY_LOG_OVERFLOW is "drop" or "spill" (to disk).
+ACTIVITY_LOG_MODE = env("ACTIVITY_LOG_MODE", default="sync")
+ACTIVITY_LOG_QUEUE_SIZE = env.int("ACTIVITY_LOG_QUEUE_SIZE", default=10000)
+ACTIVITY_LOG_BATCH_SIZE = env.int("ACTIVITY_LOG_BATCH_SIZE", default=200)
+ACTIVITY_LOG_FLUSH_INTERVAL = env.float("ACTIVITY_LOG_FLUSH_INTERVAL", default=0.5)
+ACTIVITY_LOG_OVERFLOW = env("ACTIVITY_LOG_OVERFLOW", default="spill")
+ACTIVITY_LOG_SPILL_DIR = env("ACTIVITY_LOG_SPILL_DIR", default=str(BASE_DIR / "logs" / "activity-spill"))
+
+# Monthly partitions of AuditLog and DailyActivity (PostgreSQL). Partitions
+# older than PARTITION_RETENTION_MONTHS are moved to gzipped NDJSON files.
+PARTITION_MONTHS_AHEAD = env.int("PARTITION_MONTHS_AHEAD", default=3)
+PARTITION_RETENTION_MONTHS = env.int("PARTITION_RETENTION_MONTHS", default=12)
+PARTITION_ARCHIVE_DIR = env("PARTITION_ARCHIVE_DIR", default=str(BASE_DIR / "archive"))
+
+# Salesperson leaderboard: "database" keeps entries in LeaderboardEntry (tests,
+# local development); "redis" keeps one sorted set per period and metric.
+LEADERBOARD_MODE = env("LEADERBOARD_MODE", default="database")
+LEADERBOARD_KEY_PREFIX = "servicehub:leaderboard"
+
+# Generated reports run in Celery; the soft limit (seconds) marks runaway jobs as failed.
+REPORT_TASK_TIME_LIMIT = env.int("REPORT_TASK_TIME_LIMIT", default=30 * 60)
+# Seconds the cohort matrices are cached per parameter set.
+COHORT_CACHE_TIMEOUT = env.int("COHORT_CACHE_TIMEOUT", default=10 * 60)
+# Seconds other analytics results are cached; quote and client saves invalidate them sooner.
+ANALYTICS_CACHE_TIMEOUT = env.int("ANALYTICS_CACHE_TIMEOUT", default=5 * 60)
+# Per-column .npy files of report bodies; a local path so they can be memory-mapped.
+REPORT_COLUMNS_DIR = env("REPORT_COLUMNS_DIR", default=str(MEDIA_ROOT / "report-columns"))
 
 
 SPECTACULAR_SETTINGS = {
@@ -47,3 +47,11 @@ def salesperson_user():
         role='salesperson'
     )
 
+
+
+@pytest.fixture(autouse=True)
+def reset_identifier_allocator():
+    """Forget identifier blocks reserved in a rolled back test database."""
+    from servicehub.utils.identifiers import allocator
+    allocator.reset()
+    yield
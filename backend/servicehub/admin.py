@@ -8,6 +8,8 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_filter = ('action', 'model_name', 'created_at')
     search_fields = ('user', 'model_name', 'object_id')
     readonly_fields = ('user', 'action', 'model_name', 'object_id', 'old_values', 'new_values', 'ip_address', 'user_agent', 'created_at')
+    # Skip the unfiltered COUNT(*) across every monthly partition.
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         return False
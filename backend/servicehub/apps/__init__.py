@@ -1,2 +1,19 @@
 # Apps package
+#
+# ``servicehub.apps`` is also where Django looks for the configuration of the
+# ``servicehub`` entry in INSTALLED_APPS, so the app config lives here.
 
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class ServicehubConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'servicehub'
+    verbose_name = 'ServiceHub'
+    
+    def ready(self):
+        """Import signals and install the partitions after migrate."""
+        import servicehub.utils.signals  # noqa
+        from servicehub.utils.partitions import install_partitioning
+        post_migrate.connect(install_partitioning, sender=self)
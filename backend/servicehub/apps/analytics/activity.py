@@ -0,0 +1,264 @@
+"""
+Buffered ingestion of ``DailyActivity`` events.
+
+Views call ``record_activity``. The event is queued once the surrounding
+transaction commits, so rolled back actions are never recorded. A background
+thread in each worker process writes the queue with ``bulk_create`` in
+micro-batches of up to ``ACTIVITY_LOG_BATCH_SIZE`` events, or every
+``ACTIVITY_LOG_FLUSH_INTERVAL`` seconds. The request never waits for an
+insert.
+
+The queue holds at most ``ACTIVITY_LOG_QUEUE_SIZE`` events. When it is full,
+or a batch cannot be written, ``ACTIVITY_LOG_OVERFLOW`` decides what happens:
+
+- ``drop``: discard the events and count them.
+- ``spill``: append them as NDJSON to ``ACTIVITY_LOG_SPILL_DIR``. The flusher
+  replays spilled files once the queue drains.
+
+``ACTIVITY_LOG_MODE = 'sync'`` writes each event at once; the tests use it.
+``get_stats`` returns this process's backpressure counters.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .distinct import record_client_events
+from .models import DailyActivity
+
+logger = logging.getLogger(__name__)
+
+SPILL_QUIET_SECONDS = 60
+
+
+def _build_activity(event):
+    return DailyActivity(
+        user_id=event['user_id'],
+        activity_type=event['activity_type'],
+        description=event['description'],
+        quote_id=event['quote_id'],
+        metadata=event['metadata'],
+        created_at=event['created_at'],
+    )
+
+
+def write_events(events):
+    DailyActivity.objects.bulk_create([_build_activity(event) for event in events])
+    record_client_events(
+        (event['user_id'], event.get('client_id'), event['created_at'])
+        for event in events
+    )
+
+
+class ActivityRecorder:
+    """Per-process bounded queue drained by a background flusher thread."""
+
+    def __init__(self, queue_size, batch_size, flush_interval, overflow, spill_dir):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_dir = Path(spill_dir)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['overflow'] = self.overflow
+        return stats
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def enqueue(self, event):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._overflow([event])
+        else:
+            self._count(enqueued=1)
+
+    def _overflow(self, events):
+        if self.overflow == 'spill' and self._spill(events):
+            self._count(spilled=len(events))
+            return
+        self._count(dropped=len(events))
+        logger.warning('Dropped %d activity events (queue full or write failed)', len(events))
+
+    def _spill(self, events):
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with self._spill_lock, open(self._spill_path(), 'a', encoding='utf-8') as spill:
+                for event in events:
+                    spill.write(json.dumps(event, cls=DjangoJSONEncoder) + '\n')
+            return True
+        except OSError:
+            logger.exception('Could not spill activity events to %s', self.spill_dir)
+            return False
+
+    def _spill_path(self):
+        return self.spill_dir / f'activity-{os.getpid()}.ndjson'
+
+    def _ensure_thread(self):
+        # Worker processes are forked after import; start one thread per process.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self.overflow == 'spill':
+                self._replay_spilled()
+
+    def _next_batch(self):
+        """Block for the first event, then collect more until the batch or interval fills."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        started = time.monotonic()
+        try:
+            close_old_connections()
+            write_events(batch)
+        except Exception:
+            logger.exception('Could not write %d activity events', len(batch))
+            self._count(failed_batches=1)
+            self._overflow(batch)
+            return False
+        with self._lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_ms'] = round((time.monotonic() - started) * 1000, 2)
+        return True
+
+    def _replay_spilled(self):
+        if not self.spill_dir.is_dir():
+            return
+        own_path = self._spill_path()
+        for path in sorted(self.spill_dir.glob('activity-*.ndjson')):
+            # Renaming claims the file so only one process replays it. Files of
+            # other processes are left alone while they may still be written.
+            claimed = path.with_name(f'{path.stem}.{uuid.uuid4().hex}.replaying')
+            try:
+                if path != own_path and time.time() - path.stat().st_mtime < SPILL_QUIET_SECONDS:
+                    continue
+                with self._spill_lock:
+                    path.rename(claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding='utf-8') as spill:
+                events = [self._load(line) for line in spill if line.strip()]
+            for start in range(0, len(events), self.batch_size):
+                batch = events[start:start + self.batch_size]
+                if self._write(batch):
+                    self._count(replayed=len(batch))
+            claimed.unlink()
+
+    @staticmethod
+    def _load(line):
+        event = json.loads(line)
+        event['created_at'] = parse_datetime(event['created_at'])
+        return event
+
+    def drain(self):
+        """Write whatever is queued in the calling thread (shutdown and tests)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+
+_recorder = None
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        _recorder = ActivityRecorder(
+            queue_size=settings.ACTIVITY_LOG_QUEUE_SIZE,
+            batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+            flush_interval=settings.ACTIVITY_LOG_FLUSH_INTERVAL,
+            overflow=settings.ACTIVITY_LOG_OVERFLOW,
+            spill_dir=settings.ACTIVITY_LOG_SPILL_DIR,
+        )
+        atexit.register(_recorder.drain)
+    return _recorder
+
+
+def get_stats():
+    return get_recorder().stats() if _recorder is not None else None
+
+
+def record_activity(user, activity_type, description, quote=None, **metadata):
+    """Record a ``DailyActivity`` without adding an insert to the request."""
+    if user is None or not user.is_authenticated:
+        return
+    event = {
+        'user_id': user.pk,
+        'activity_type': activity_type,
+        'description': description,
+        'quote_id': quote.pk if quote is not None else None,
+        'client_id': quote.client_id if quote is not None else metadata.get('client_id'),
+        'metadata': metadata,
+        'created_at': timezone.now(),
+    }
+    if settings.ACTIVITY_LOG_MODE != 'buffered':
+        write_events([event])
+        return
+    transaction.on_commit(lambda: get_recorder().enqueue(event))
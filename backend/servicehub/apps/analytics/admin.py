@@ -20,8 +20,8 @@ class DailyActivityAdmin(admin.ModelAdmin):
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
-    list_display = ('name', 'report_type', 'period_start', 'period_end', 'created_at')
-    list_filter = ('report_type', 'created_at')
+    list_display = ('name', 'report_type', 'status', 'period_start', 'period_end', 'created_at')
+    list_filter = ('report_type', 'status', 'created_at')
     search_fields = ('name', 'description')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('status', 'progress', 'error', 'completed_at', 'created_at')
 
@@ -1,8 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicehub.apps.analytics'
     verbose_name = 'Análise'
-
+    
+    def ready(self):
+        """Connect the rollup signal receivers and partition the activity log after migrate."""
+        import servicehub.apps.analytics.signals  # noqa
+        from servicehub.utils.partitions import install_partitioning
+        post_migrate.connect(install_partitioning, sender=self)
@@ -0,0 +1,120 @@
+"""
+Client cohort and retention matrices.
+
+A client's cohort is the local month of its first approved quote (approval
+time, falling back to the creation time). For every cohort ``c`` and month
+offset ``k`` the engine reports:
+
+- ``active``: clients with an approved quote in month ``c + k``;
+- ``repeat``: clients whose second approved quote arrived by month ``c + k``
+  (cumulative), which answers "how many came back";
+- ``revenue``: approved totals of the cohort's clients in month ``c + k``;
+
+plus ``retention`` and ``repeat_rate`` as fractions of the cohort size.
+Cells after the last requested month are ``None``.
+
+Approved quotes are read in one ``values_list`` query with the year and
+month already extracted in the local time zone, loaded straight into a
+structured NumPy array, and every matrix is built with sorting,
+``np.unique`` and ``np.bincount``. Results are cached per parameter set
+(``query_cache``) for ``COHORT_CACHE_TIMEOUT`` seconds or until a quote
+changes.
+"""
+
+from datetime import date, datetime, time
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from servicehub.apps.quotes.models import Quote
+from .query_cache import cached_query
+
+
+COHORT_ROW_DTYPE = [('client', 'i8'), ('year', 'i4'), ('month', 'i4'), ('total', 'f8')]
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def index_month(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def fetch_approvals(end_index):
+    """Return every approved quote up to the end of ``end_index``'s month as a structured array."""
+    end = timezone.make_aware(datetime.combine(index_month(end_index + 1), time.min))
+    rows = Quote.objects.filter(status='approved').annotate(
+        event=Coalesce('approved_at', 'created_at'),
+    ).filter(event__lt=end).annotate(
+        event_year=ExtractYear('event'),
+        event_month=ExtractMonth('event'),
+    ).values_list('client_id', 'event_year', 'event_month', 'total').order_by()
+    return np.fromiter(rows.iterator(chunk_size=5000), dtype=COHORT_ROW_DTYPE)
+
+
+def compute_cohorts(approvals, start_index, end_index):
+    """Build the cohort matrices for cohorts ``start_index..end_index`` (month indexes)."""
+    size = end_index - start_index + 1
+    months = approvals['year'] * 12 + approvals['month'] - 1
+    order = np.lexsort((months, approvals['client']))
+    clients, months, totals = approvals['client'][order], months[order], approvals['total'][order]
+    totals = np.nan_to_num(totals)
+
+    # Rows are grouped by client and sorted by month inside each group.
+    _, first_row, inverse = np.unique(clients, return_index=True, return_inverse=True)
+    cohort = months[first_row][inverse] - start_index
+    offset = months - months[first_row][inverse]
+    rank = np.arange(len(clients)) - first_row[inverse]
+
+    in_window = (cohort >= 0) & (cohort < size)
+    cell = cohort * size + offset
+
+    cohort_sizes = np.bincount(cohort[(rank == 0) & in_window], minlength=size)
+
+    new_month = np.ones(len(clients), dtype=bool)
+    new_month[1:] = (clients[1:] != clients[:-1]) | (months[1:] != months[:-1])
+    active = np.bincount(cell[in_window & new_month], minlength=size * size).reshape(size, size)
+    revenue = np.bincount(cell[in_window], weights=totals[in_window], minlength=size * size).reshape(size, size)
+    repeat = np.cumsum(
+        np.bincount(cell[in_window & (rank == 1)], minlength=size * size).reshape(size, size),
+        axis=1,
+    )
+
+    observable = np.add.outer(np.arange(size), np.arange(size)) < size
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.where(cohort_sizes[:, None] > 0, active / cohort_sizes[:, None], 0.0)
+        repeat_rate = np.where(cohort_sizes[:, None] > 0, repeat / cohort_sizes[:, None], 0.0)
+
+    def matrix(values, digits=None):
+        values = np.round(values, digits) if digits is not None else values
+        return [
+            [value if visible else None for value, visible in zip(row, mask)]
+            for row, mask in zip(values.tolist(), observable.tolist())
+        ]
+
+    return {
+        'start': f'{index_month(start_index):%Y-%m}',
+        'end': f'{index_month(end_index):%Y-%m}',
+        'offsets': list(range(size)),
+        'cohorts': [
+            {'month': f'{index_month(start_index + index):%Y-%m}', 'size': int(count)}
+            for index, count in enumerate(cohort_sizes)
+        ],
+        'active': matrix(active),
+        'retention': matrix(retention, 4),
+        'repeat': matrix(repeat),
+        'repeat_rate': matrix(repeat_rate, 4),
+        'revenue': matrix(revenue, 2),
+    }
+
+
+def get_cohorts(start_index, end_index):
+    """Return the cached cohort matrices for the range, computing them on a miss."""
+    return cached_query(
+        'cohorts', {'start': start_index, 'end': end_index}, 'all',
+        lambda: compute_cohorts(fetch_approvals(end_index), start_index, end_index),
+        tags=['quotes'], timeout=settings.COHORT_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,240 @@
+"""
+Columnar storage of report bodies.
+
+A report table is written as one NumPy ``.npy`` file per column under
+``REPORT_COLUMNS_DIR/<report id>/`` and the database row only keeps a
+manifest (``Report.manifest``) naming each column's file and kind. The files
+are not block-compressed so that ``np.load(mmap_mode='r')`` can map them: a
+column or row-range slice only reads the pages it touches. They are kept
+small by their encoding instead:
+
+- integers are downcast to the narrowest dtype that holds them;
+- strings are dictionary encoded as ``int32`` codes plus a ``.values.npy``
+  dictionary, which suits repeated statuses, owners and client names;
+- decimals and floats are ``float64``, datetimes UTC ``datetime64[us]`` and
+  dates ``datetime64[D]``.
+
+Missing values are ``NaN``, ``NaT`` or the code ``-1``; integer columns with
+missing values become ``float64``.
+"""
+
+import shutil
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from numbers import Number
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+
+COLUMN_CHUNK_ROWS = 2000
+MANIFEST_FORMAT = 'npy'
+
+
+def get_columns_dir(report_id):
+    return Path(settings.REPORT_COLUMNS_DIR) / str(report_id)
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, (float, Decimal)):
+        return 'decimal' if isinstance(value, Decimal) else 'float'
+    if isinstance(value, datetime):
+        return 'datetime'
+    if isinstance(value, date):
+        return 'date'
+    return 'string'
+
+
+def _narrow(array):
+    if array.dtype != np.int64 or not array.size:
+        return array
+    low, high = array.min(), array.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return array.astype(dtype)
+    return array
+
+
+class _Column:
+    """Encodes the values of one column chunk by chunk."""
+
+    def __init__(self, name):
+        self.name = name
+        self.kind = None
+        self.chunks = []
+        self.dictionary = {}
+        self._pending = []
+
+    def extend(self, values):
+        if self.kind is None:
+            self._pending.extend(values)
+            self.kind = next((_kind(value) for value in self._pending if value is not None), None)
+            if self.kind is None:
+                return
+            values, self._pending = self._pending, []
+        try:
+            self.chunks.append(self._encode(values))
+        except (TypeError, ValueError):
+            # A value that does not fit the column's kind: keep everything as text.
+            previous = [value for chunk in self._decoded_chunks() for value in chunk]
+            self.kind, self.chunks, self.dictionary = 'string', [], {}
+            self.chunks.append(self._encode(previous + list(values)))
+
+    def _encode(self, values):
+        if self.kind == 'string':
+            return np.array([
+                -1 if value is None else self.dictionary.setdefault(str(value), len(self.dictionary))
+                for value in values
+            ], dtype=np.int32)
+        if self.kind == 'datetime':
+            return np.array([
+                None if value is None else value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+                for value in values
+            ], dtype='datetime64[us]')
+        if self.kind == 'date':
+            if not all(value is None or isinstance(value, date) for value in values):
+                raise TypeError('Expected dates')
+            return np.array(values, dtype='datetime64[D]')
+        if not all(value is None or isinstance(value, Number) for value in values):
+            raise TypeError('Expected numbers')
+        if self.kind in ('int', 'bool') and all(isinstance(value, int) for value in values):
+            return np.array(values, dtype=np.bool_ if self.kind == 'bool' else np.int64)
+        return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+    def _decoded_chunks(self):
+        for chunk in self.chunks:
+            yield _decode({'kind': self.kind}, chunk, np.array(list(self.dictionary)))
+
+    def save(self, directory, index):
+        if self.kind is None:
+            self.kind = 'string'
+            self.chunks.append(self._encode(self._pending))
+        array = _narrow(np.concatenate(self.chunks)) if self.chunks else np.array([], dtype=np.int32)
+        kind = self.kind
+        if kind in ('int', 'bool') and array.dtype == np.float64:
+            kind = 'float'
+        entry = {'name': self.name, 'kind': kind, 'dtype': str(array.dtype), 'file': f'c{index}.npy'}
+        np.save(directory / entry['file'], array)
+        if kind == 'string':
+            entry['values'] = f'c{index}.values.npy'
+            np.save(directory / entry['values'], np.array(list(self.dictionary), dtype=str))
+        return entry
+
+
+class ColumnarWriter:
+    """Collect rows (sequences in ``header`` order) and write them column by column."""
+
+    def __init__(self, report_id, header):
+        self.report_id = report_id
+        self.header = list(header)
+        self.columns = [_Column(name) for name in self.header]
+        self.rows = 0
+        self._buffer = []
+
+    def append(self, row):
+        self._buffer.append(row)
+        self.rows += 1
+        if len(self._buffer) >= COLUMN_CHUNK_ROWS:
+            self._flush()
+
+    def _flush(self):
+        for index, column in enumerate(self.columns):
+            column.extend([row[index] for row in self._buffer])
+        self._buffer.clear()
+
+    def close(self, **extra):
+        """Write the files, replacing any previous body, and return the manifest."""
+        self._flush()
+        directory = get_columns_dir(self.report_id)
+        staging = directory.with_name(f'{directory.name}.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        columns = [column.save(staging, index) for index, column in enumerate(self.columns)]
+        shutil.rmtree(directory, ignore_errors=True)
+        staging.rename(directory)
+        return {'format': MANIFEST_FORMAT, 'rows': self.rows, 'columns': columns, **extra}
+
+
+def write_table(report_id, header, rows, **extra):
+    writer = ColumnarWriter(report_id, header)
+    for row in rows:
+        writer.append(row)
+    return writer.close(**extra)
+
+
+def _decode(column, array, dictionary):
+    kind = column['kind']
+    if kind == 'string':
+        if not dictionary.size:
+            return [None] * len(array)
+        decoded = dictionary[np.clip(array, 0, None)].astype(object)
+        decoded[array < 0] = None
+        return decoded.tolist()
+    if kind == 'datetime':
+        return [
+            None if value is None else value.replace(tzinfo=dt_timezone.utc)
+            for value in array.astype(object).tolist()
+        ]
+    if kind == 'date':
+        return array.astype(object).tolist()
+    if kind in ('float', 'decimal'):
+        return [None if value != value else value for value in array.tolist()]
+    return array.tolist()
+
+
+def read_columns(report_id, manifest, columns=None, start=0, stop=None):
+    """
+    Return ``{name: values}`` for the ``columns`` (all by default) and the
+    rows ``[start, stop)``, reading memory-mapped files.
+    """
+    directory = get_columns_dir(report_id)
+    selected = [
+        column for column in manifest['columns']
+        if columns is None or column['name'] in columns
+    ]
+    result = {}
+    for column in selected:
+        array = np.load(directory / column['file'], mmap_mode='r')[start:stop]
+        dictionary = (
+            np.load(directory / column['values'], mmap_mode='r')
+            if column['kind'] == 'string' else None
+        )
+        result[column['name']] = _decode(column, array, dictionary)
+    return result
+
+
+def read_rows(report_id, manifest, columns=None, start=0, stop=None):
+    """Return ``(names, rows)`` for a slice of the table, rows as lists."""
+    data = read_columns(report_id, manifest, columns, start, stop)
+    names = list(data)
+    return names, [list(row) for row in zip(*data.values())]
+
+
+def delete_table(report_id):
+    shutil.rmtree(get_columns_dir(report_id), ignore_errors=True)
+
+
+def split_table(data):
+    """
+    Split a posted ``data`` payload into ``(header, rows, rest)`` when it is
+    tabular, either a list of objects or ``{"columns": [...], "rows": [[...]]}``;
+    return ``None`` otherwise.
+    """
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        header = list(dict.fromkeys(key for item in data for key in item))
+        return header, ([item.get(key) for key in header] for item in data), {}
+    if (
+        isinstance(data, dict)
+        and isinstance(data.get('columns'), list)
+        and isinstance(data.get('rows'), list)
+        and all(isinstance(row, list) and len(row) == len(data['columns']) for row in data['rows'])
+    ):
+        rest = {key: value for key, value in data.items() if key not in ('columns', 'rows')}
+        return data['columns'], data['rows'], rest
+    return None
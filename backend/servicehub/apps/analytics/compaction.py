@@ -0,0 +1,55 @@
+"""
+Helpers shared by the delta compactions (``rollups``, ``series``, ``distinct``)
+and their readers.
+
+Writers append delta rows and a periodic job folds them into the summary
+tables. ``claim_deltas`` deletes exactly the rows it returns, so a delta
+committed while the job runs, even one with a lower id than the rows already
+read, stays pending for the next run instead of being deleted unseen. On
+PostgreSQL this is a single ``DELETE ... RETURNING``. Elsewhere the rows are
+read and then deleted by id.
+"""
+
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+
+CLAIM_BATCH_SIZE = 500
+
+
+def advisory_lock(model, lock_id):
+    """Serialise compaction and rebuilds (PostgreSQL; SQLite serialises writers anyway)."""
+    connection = connections[model.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_id])
+
+
+def bucket_filter(keys):
+    """``Q`` matching the ``(resolution, bucket)`` pairs of ``keys``."""
+    buckets = defaultdict(set)
+    for resolution, bucket in keys:
+        buckets[resolution].add(bucket)
+    return reduce(operator.or_, (
+        Q(resolution=resolution, bucket__in=starts) for resolution, starts in buckets.items()
+    ), Q(pk__in=[]))
+
+
+def claim_deltas(model, fields):
+    """Delete the pending ``model`` rows and return their ``fields`` as tuples. Run in a transaction."""
+    connection = connections[model.objects.db]
+    if connection.vendor == 'postgresql':
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(model._meta.get_field(field).column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {quote_name(model._meta.db_table)} RETURNING {columns}')
+            return cursor.fetchall()
+
+    rows = list(model.objects.order_by('id').values_list('id', *fields))
+    ids = [row[0] for row in rows]
+    for start in range(0, len(ids), CLAIM_BATCH_SIZE):
+        model.objects.filter(id__in=ids[start:start + CLAIM_BATCH_SIZE]).delete()
+    return [row[1:] for row in rows]
@@ -0,0 +1,191 @@
+"""
+Salesperson leaderboard by approved revenue or approved quotes.
+
+Each approval adds the quote total and one quote to the owner's entry in
+the week (starting on Monday), month and year of the approval date. The
+owner is ``assigned_to``, falling back to ``created_by``.
+``QuoteViewSet.approve`` calls ``record_approval`` once per quote that
+becomes approved. Nothing is computed from ``Quote`` at read time.
+
+``LEADERBOARD_MODE`` selects where the entries live:
+
+- ``database``: ``LeaderboardEntry`` rows, incremented with ``F()`` in the
+  approval's transaction. Ranks are counted on the ``(period, bucket,
+  -score)`` indexes. This is the default for tests and local development.
+- ``redis``: one sorted set per period bucket and metric, incremented in a
+  ``MULTI`` pipeline once the approval commits. Ranks use ``ZREVRANK``, which
+  is O(log n).
+
+A failed Redis write is logged and skipped. The ``rebuild_leaderboard``
+command recomputes every bucket from the approved quotes to repair drift.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils.redis_client import get_redis
+from .models import LeaderboardEntry
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('week', 'month', 'year')
+METRICS = ('revenue', 'approved')
+
+
+def period_buckets(day):
+    """Return ``{period: bucket start}`` for a local date."""
+    return {
+        'week': day - timedelta(days=day.weekday()),
+        'month': day.replace(day=1),
+        'year': day.replace(month=1, day=1),
+    }
+
+
+def _score(metric, value):
+    return float(value) if metric == 'revenue' else int(value)
+
+
+class DatabaseLeaderboard:
+    """Leaderboard entries in ``LeaderboardEntry``."""
+
+    def record(self, user_id, day, revenue):
+        for period, bucket in period_buckets(day).items():
+            entries = LeaderboardEntry.objects.filter(period=period, bucket=bucket, user_id=user_id)
+            increments = {'revenue': F('revenue') + revenue, 'approved': F('approved') + 1}
+            if entries.update(**increments):
+                continue
+            try:
+                with transaction.atomic():
+                    LeaderboardEntry.objects.create(
+                        period=period, bucket=bucket, user_id=user_id, revenue=revenue, approved=1,
+                    )
+            except IntegrityError:
+                # Another approval created the entry first.
+                entries.update(**increments)
+
+    def top(self, period, bucket, metric, limit):
+        rows = LeaderboardEntry.objects.filter(period=period, bucket=bucket).order_by(
+            f'-{metric}', 'user_id',
+        ).values_list('user_id', metric)[:limit]
+        return [(user_id, _score(metric, score)) for user_id, score in rows]
+
+    def rank(self, period, bucket, metric, user_id):
+        """Return ``(rank, score, entries)``; ``rank`` is 1-based or ``None``."""
+        entries = LeaderboardEntry.objects.filter(period=period, bucket=bucket)
+        score = entries.filter(user_id=user_id).values_list(metric, flat=True).first()
+        total = entries.count()
+        if score is None:
+            return None, None, total
+        ahead = entries.filter(**{f'{metric}__gt': score}).count()
+        return ahead + 1, _score(metric, score), total
+
+    def replace(self, entries):
+        with transaction.atomic():
+            LeaderboardEntry.objects.all().delete()
+            LeaderboardEntry.objects.bulk_create(
+                LeaderboardEntry(period=period, bucket=bucket, user_id=user_id, revenue=revenue, approved=approved)
+                for (period, bucket), users in entries.items()
+                for user_id, (revenue, approved) in users.items()
+            )
+
+
+class RedisLeaderboard:
+    """Leaderboard entries in Redis sorted sets, one per period bucket and metric."""
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.prefix = settings.LEADERBOARD_KEY_PREFIX
+
+    def _key(self, period, bucket, metric):
+        return f'{self.prefix}:{period}:{bucket.isoformat()}:{metric}'
+
+    def record(self, user_id, day, revenue):
+        pipe = self.client.pipeline(transaction=True)
+        for period, bucket in period_buckets(day).items():
+            pipe.zincrby(self._key(period, bucket, 'revenue'), float(revenue), user_id)
+            pipe.zincrby(self._key(period, bucket, 'approved'), 1, user_id)
+        pipe.execute()
+
+    def top(self, period, bucket, metric, limit):
+        rows = self.client.zrevrange(self._key(period, bucket, metric), 0, limit - 1, withscores=True)
+        return [(int(member), _score(metric, score)) for member, score in rows]
+
+    def rank(self, period, bucket, metric, user_id):
+        key = self._key(period, bucket, metric)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrevrank(key, user_id)
+        pipe.zscore(key, user_id)
+        pipe.zcard(key)
+        rank, score, total = pipe.execute()
+        if rank is None:
+            return None, None, total
+        return rank + 1, _score(metric, score), total
+
+    def replace(self, entries):
+        stale = set(self.client.scan_iter(match=f'{self.prefix}:*'))
+        pipe = self.client.pipeline(transaction=True)
+        if stale:
+            pipe.delete(*stale)
+        for (period, bucket), users in entries.items():
+            pipe.zadd(self._key(period, bucket, 'revenue'), {
+                user_id: float(revenue) for user_id, (revenue, _) in users.items()
+            })
+            pipe.zadd(self._key(period, bucket, 'approved'), {
+                user_id: approved for user_id, (_, approved) in users.items()
+            })
+        pipe.execute()
+
+
+def get_leaderboard():
+    if settings.LEADERBOARD_MODE == 'redis':
+        return RedisLeaderboard()
+    return DatabaseLeaderboard()
+
+
+def _record(user_id, day, revenue):
+    try:
+        get_leaderboard().record(user_id, day, revenue)
+    except RedisError:
+        logger.warning('Leaderboard unavailable, approval of user %s not ranked', user_id, exc_info=True)
+
+
+def record_approval(quote):
+    """Add a newly approved quote to its owner's leaderboard entries."""
+    user_id = quote.assigned_to_id or quote.created_by_id
+    if user_id is None:
+        return
+    day = timezone.localdate(quote.approved_at or timezone.now())
+    revenue = Decimal(quote.total or 0)
+    if settings.LEADERBOARD_MODE == 'redis':
+        transaction.on_commit(lambda: _record(user_id, day, revenue))
+    else:
+        _record(user_id, day, revenue)
+
+
+def rebuild_leaderboard():
+    """Recompute every bucket from the approved quotes; return the number of entries."""
+    rows = Quote.objects.filter(status='approved').annotate(
+        owner=Coalesce('assigned_to', 'created_by'),
+        day=TruncDate(Coalesce('approved_at', 'updated_at')),
+    ).filter(owner__isnull=False).values('owner', 'day').annotate(
+        revenue=Sum('total'), approved=Count('id'),
+    ).values_list('owner', 'day', 'revenue', 'approved').order_by()
+
+    entries = defaultdict(lambda: defaultdict(lambda: [Decimal('0'), 0]))
+    for user_id, day, revenue, approved in rows.iterator():
+        for period, bucket in period_buckets(day).items():
+            entry = entries[(period, bucket)][user_id]
+            entry[0] += revenue or 0
+            entry[1] += approved
+    get_leaderboard().replace(entries)
+    return sum(len(users) for users in entries.values())
@@ -0,0 +1,37 @@
+"""
+Management command maintaining the quote rollups behind the dashboard.
+"""
+
+from django.core.management.base import BaseCommand
+
+from servicehub.apps.analytics.distinct import compact_distinct_clients, rebuild_distinct_clients
+from servicehub.apps.analytics.rollups import compact_quote_rollups, rebuild_quote_rollups
+from servicehub.apps.analytics.series import compact_quote_series, rebuild_quote_series
+
+
+class Command(BaseCommand):
+    help = 'Fold pending quote rollup deltas into the daily rollup, series and distinct-client tables'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every rollup from the quotes table (initial load or repair)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_quote_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup buckets.'))
+            count = rebuild_quote_series()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} series buckets.'))
+            count = rebuild_distinct_clients()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} distinct-client buckets.'))
+            return
+        
+        count = compact_quote_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Compacted {count} rollup deltas.'))
+        count = compact_quote_series()
+        self.stdout.write(self.style.SUCCESS(f'Compacted {count} series deltas.'))
+        count = compact_distinct_clients()
+        self.stdout.write(self.style.SUCCESS(f'Compacted {count} distinct-client deltas.'))
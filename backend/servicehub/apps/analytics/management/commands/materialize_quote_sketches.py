@@ -0,0 +1,39 @@
+"""
+Management command recomputing the quote value sketches from quotes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicehub.apps.analytics.metrics import parse_month
+from servicehub.apps.analytics.quantiles import materialize_quote_sketches
+
+
+class Command(BaseCommand):
+    help = 'Recompute quote value sketches for the months touched since the last run'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every month that has quotes'
+        )
+        parser.add_argument(
+            '--month',
+            action='append',
+            default=[],
+            metavar='YYYY-MM',
+            help='Recompute only this month (may be repeated)'
+        )
+    
+    def handle(self, *args, **options):
+        periods = None
+        if options['month']:
+            try:
+                periods = [parse_month(value) for value in options['month']]
+            except ValueError:
+                raise CommandError('Use o formato YYYY-MM em --month.')
+        
+        written = materialize_quote_sketches(full=options['full'], periods=periods)
+        for (period_start, period_end), count in sorted(written.items()):
+            self.stdout.write(f'{period_start} - {period_end}: {count} sketches')
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(written)} periods.'))
@@ -0,0 +1,38 @@
+"""
+Management command recomputing SalesMetrics from quotes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicehub.apps.analytics.metrics import materialize_sales_metrics, parse_month
+
+
+class Command(BaseCommand):
+    help = 'Recompute sales metrics for the months touched since the last run'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every month that has quotes'
+        )
+        parser.add_argument(
+            '--month',
+            action='append',
+            default=[],
+            metavar='YYYY-MM',
+            help='Recompute only this month (may be repeated)'
+        )
+    
+    def handle(self, *args, **options):
+        periods = None
+        if options['month']:
+            try:
+                periods = [parse_month(value) for value in options['month']]
+            except ValueError:
+                raise CommandError('Use o formato YYYY-MM em --month.')
+        
+        written = materialize_sales_metrics(full=options['full'], periods=periods)
+        for (period_start, period_end), users in sorted(written.items()):
+            self.stdout.write(f'{period_start} - {period_end}: {users} users')
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(written)} periods.'))
@@ -0,0 +1,18 @@
+"""
+Management command recomputing the salesperson leaderboard from quotes.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from servicehub.apps.analytics.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute every leaderboard bucket from the approved quotes (repairs drift)'
+    
+    def handle(self, *args, **options):
+        count = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} leaderboard entries ({settings.LEADERBOARD_MODE}).'
+        ))
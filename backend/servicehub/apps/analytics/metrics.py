@@ -0,0 +1,132 @@
+"""
+Materialization of ``SalesMetrics`` from quotes.
+
+Metrics are kept per owner (``assigned_to``, falling back to ``created_by``)
+and calendar month of the quote's creation, in the local time zone. A period
+is recomputed for every user at once with a single ``GROUP BY`` over
+``Quote`` and written back with one ``bulk_create(update_conflicts=True)``.
+
+Incremental runs only revisit the months of quotes whose ``updated_at`` moved
+since the previous run, recorded in ``MaterializationCheckpoint``. The
+checkpoint is rewound by ``CHECKPOINT_OVERLAP`` so that transactions still
+open when the previous run started are picked up; recomputing a period is
+idempotent.
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from servicehub.apps.quotes.models import Quote
+from .models import MaterializationCheckpoint, SalesMetrics
+
+
+CHECKPOINT_NAME = 'sales_metrics'
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+METRIC_FIELDS = [
+    'total_quotes', 'approved_quotes', 'rejected_quotes', 'total_revenue',
+    'average_quote_value', 'conversion_rate', 'updated_at',
+]
+
+
+def month_period(day):
+    """Return ``(first_day, last_day)`` of the month containing ``day``."""
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _bounds(period_start, period_end):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(period_start, datetime.min.time()), tz)
+    end = timezone.make_aware(datetime.combine(period_end + timedelta(days=1), datetime.min.time()), tz)
+    return start, end
+
+
+def touched_periods(since=None):
+    """Return the monthly periods holding quotes updated since ``since`` (all when ``None``)."""
+    quotes = Quote.all_objects.all()
+    if since is not None:
+        quotes = quotes.filter(updated_at__gte=since)
+    months = quotes.dates('created_at', 'month')
+    return [month_period(month) for month in months]
+
+
+def compute_period(period_start, period_end):
+    """Return unsaved ``SalesMetrics`` for every user with quotes in the period."""
+    start, end = _bounds(period_start, period_end)
+    rows = Quote.objects.filter(
+        created_at__gte=start, created_at__lt=end,
+    ).annotate(
+        owner=Coalesce('assigned_to', 'created_by'),
+    ).filter(owner__isnull=False).values('owner').annotate(
+        quotes=Count('id'),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+        revenue=Sum('total', filter=Q(status='approved')),
+        average=Avg('total'),
+    ).order_by()
+
+    now = timezone.now()
+    return [
+        SalesMetrics(
+            user_id=row['owner'],
+            period_start=period_start,
+            period_end=period_end,
+            total_quotes=row['quotes'],
+            approved_quotes=row['approved'],
+            rejected_quotes=row['rejected'],
+            total_revenue=row['revenue'] or 0,
+            average_quote_value=Decimal(row['average'] or 0).quantize(Decimal('0.01')),
+            conversion_rate=(Decimal(row['approved'] * 100) / row['quotes']).quantize(Decimal('0.01')),
+            updated_at=now,
+        )
+        for row in rows
+    ]
+
+
+def materialize_period(period_start, period_end):
+    """Recompute and upsert one period; return the number of users written."""
+    metrics = compute_period(period_start, period_end)
+    with transaction.atomic():
+        SalesMetrics.objects.bulk_create(
+            metrics,
+            update_conflicts=True,
+            unique_fields=['user', 'period_start', 'period_end'],
+            update_fields=METRIC_FIELDS,
+        )
+        # Users who no longer own any quote in the period.
+        SalesMetrics.objects.filter(
+            period_start=period_start, period_end=period_end,
+        ).exclude(user_id__in=[metric.user_id for metric in metrics]).delete()
+    return len(metrics)
+
+
+def materialize_sales_metrics(full=False, periods=None):
+    """
+    Recompute the periods touched since the last run (or ``periods``, or all
+    of them with ``full``) and return ``{(period_start, period_end): users}``.
+    """
+    if periods is not None:
+        # Explicit periods leave the checkpoint alone.
+        return {period: materialize_period(*period) for period in periods}
+
+    started = timezone.now()
+    checkpoint = MaterializationCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    since = None if full or checkpoint is None else checkpoint.processed_until - CHECKPOINT_OVERLAP
+    written = {period: materialize_period(*period) for period in touched_periods(since)}
+
+    MaterializationCheckpoint.objects.update_or_create(
+        name=CHECKPOINT_NAME, defaults={'processed_until': started},
+    )
+    return written
+
+
+def parse_month(value):
+    """Parse ``YYYY-MM`` into a monthly period."""
+    year, month = (int(part) for part in value.split('-'))
+    return month_period(date(year, month, 1))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from servicehub.apps.quotes.models import Quote
 
@@ -33,6 +34,9 @@ class SalesMetrics(models.Model):
         verbose_name = _('Métrica de Vendas')
         verbose_name_plural = _('Métricas de Vendas')
         ordering = ['-period_end']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period_start', 'period_end'], name='analytics_sales_metrics_period'),
+        ]
     
     def __str__(self):
         return f"Métricas de {self.user.get_full_name()} ({self.period_start} - {self.period_end})"
@@ -47,6 +51,7 @@ class DailyActivity(models.Model):
         ('quote_created', _('Orçamento Criado')),
         ('quote_sent', _('Orçamento Enviado')),
         ('quote_approved', _('Orçamento Aprovado')),
+        ('quote_rejected', _('Orçamento Rejeitado')),
         ('client_added', _('Cliente Adicionado')),
         ('proposal_sent', _('Proposta Enviada')),
         ('service_completed', _('Serviço Concluído')),
@@ -62,8 +67,8 @@ class DailyActivity(models.Model):
     # Metadata
     metadata = models.JSONField(_('metadados'), default=dict, blank=True)
     
-    # Timestamps
-    created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
+    # Timestamps (set when the activity happened, not when the batch is written)
+    created_at = models.DateTimeField(_('criado em'), default=timezone.now)
     
     class Meta:
         verbose_name = _('Atividade Diária')
@@ -90,12 +95,35 @@ class Report(models.Model):
         ('performance', _('Desempenho')),
     )
     
+    STATUS_CHOICES = (
+        ('pending', _('Pendente')),
+        ('running', _('Em processamento')),
+        ('completed', _('Concluído')),
+        ('failed', _('Falhou')),
+    )
+    
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('xlsx', 'XLSX'),
+    )
+    
     name = models.CharField(_('nome'), max_length=255)
     report_type = models.CharField(_('tipo de relatório'), max_length=50, choices=REPORT_TYPES)
     description = models.TextField(_('descrição'), blank=True)
     
-    # Data
-    data = models.JSONField(_('dados'))
+    # Data: small inline JSON. Tabular bodies live in per-column files
+    # described by the manifest (see ``servicehub.apps.analytics.columnar``).
+    data = models.JSONField(_('dados'), default=dict, blank=True)
+    manifest = models.JSONField(_('manifesto'), default=dict, blank=True, editable=False)
+    row_count = models.PositiveIntegerField(_('linhas'), default=0)
+    
+    # Generation (reports posted with their data are complete on creation)
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='completed')
+    progress = models.PositiveSmallIntegerField(_('progresso'), default=100)
+    file_format = models.CharField(_('formato'), max_length=10, choices=FORMAT_CHOICES, blank=True)
+    file = models.FileField(_('arquivo'), upload_to='reports/%Y/%m/', blank=True)
+    error = models.TextField(_('erro'), blank=True)
+    completed_at = models.DateTimeField(_('concluído em'), null=True, blank=True)
     
     # Period
     period_start = models.DateField(_('início do período'))
@@ -109,7 +137,264 @@ class Report(models.Model):
         verbose_name = _('Relatório')
         verbose_name_plural = _('Relatórios')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', 'status']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.period_start} - {self.period_end})"
 
+
+
+class QuoteDailyRollup(models.Model):
+    """
+    Quote counts and totals per owner, creation day and status.
+    
+    Maintained by ``servicehub.apps.analytics.rollups``: quote changes append
+    ``QuoteRollupDelta`` rows and a periodic job folds them in here.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='quote_rollups')
+    day = models.DateField(_('dia'))
+    status = models.CharField(_('status'), max_length=20)
+    quote_count = models.IntegerField(_('orçamentos'), default=0)
+    total_amount = models.DecimalField(_('valor total'), max_digits=15, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Consolidado Diário de Orçamentos')
+        verbose_name_plural = _('Consolidados Diários de Orçamentos')
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'status'], name='analytics_quote_rollup_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.quote_count}"
+
+
+class QuoteRollupDelta(models.Model):
+    """
+    Pending change to a ``QuoteDailyRollup`` bucket, written with the quote.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    day = models.DateField(_('dia'))
+    status = models.CharField(_('status'), max_length=20)
+    quote_count = models.IntegerField(_('orçamentos'), default=0)
+    total_amount = models.DecimalField(_('valor total'), max_digits=15, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Variação de Consolidado de Orçamentos')
+        verbose_name_plural = _('Variações de Consolidado de Orçamentos')
+
+
+class QuoteSeriesRollup(models.Model):
+    """
+    Quote events per resolution, local bucket start, owner and event.
+    
+    Maintained by ``servicehub.apps.analytics.series``: quote status
+    transitions append ``QuoteSeriesDelta`` rows and a periodic job folds each
+    of them into its hour, day, week and month buckets.
+    """
+    
+    RESOLUTION_CHOICES = (
+        ('hour', _('Hora')),
+        ('day', _('Dia')),
+        ('week', _('Semana')),
+        ('month', _('Mês')),
+    )
+    
+    resolution = models.CharField(_('resolução'), max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField(_('início do intervalo'))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='quote_series')
+    event = models.CharField(_('evento'), max_length=20)
+    quote_count = models.IntegerField(_('orçamentos'), default=0)
+    total_amount = models.DecimalField(_('valor total'), max_digits=15, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Série de Orçamentos')
+        verbose_name_plural = _('Séries de Orçamentos')
+        ordering = ['resolution', '-bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resolution', 'bucket', 'user', 'event'],
+                name='analytics_quote_series_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.resolution} {self.bucket} {self.event}: {self.quote_count}"
+
+
+class QuoteSeriesDelta(models.Model):
+    """
+    Quote event not yet folded into ``QuoteSeriesRollup``, written with the quote.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    event = models.CharField(_('evento'), max_length=20)
+    occurred_at = models.DateTimeField(_('ocorrido em'))
+    quote_count = models.IntegerField(_('orçamentos'), default=1)
+    total_amount = models.DecimalField(_('valor total'), max_digits=15, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = _('Evento Pendente de Série de Orçamentos')
+        verbose_name_plural = _('Eventos Pendentes de Séries de Orçamentos')
+        indexes = [
+            models.Index(fields=['occurred_at']),
+        ]
+
+
+class QuoteValueSketch(models.Model):
+    """
+    Quantile sketch of quote values per owner or service category and day or month.
+    
+    Materialized by ``servicehub.apps.analytics.quantiles``; ``sketch`` is a
+    serialised ``servicehub.utils.sketches.KLLSketch``.
+    """
+    
+    DIMENSION_CHOICES = (
+        ('user', _('Responsável')),
+        ('category', _('Categoria de serviço')),
+    )
+    
+    RESOLUTION_CHOICES = (
+        ('day', _('Dia')),
+        ('month', _('Mês')),
+    )
+    
+    dimension = models.CharField(_('dimensão'), max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(_('chave'), max_length=100)
+    resolution = models.CharField(_('resolução'), max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateField(_('início do intervalo'))
+    value_count = models.IntegerField(_('valores'), default=0)
+    sketch = models.JSONField(_('sketch'))
+    
+    class Meta:
+        verbose_name = _('Distribuição de Valores de Orçamentos')
+        verbose_name_plural = _('Distribuições de Valores de Orçamentos')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'key', 'resolution', 'bucket'],
+                name='analytics_quote_value_sketch_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension} {self.key} {self.resolution} {self.bucket}: {self.value_count}"
+
+
+class DistinctClientSketch(models.Model):
+    """
+    HyperLogLog registers of the clients a user worked with per day, week or month.
+    
+    Maintained by ``servicehub.apps.analytics.distinct``: quote and activity
+    events append ``DistinctClientDelta`` rows and a periodic job folds them
+    in here. ``registers`` holds ``servicehub.utils.sketches.HyperLogLog``
+    bytes.
+    """
+    
+    RESOLUTION_CHOICES = (
+        ('day', _('Dia')),
+        ('week', _('Semana')),
+        ('month', _('Mês')),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='distinct_client_sketches')
+    resolution = models.CharField(_('resolução'), max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateField(_('início do intervalo'))
+    registers = models.BinaryField(_('registradores'))
+    
+    class Meta:
+        verbose_name = _('Contador de Clientes Distintos')
+        verbose_name_plural = _('Contadores de Clientes Distintos')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'resolution', 'bucket'],
+                name='analytics_distinct_client_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.resolution} {self.bucket}"
+
+
+class DistinctClientDelta(models.Model):
+    """
+    Client touched by a user, not yet folded into ``DistinctClientSketch``.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    client_id = models.BigIntegerField(_('cliente'))
+    occurred_at = models.DateTimeField(_('ocorrido em'))
+    
+    class Meta:
+        verbose_name = _('Cliente Ativo Pendente')
+        verbose_name_plural = _('Clientes Ativos Pendentes')
+        indexes = [
+            models.Index(fields=['occurred_at']),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Approved revenue and quotes of a user in a week, month or year.
+    
+    Used by ``servicehub.apps.analytics.leaderboard`` when
+    ``LEADERBOARD_MODE`` is ``database``; the ``redis`` mode keeps the same
+    numbers in sorted sets.
+    """
+    
+    PERIOD_CHOICES = (
+        ('week', _('Semana')),
+        ('month', _('Mês')),
+        ('year', _('Ano')),
+    )
+    
+    period = models.CharField(_('período'), max_length=10, choices=PERIOD_CHOICES)
+    bucket = models.DateField(_('início do período'))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    revenue = models.DecimalField(_('receita'), max_digits=15, decimal_places=2, default=0)
+    approved = models.IntegerField(_('orçamentos aprovados'), default=0)
+    
+    class Meta:
+        verbose_name = _('Posição no Ranking')
+        verbose_name_plural = _('Posições no Ranking')
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'user'], name='analytics_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket', '-revenue'], name='analytics_leaderboard_revenue'),
+            models.Index(fields=['period', 'bucket', '-approved'], name='analytics_leaderboard_approved'),
+        ]
+    
+    def __str__(self):
+        return f"{self.period} {self.bucket} {self.user_id}: {self.revenue}"
+
+
+class MaterializationCheckpoint(models.Model):
+    """
+    How far a materializer has processed its source rows (by ``updated_at``).
+    """
+    
+    name = models.CharField(_('nome'), max_length=100, unique=True)
+    processed_until = models.DateTimeField(_('processado até'))
+    
+    class Meta:
+        verbose_name = _('Ponto de Materialização')
+        verbose_name_plural = _('Pontos de Materialização')
+    
+    def __str__(self):
+        return f"{self.name} ({self.processed_until})"
@@ -0,0 +1,184 @@
+"""
+Quote value percentiles from mergeable quantile sketches.
+
+Quote totals are summarised in ``KLLSketch`` sketches (see
+``servicehub.utils.sketches`` for the error bounds) per dimension key and
+local day and month of the quote's creation:
+
+- ``user``: the quote total, keyed by owner (``assigned_to``, falling back to
+  ``created_by``);
+- ``category``: the sum of the quote's items for each ``Service.category``
+  they reference, so a quote spanning two categories counts in both.
+
+Sketches cannot forget values, so a month is recomputed from ``Quote`` as a
+whole. Like ``SalesMetrics``, incremental runs only revisit the months of
+quotes whose ``updated_at`` moved since the last run, and then invalidate the
+cached percentiles (``quote_sketches`` tag). ``get_quantiles``
+covers a date range with whole months and the days at its edges, merges the
+sketches of each key and reads the percentiles. A year-long query merges at
+most a few dozen sketches per key.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from servicehub.apps.quotes.models import Quote, QuoteItem
+from servicehub.utils.sketches import KLL_RANK_ERROR, KLLSketch
+from .metrics import CHECKPOINT_OVERLAP, month_period, touched_periods
+from .models import MaterializationCheckpoint, QuoteValueSketch
+from .query_cache import invalidate
+
+User = get_user_model()
+
+CHECKPOINT_NAME = 'quote_value_sketches'
+DIMENSIONS = ('user', 'category')
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _period_values(period_start, period_end):
+    """Yield ``(dimension, key, day, value)`` for the quotes created in the period."""
+    start = timezone.make_aware(datetime.combine(period_start, time.min))
+    end = timezone.make_aware(datetime.combine(period_end + timedelta(days=1), time.min))
+    quotes = Quote.objects.filter(created_at__gte=start, created_at__lt=end)
+
+    totals = quotes.annotate(
+        owner=Coalesce('assigned_to', 'created_by'),
+        day=TruncDate('created_at'),
+    ).filter(owner__isnull=False).values_list('owner', 'day', 'total')
+    for owner, day, total in totals.iterator(chunk_size=5000):
+        yield 'user', str(owner), day, total
+
+    categories = QuoteItem.objects.filter(
+        quote__in=quotes, service__isnull=False,
+    ).exclude(service__category='').annotate(
+        day=TruncDate('quote__created_at'),
+    ).values('quote', 'day', 'service__category').annotate(
+        amount=Sum('total'),
+    ).values_list('service__category', 'day', 'amount').order_by()
+    for category, day, amount in categories.iterator(chunk_size=5000):
+        yield 'category', category, day, amount
+
+
+def compute_period(period_start, period_end):
+    """Return unsaved day and month sketches for the monthly period."""
+    days = defaultdict(KLLSketch)
+    months = defaultdict(KLLSketch)
+    for dimension, key, day, value in _period_values(period_start, period_end):
+        days[(dimension, key, day)].update(value or 0)
+        months[(dimension, key)].update(value or 0)
+
+    sketches = [
+        QuoteValueSketch(
+            dimension=dimension, key=key, resolution='day', bucket=day,
+            value_count=sketch.n, sketch=sketch.to_dict(),
+        )
+        for (dimension, key, day), sketch in days.items()
+    ]
+    sketches.extend(
+        QuoteValueSketch(
+            dimension=dimension, key=key, resolution='month', bucket=period_start,
+            value_count=sketch.n, sketch=sketch.to_dict(),
+        )
+        for (dimension, key), sketch in months.items()
+    )
+    return sketches
+
+
+def materialize_period(period_start, period_end):
+    """Replace the sketches of one monthly period; return the number written."""
+    sketches = compute_period(period_start, period_end)
+    with transaction.atomic():
+        QuoteValueSketch.objects.filter(bucket__gte=period_start, bucket__lte=period_end).delete()
+        QuoteValueSketch.objects.bulk_create(sketches)
+    return len(sketches)
+
+
+def materialize_quote_sketches(full=False, periods=None):
+    """
+    Recompute the periods touched since the last run (or ``periods``, or all
+    of them with ``full``) and return ``{(period_start, period_end): sketches}``.
+    """
+    if periods is not None:
+        written = {period: materialize_period(*period) for period in periods}
+        invalidate('quote_sketches')
+        return written
+
+    started = timezone.now()
+    checkpoint = MaterializationCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    since = None if full or checkpoint is None else checkpoint.processed_until - CHECKPOINT_OVERLAP
+    written = {period: materialize_period(*period) for period in touched_periods(since)}
+
+    MaterializationCheckpoint.objects.update_or_create(
+        name=CHECKPOINT_NAME, defaults={'processed_until': started},
+    )
+    if written:
+        invalidate('quote_sketches')
+    return written
+
+
+def cover_days(start, end):
+    """Return ``(months, days)`` covering the dates ``start..end`` with whole months where they fit."""
+    months, days = [], []
+    day = start
+    while day <= end:
+        month_start, month_end = month_period(day)
+        if day == month_start and month_end <= end:
+            months.append(day)
+            day = month_end + timedelta(days=1)
+        else:
+            days.append(day)
+            day += timedelta(days=1)
+    return months, days
+
+
+def get_quantiles(dimension, start, end, keys=None, fractions=QUANTILES):
+    """
+    Return the percentiles of quote values per key of ``dimension`` for the
+    quotes created from ``start`` to ``end`` (dates, inclusive).
+    """
+    months, days = cover_days(start, end)
+    sketches = QuoteValueSketch.objects.filter(dimension=dimension).filter(
+        Q(resolution='month', bucket__in=months) | Q(resolution='day', bucket__in=days)
+    )
+    if keys is not None:
+        sketches = sketches.filter(key__in=keys)
+
+    merged = {}
+    for key, data in sketches.values_list('key', 'sketch').iterator():
+        sketch = KLLSketch.from_dict(data)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+
+    labels = {}
+    if dimension == 'user':
+        labels = {
+            str(pk): username
+            for pk, username in User.objects.filter(pk__in=list(merged)).values_list('pk', 'username')
+        }
+    results = []
+    for key, sketch in sorted(merged.items(), key=lambda item: (-item[1].n, item[0])):
+        values = sketch.quantiles(fractions)
+        results.append({
+            'key': key,
+            'label': labels.get(key, key),
+            'count': sketch.n,
+            'min': sketch.min,
+            'max': sketch.max,
+            'exact': len(sketch.levels) == 1,
+            **{f'p{round(fraction * 100):g}': value for fraction, value in zip(fractions, values)},
+        })
+    return {
+        'by': dimension,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'rank_error': KLL_RANK_ERROR,
+        'results': results,
+    }
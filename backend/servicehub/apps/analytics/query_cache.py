@@ -0,0 +1,229 @@
+"""
+Result cache for the analytics endpoints.
+
+``cached_query`` keys a result by namespace, the request's normalised query
+parameters (sorted, blanks dropped) and the requesting user's scope:
+``all`` for admins and managers, ``user:<id>`` for everyone else. An entry
+depends on tags. Each tag has a version counter in the cache, and the
+current versions are part of the key. ``invalidate`` bumps a version, so
+every entry built on the old one stops matching and expires with its
+timeout. No key lists need to be kept.
+
+Quote and client saves (see ``signals``) bump ``quotes`` or ``clients``
+once the transaction commits. They also bump the ``:user:<id>`` tag of the
+owner before and after the change, so a salesperson's cached dashboard
+survives other salespeople's edits.
+
+On a miss, one caller takes a short lock (``cache.add``) and computes the
+result. Concurrent callers for the same key wait for it instead of running
+the same aggregate, and compute it themselves only if the lock holder gives
+up. Hits, misses, coalesced waits, cache errors and the time spent serving
+each are counted in the process and added to shared counters in the cache at
+most every ``STATS_FLUSH_INTERVAL`` seconds (see ``get_cache_stats``). When
+the cache is unreachable, results are computed directly.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'analytics:query'
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+STATS_FLUSH_INTERVAL = 5
+STATS_FIELDS = ('hits', 'misses', 'coalesced', 'errors', 'hit_us', 'miss_us')
+
+_missing = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed = time.monotonic()
+
+
+def request_scope(user):
+    """Return the data scope of ``user``: ``all`` or ``user:<id>``."""
+    return 'all' if user.role in ('admin', 'manager') else f'user:{user.pk}'
+
+
+def scope_tags(scope, *tags):
+    """Return ``tags`` narrowed to the owner of a ``user:<id>`` scope."""
+    return list(tags) if scope == 'all' else [f'{tag}:{scope}' for tag in tags]
+
+
+def normalize_params(params):
+    """Return query parameters as sorted ``[name, values]`` pairs without blanks."""
+    if hasattr(params, 'lists'):
+        items = params.lists()
+    else:
+        items = ((name, value if isinstance(value, (list, tuple)) else [value]) for name, value in params.items())
+    return sorted(
+        [name, sorted(str(value) for value in values if value not in (None, ''))]
+        for name, values in items
+        if any(value not in (None, '') for value in values)
+    )
+
+
+def _tag_key(tag):
+    return f'{CACHE_PREFIX}:tag:{tag}'
+
+
+def _tag_versions(tags):
+    keys = [_tag_key(tag) for tag in sorted(set(tags))]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh random version keeps an evicted counter from matching old entries.
+            cache.add(key, uuid.uuid4().int >> 96, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Bump the version of ``tags`` so the entries depending on them are recomputed."""
+    try:
+        for tag in set(tags):
+            try:
+                cache.incr(_tag_key(tag))
+            except ValueError:
+                cache.add(_tag_key(tag), uuid.uuid4().int >> 96, None)
+    except RedisError:
+        logger.warning('Analytics cache unavailable, tags %s not invalidated', sorted(set(tags)), exc_info=True)
+
+
+def _count(namespace, **fields):
+    global _stats_flushed
+    with _stats_lock:
+        for field, value in fields.items():
+            _stats[(namespace, field)] += value
+        due = time.monotonic() - _stats_flushed >= STATS_FLUSH_INTERVAL
+    if due:
+        flush_stats()
+
+
+def flush_stats():
+    """Add the counters of this process to the shared ones in the cache."""
+    global _stats_flushed
+    with _stats_lock:
+        pending = {key: value for key, value in _stats.items() if value}
+        _stats.clear()
+        _stats_flushed = time.monotonic()
+    try:
+        for (namespace, field), value in pending.items():
+            key = f'{CACHE_PREFIX}:stats:{namespace}:{field}'
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                if not cache.add(key, value, None):
+                    cache.incr(key, value)
+        if pending:
+            cache.set(f'{CACHE_PREFIX}:stats:namespaces', sorted(
+                set(cache.get(f'{CACHE_PREFIX}:stats:namespaces', [])) | {namespace for namespace, _ in pending}
+            ), None)
+    except RedisError:
+        logger.warning('Analytics cache unavailable, statistics not flushed', exc_info=True)
+
+
+def get_cache_stats():
+    """Return the shared counters per namespace with hit rate and mean latencies."""
+    flush_stats()
+    namespaces = cache.get(f'{CACHE_PREFIX}:stats:namespaces', [])
+    values = cache.get_many([
+        f'{CACHE_PREFIX}:stats:{namespace}:{field}' for namespace in namespaces for field in STATS_FIELDS
+    ])
+    result = {}
+    for namespace in namespaces:
+        counts = {field: values.get(f'{CACHE_PREFIX}:stats:{namespace}:{field}', 0) for field in STATS_FIELDS}
+        served = counts['hits'] + counts['coalesced']
+        requests = served + counts['misses']
+        result[namespace] = {
+            'hits': counts['hits'],
+            'misses': counts['misses'],
+            'coalesced': counts['coalesced'],
+            'errors': counts['errors'],
+            'hit_rate': round(served / requests, 4) if requests else None,
+            'mean_hit_ms': round(counts['hit_us'] / served / 1000, 3) if served else None,
+            'mean_miss_ms': round(counts['miss_us'] / counts['misses'] / 1000, 3) if counts['misses'] else None,
+        }
+    return result
+
+
+def _elapsed_us(started):
+    return round((time.perf_counter() - started) * 1_000_000)
+
+
+def _wait(key, lock_key, token):
+    """Wait for the lock holder's result; return it, or take the lock and return ``_missing``."""
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        result = cache.get(key, _missing)
+        if result is not _missing:
+            return result
+        if cache.get(lock_key) is None:
+            break
+    cache.add(lock_key, token, LOCK_TIMEOUT)
+    return _missing
+
+
+def _release(lock_key, token):
+    try:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    except RedisError:
+        logger.warning('Analytics cache unavailable, lock %s left to expire', lock_key, exc_info=True)
+
+
+def _store(key, result, timeout, lock_key, token):
+    try:
+        cache.set(key, result, timeout)
+    except RedisError:
+        logger.warning('Analytics cache unavailable, result not stored', exc_info=True)
+    _release(lock_key, token)
+
+
+def cached_query(namespace, params, scope, compute, tags, timeout=None):
+    """
+    Return ``compute()`` cached under ``namespace``, ``params`` and ``scope``
+    until ``timeout`` (default ``ANALYTICS_CACHE_TIMEOUT``) or until one of
+    ``tags`` is invalidated.
+    """
+    started = time.perf_counter()
+    timeout = settings.ANALYTICS_CACHE_TIMEOUT if timeout is None else timeout
+    try:
+        digest = hashlib.sha1(json.dumps(
+            [scope, normalize_params(params), _tag_versions(tags)], default=str,
+        ).encode()).hexdigest()
+        key = f'{CACHE_PREFIX}:{namespace}:{digest}'
+        result = cache.get(key, _missing)
+        if result is not _missing:
+            _count(namespace, hits=1, hit_us=_elapsed_us(started))
+            return result
+        lock_key, token = f'{key}:lock', uuid.uuid4().hex
+        if not cache.add(lock_key, token, LOCK_TIMEOUT):
+            result = _wait(key, lock_key, token)
+            if result is not _missing:
+                _count(namespace, coalesced=1, hit_us=_elapsed_us(started))
+                return result
+    except RedisError:
+        logger.warning('Analytics cache unavailable, computing %s directly', namespace, exc_info=True)
+        _count(namespace, errors=1)
+        return compute()
+
+    try:
+        result = compute()
+    except Exception:
+        _release(lock_key, token)
+        raise
+    _store(key, result, timeout, lock_key, token)
+    _count(namespace, misses=1, miss_us=_elapsed_us(started))
+    return result
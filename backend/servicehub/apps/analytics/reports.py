@@ -0,0 +1,204 @@
+"""
+Background generation of analytics reports.
+
+A generated ``Report`` doubles as the job handle: the API creates it as
+``pending`` and the ``analytics.generate_report`` Celery task builds it
+outside the web workers. The task streams the report rows from a
+``values_list(...).iterator()`` query into a CSV or XLSX file (reusing the
+export renderers), publishes ``progress`` as it goes, and saves the artifact
+to the default storage. The same rows are kept as the report's columnar body
+and ``Report.data`` holds a small summary.
+
+Each report type is a builder returning ``(header, rows, summary)``, where
+``rows`` is a ``values_list`` queryset and ``summary`` a dict of aggregates.
+Admins and managers report on every quote; other users on the quotes
+assigned to (or created by) them, like the dashboard.
+"""
+
+import logging
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.files import File
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, TruncDate
+from django.utils import timezone
+
+from servicehub.apps.clients.models import Client
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils.exports import EXPORT_CHUNK_SIZE, CSVRenderer, XLSXRenderer
+from .columnar import ColumnarWriter
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+REPORT_RENDERERS = {'csv': CSVRenderer, 'xlsx': XLSXRenderer}
+PROGRESS_STEP = 5
+
+
+def _period_bounds(report):
+    start = timezone.make_aware(datetime.combine(report.period_start, time.min))
+    end = timezone.make_aware(datetime.combine(report.period_end + timedelta(days=1), time.min))
+    return start, end
+
+
+def _sees_all(report):
+    return report.created_by is not None and report.created_by.role in ('admin', 'manager')
+
+
+def _quotes(report):
+    start, end = _period_bounds(report)
+    quotes = Quote.objects.filter(created_at__gte=start, created_at__lt=end)
+    if not _sees_all(report):
+        user = report.created_by
+        quotes = quotes.filter(Q(assigned_to=user) | Q(assigned_to__isnull=True, created_by=user))
+    return quotes
+
+
+def _approved_total():
+    return Coalesce(
+        Sum('total', filter=Q(status='approved')),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def build_sales(report):
+    """One row per quote created in the period."""
+    quotes = _quotes(report)
+    header = ['quote_number', 'created_at', 'client_name', 'owner', 'status', 'total']
+    rows = quotes.annotate(
+        owner=Coalesce('assigned_to__username', 'created_by__username'),
+    ).values_list(
+        'quote_number', 'created_at', 'client__name', 'owner', 'status', 'total',
+    ).order_by('created_at', 'id')
+    summary = quotes.aggregate(quotes=Count('id'), amount=Sum('total'), revenue=_approved_total())
+    return header, rows, summary
+
+
+def build_revenue(report):
+    """Approved quotes and revenue per approval day."""
+    approved = _quotes(report).filter(status='approved')
+    header = ['day', 'approved_quotes', 'revenue']
+    rows = approved.annotate(
+        day=TruncDate(Coalesce('approved_at', 'created_at')),
+    ).values('day').annotate(
+        count=Count('id'), revenue=Sum('total'),
+    ).values_list('day', 'count', 'revenue').order_by('day')
+    summary = approved.aggregate(approved_quotes=Count('id'), revenue=Sum('total'))
+    return header, rows, summary
+
+
+def build_clients(report):
+    """Quote activity per client in the period."""
+    start, end = _period_bounds(report)
+    in_period = Q(quotes__created_at__gte=start, quotes__created_at__lt=end, quotes__deleted_at__isnull=True)
+    clients = Client.objects.all()
+    if not _sees_all(report):
+        clients = clients.filter(assigned_to=report.created_by)
+    header = ['name', 'email', 'type', 'status', 'quotes', 'approved_quotes', 'revenue']
+    rows = clients.annotate(
+        quote_count=Count('quotes', filter=in_period),
+        approved_count=Count('quotes', filter=in_period & Q(quotes__status='approved')),
+        revenue=Coalesce(
+            Sum('quotes__total', filter=in_period & Q(quotes__status='approved')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+    ).values_list(
+        'name', 'email', 'type', 'status', 'quote_count', 'approved_count', 'revenue',
+    ).order_by('name', 'id')
+    summary = {'clients': clients.count()}
+    return header, rows, summary
+
+
+def build_performance(report):
+    """Conversion and revenue per quote owner."""
+    quotes = _quotes(report)
+    header = [
+        'owner', 'quotes', 'approved_quotes', 'rejected_quotes', 'revenue',
+        'average_quote_value', 'conversion_rate',
+    ]
+    rows = quotes.annotate(
+        owner=Coalesce('assigned_to__username', 'created_by__username'),
+    ).values('owner').annotate(
+        quote_count=Count('id'),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+        revenue=_approved_total(),
+        average=Avg('total'),
+    ).annotate(
+        conversion=ExpressionWrapper(
+            F('approved') * 100.0 / NullIf(F('quote_count'), 0),
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        ),
+    ).values_list(
+        'owner', 'quote_count', 'approved', 'rejected', 'revenue', 'average', 'conversion',
+    ).order_by('owner')
+    summary = quotes.aggregate(quotes=Count('id'), revenue=_approved_total())
+    return header, rows, summary
+
+
+REPORT_BUILDERS = {
+    'sales': build_sales,
+    'revenue': build_revenue,
+    'clients': build_clients,
+    'performance': build_performance,
+}
+
+
+def _track_progress(report, rows, total):
+    """Yield ``rows`` while publishing the percentage written every ``PROGRESS_STEP`` points."""
+    reported = 0
+    for written, row in enumerate(rows, start=1):
+        yield row
+        progress = min(99, written * 100 // total) if total else 99
+        if progress >= reported + PROGRESS_STEP:
+            Report.objects.filter(pk=report.pk).update(progress=progress)
+            reported = progress
+
+
+def _tee(rows, table):
+    for row in rows:
+        table.append(row)
+        yield row
+
+
+def _json_summary(summary):
+    return {key: float(value) if isinstance(value, Decimal) else value for key, value in summary.items()}
+
+
+def generate_report(report_id):
+    """Build ``report_id``'s artifact; safe to retry, the file is rewritten."""
+    report = Report.objects.select_related('created_by').get(pk=report_id)
+    Report.objects.filter(pk=report.pk).update(status='running', progress=0, error='')
+    try:
+        header, rows, summary = REPORT_BUILDERS[report.report_type](report)
+        total = rows.count()
+        renderer = REPORT_RENDERERS[report.file_format]()
+        table = ColumnarWriter(report.pk, header)
+        with tempfile.TemporaryFile() as artifact:
+            rows = _track_progress(report, rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), total)
+            for chunk in renderer.stream(header, _tee(rows, table)):
+                artifact.write(chunk)
+            artifact.seek(0)
+            if report.file:
+                report.file.delete(save=False)
+            report.file.save(f'{report.report_type}-{report.pk}.{report.file_format}', File(artifact), save=False)
+    except Exception as error:
+        logger.exception('Could not generate report %s', report.pk)
+        Report.objects.filter(pk=report.pk).update(status='failed', error=str(error) or type(error).__name__)
+        raise
+
+    report.manifest = table.close()
+    report.row_count = table.rows
+    report.data = {'summary': _json_summary(summary)}
+    report.status = 'completed'
+    report.progress = 100
+    report.error = ''
+    report.completed_at = timezone.now()
+    report.save(update_fields=[
+        'data', 'manifest', 'row_count', 'file', 'status', 'progress', 'error', 'completed_at',
+    ])
+    return total
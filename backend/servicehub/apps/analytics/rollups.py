@@ -0,0 +1,156 @@
+"""
+Incremental quote rollups behind the analytics dashboard.
+
+Every quote contributes ``(1, total)`` to the bucket ``(owner, day, status)``,
+where the owner is ``assigned_to`` (falling back to ``created_by``) and the
+day is the local date the quote was created. Soft-deleted quotes contribute
+nothing.
+
+When a quote is saved, ``record_quote_change`` compares its load snapshot
+(``FieldTrackingMixin``) with its current values and appends at most two
+``QuoteRollupDelta`` rows: one removing the old contribution and one adding
+the new one. These are plain inserts, so concurrent writers never contend on
+a shared counter row. ``compact_quote_rollups`` runs periodically and folds
+the deltas into ``QuoteDailyRollup``, deleting exactly the rows it folded
+(see ``compaction.claim_deltas``). Readers sum both tables, so the
+dashboard is exact between compactions and its cost depends on the number of
+buckets rather than the number of quotes.
+"""
+
+import zlib
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from servicehub.apps.quotes.models import Quote
+from .compaction import advisory_lock, claim_deltas
+from .models import QuoteDailyRollup, QuoteRollupDelta
+
+
+PENDING_STATUSES = ('draft', 'sent', 'viewed')
+ROLLUP_LOCK_ID = zlib.crc32(b'servicehub.analytics.quote_rollups')
+
+
+def _contribution(values):
+    """Return ``(bucket, total)`` for quote field values keyed by attname, or ``None``."""
+    if values.get('deleted_at') is not None or values.get('created_at') is None:
+        return None
+    owner_id = values.get('assigned_to_id') or values.get('created_by_id')
+    bucket = (owner_id, timezone.localdate(values['created_at']), values.get('status'))
+    return bucket, Decimal(values.get('total') or 0)
+
+
+def _quote_values(quote):
+    return {
+        'assigned_to_id': quote.assigned_to_id,
+        'created_by_id': quote.created_by_id,
+        'created_at': quote.created_at,
+        'status': quote.status,
+        'total': quote.total,
+        'deleted_at': quote.deleted_at,
+    }
+
+
+def get_quote_deltas(quote, removed=False):
+    """Return the unsaved delta rows moving ``quote`` from its loaded bucket to its current one."""
+    before = _contribution(quote.get_snapshot())
+    after = None if removed else _contribution(_quote_values(quote))
+    if before == after:
+        return []
+
+    deltas = []
+    if before is not None:
+        (user_id, day, status), total = before
+        deltas.append(QuoteRollupDelta(user_id=user_id, day=day, status=status, quote_count=-1, total_amount=-total))
+    if after is not None:
+        (user_id, day, status), total = after
+        deltas.append(QuoteRollupDelta(user_id=user_id, day=day, status=status, quote_count=1, total_amount=total))
+    return deltas
+
+
+def record_quote_change(quote, removed=False):
+    deltas = get_quote_deltas(quote, removed=removed)
+    if deltas:
+        QuoteRollupDelta.objects.bulk_create(deltas)
+    return len(deltas)
+
+
+def compact_quote_rollups():
+    """Fold pending deltas into ``QuoteDailyRollup``; return the number of deltas consumed."""
+    with transaction.atomic():
+        advisory_lock(QuoteDailyRollup, ROLLUP_LOCK_ID)
+        rows = claim_deltas(QuoteRollupDelta, ('user_id', 'day', 'status', 'quote_count', 'total_amount'))
+        changes = defaultdict(lambda: [0, Decimal('0')])
+        for user_id, day, status, count, total in rows:
+            change = changes[(user_id, day, status)]
+            change[0] += count
+            change[1] += total
+        existing = {
+            (rollup.user_id, rollup.day, rollup.status): rollup
+            for rollup in QuoteDailyRollup.objects.select_for_update().filter(
+                day__in={day for _, day, _ in changes}
+            )
+        }
+
+        to_create, to_update, to_delete = [], [], []
+        for (user_id, day, status), (count, total) in changes.items():
+            rollup = existing.get((user_id, day, status))
+            if rollup is None:
+                rollup = QuoteDailyRollup(user_id=user_id, day=day, status=status)
+                to_create.append(rollup)
+            else:
+                to_update.append(rollup)
+            rollup.quote_count += count
+            rollup.total_amount += total
+
+        for rollup in to_update:
+            if rollup.quote_count == 0 and rollup.total_amount == 0:
+                to_delete.append(rollup.pk)
+        to_update = [rollup for rollup in to_update if rollup.pk not in to_delete]
+        to_create = [rollup for rollup in to_create if rollup.quote_count or rollup.total_amount]
+
+        QuoteDailyRollup.objects.bulk_create(to_create)
+        QuoteDailyRollup.objects.bulk_update(to_update, ['quote_count', 'total_amount'])
+        QuoteDailyRollup.objects.filter(pk__in=to_delete).delete()
+        return len(rows)
+
+
+def rebuild_quote_rollups():
+    """Recompute every bucket from ``Quote`` with one aggregate query."""
+    with transaction.atomic():
+        advisory_lock(QuoteDailyRollup, ROLLUP_LOCK_ID)
+        QuoteRollupDelta.objects.all().delete()
+        QuoteDailyRollup.objects.all().delete()
+        rows = Quote.objects.annotate(
+            owner=Coalesce('assigned_to', 'created_by'),
+            day=TruncDate('created_at'),
+        ).values('owner', 'day', 'status').annotate(
+            count=Count('id'), amount=Sum('total'),
+        ).order_by()
+        return len(QuoteDailyRollup.objects.bulk_create(
+            QuoteDailyRollup(
+                user_id=row['owner'], day=row['day'], status=row['status'],
+                quote_count=row['count'], total_amount=row['amount'] or 0,
+            )
+            for row in rows
+        ))
+
+
+def get_quote_totals(user=None):
+    """Return ``{status: {'count': int, 'total': Decimal}}`` from rollups plus pending deltas."""
+    totals = defaultdict(lambda: {'count': 0, 'total': Decimal('0')})
+    for model in (QuoteDailyRollup, QuoteRollupDelta):
+        queryset = model.objects.all()
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        rows = queryset.values('status').annotate(
+            count=Sum('quote_count'), amount=Sum('total_amount'),
+        ).order_by()
+        for row in rows:
+            totals[row['status']]['count'] += row['count'] or 0
+            totals[row['status']]['total'] += row['amount'] or 0
+    return dict(totals)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from .columnar import split_table, write_table
 from .models import SalesMetrics, DailyActivity, Report
 
 
@@ -27,14 +29,104 @@ class DailyActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportListSerializer(serializers.ModelSerializer):
+    """Report without ``data``; the list queryset defers the payload columns."""
+    
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    download_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Report
         fields = [
-            'id', 'name', 'report_type', 'description', 'data',
-            'period_start', 'period_end', 'created_by', 'created_by_name', 'created_at'
+            'id', 'name', 'report_type', 'description', 'row_count',
+            'period_start', 'period_end', 'status', 'progress', 'file_format',
+            'error', 'completed_at', 'download_url',
+            'created_by', 'created_by_name', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.file:
+            return None
+        url = reverse('report-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ReportSerializer(ReportListSerializer):
+    """
+    Report with its inline ``data``.
+    
+    Tabular ``data`` (a list of objects, or ``{"columns": [...], "rows": [[...]]}``)
+    is moved to columnar storage on write; ``columns`` describes it and the
+    rows are read from ``/reports/{id}/rows/``.
+    """
+    
+    columns = serializers.SerializerMethodField()
+    
+    class Meta(ReportListSerializer.Meta):
+        fields = ReportListSerializer.Meta.fields + ['data', 'columns']
+        read_only_fields = [
+            'id', 'row_count', 'status', 'progress', 'file_format', 'error',
+            'completed_at', 'created_by', 'created_at'
+        ]
+    
+    def get_columns(self, obj):
+        return [
+            {'name': column['name'], 'kind': column['kind']}
+            for column in obj.manifest.get('columns', [])
+        ]
+    
+    def _store_table(self, report, table):
+        header, rows, _ = table
+        report.manifest = write_table(report.pk, header, rows)
+        report.row_count = report.manifest['rows']
+        report.save(update_fields=['manifest', 'row_count'])
+    
+    def create(self, validated_data):
+        table = split_table(validated_data.get('data'))
+        if table is not None:
+            validated_data['data'] = table[2]
+        report = super().create(validated_data)
+        if table is not None:
+            self._store_table(report, table)
+        return report
+    
+    def update(self, instance, validated_data):
+        table = split_table(validated_data.get('data'))
+        if table is not None:
+            validated_data['data'] = table[2]
+        report = super().update(instance, validated_data)
+        if table is not None:
+            self._store_table(report, table)
+        return report
+
+
+class ReportExportSerializer(serializers.Serializer):
+    """Parameters of ``POST /analytics/reports/export/``."""
+    
+    report_type = serializers.ChoiceField(choices=Report.REPORT_TYPES, default='sales')
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    format = serializers.ChoiceField(choices=Report.FORMAT_CHOICES, default='xlsx')
+    name = serializers.CharField(max_length=255, required=False)
+    
+    def validate(self, attrs):
+        if attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError({'end_date': 'A data final deve ser posterior à inicial.'})
+        return attrs
+    
+    def create(self, validated_data):
+        report_type = validated_data['report_type']
+        start, end = validated_data['start_date'], validated_data['end_date']
+        return Report.objects.create(
+            name=validated_data.get('name') or f'{dict(Report.REPORT_TYPES)[report_type]} {start} - {end}',
+            report_type=report_type,
+            period_start=start,
+            period_end=end,
+            file_format=validated_data['format'],
+            status='pending',
+            progress=0,
+            created_by=validated_data['created_by'],
+        )
 
@@ -0,0 +1,276 @@
+"""
+Multi-resolution conversion and revenue series.
+
+Quote events are counted in hour, day, week (starting on Monday) and month
+buckets of the local time zone (``TIME_ZONE``, ``America/Sao_Paulo``). The
+events are ``created`` and the transitions into ``sent``, ``approved`` and
+``rejected``. Each carries the quote's total at that moment and is dated by
+the matching timestamp (``created_at``, ``sent_at``, ``approved_at``), or by
+the time of the save when that field is empty. Events belong to the quote's
+owner (``assigned_to``, falling back to ``created_by``). An event stays
+counted when the quote is deleted later.
+
+Like ``rollups``, a save only appends one ``QuoteSeriesDelta`` per event.
+``compact_quote_series`` folds the deltas into the four resolutions of
+``QuoteSeriesRollup`` and deletes exactly the rows it folded. Readers add the pending deltas.
+
+``get_series`` returns one point per bucket of the requested resolution. It
+also returns totals for exactly ``[start, end)``. The totals come from
+``cover_range``, which splits the range into the coarsest buckets that fit:
+whole months, then weeks, days and hours at the edges. A year-long range
+therefore reads a few dozen rows at most.
+"""
+
+import zlib
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from servicehub.apps.quotes.models import Quote
+from .compaction import advisory_lock, bucket_filter, claim_deltas
+from .models import QuoteSeriesDelta, QuoteSeriesRollup
+
+
+RESOLUTIONS = ('hour', 'day', 'week', 'month')
+SERIES_EVENTS = ('created', 'sent', 'approved', 'rejected')
+SERIES_LOCK_ID = zlib.crc32(b'servicehub.analytics.quote_series')
+
+# Timestamp dating each status transition (the save time when empty).
+TRANSITION_FIELDS = {'sent': 'sent_at', 'approved': 'approved_at', 'rejected': None}
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def bucket_start(value, resolution):
+    """Return the start of the local ``resolution`` bucket containing ``value``."""
+    local = timezone.localtime(value)
+    if resolution == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    day = local.date()
+    if resolution == 'week':
+        day -= timedelta(days=day.weekday())
+    elif resolution == 'month':
+        day = day.replace(day=1)
+    return _local_midnight(day)
+
+
+def bucket_end(start, resolution):
+    """Return the start of the bucket following the one starting at ``start``."""
+    if resolution == 'hour':
+        return timezone.localtime(start + timedelta(hours=1))
+    day = timezone.localtime(start).date()
+    if resolution == 'day':
+        return _local_midnight(day + timedelta(days=1))
+    if resolution == 'week':
+        return _local_midnight(day + timedelta(days=7))
+    return _local_midnight((day.replace(day=28) + timedelta(days=4)).replace(day=1))
+
+
+def iter_buckets(start, end, resolution):
+    """Yield the starts of the ``resolution`` buckets overlapping ``[start, end)``."""
+    cursor = bucket_start(start, resolution)
+    while cursor < end:
+        yield cursor
+        cursor = bucket_end(cursor, resolution)
+
+
+def cover_range(start, end, resolutions=RESOLUTIONS[::-1]):
+    """
+    Return ``[(resolution, bucket_start)]`` covering ``[start, end)`` with the
+    coarsest buckets that fit. Both ends must fall on local hour boundaries.
+    """
+    if start >= end or not resolutions:
+        return []
+    resolution, finer = resolutions[0], resolutions[1:]
+    first = bucket_start(start, resolution)
+    if first < start:
+        first = bucket_end(first, resolution)
+    buckets = []
+    cursor = first
+    while bucket_end(cursor, resolution) <= end:
+        buckets.append((resolution, cursor))
+        cursor = bucket_end(cursor, resolution)
+    if not buckets:
+        return cover_range(start, end, finer)
+    return cover_range(start, first, finer) + buckets + cover_range(cursor, end, finer)
+
+
+def get_transition_deltas(quote, now=None):
+    """Return the unsaved deltas for the events of ``quote``'s current save."""
+    if quote.deleted_at is not None:
+        return []
+    now = now or timezone.now()
+    snapshot = quote.get_snapshot()
+    owner_id = quote.assigned_to_id or quote.created_by_id
+    total = Decimal(quote.total or 0)
+
+    events = []
+    if 'status' not in snapshot:
+        events.append(('created', quote.created_at or now))
+    if quote.status in TRANSITION_FIELDS and snapshot.get('status') != quote.status:
+        field = TRANSITION_FIELDS[quote.status]
+        events.append((quote.status, (getattr(quote, field) if field else None) or now))
+    return [
+        QuoteSeriesDelta(user_id=owner_id, event=event, occurred_at=occurred_at, total_amount=total)
+        for event, occurred_at in events
+    ]
+
+
+def record_quote_transition(quote):
+    deltas = get_transition_deltas(quote)
+    if deltas:
+        QuoteSeriesDelta.objects.bulk_create(deltas)
+    return len(deltas)
+
+
+def _expand(rows):
+    """Sum ``(user_id, event, moment, count, amount)`` rows into every resolution's buckets."""
+    changes = defaultdict(lambda: [0, Decimal('0')])
+    for user_id, event, moment, count, amount in rows:
+        for resolution in RESOLUTIONS:
+            change = changes[(resolution, bucket_start(moment, resolution), user_id, event)]
+            change[0] += count
+            change[1] += amount or 0
+    return changes
+
+
+def compact_quote_series():
+    """Fold pending deltas into ``QuoteSeriesRollup``; return the number of deltas consumed."""
+    with transaction.atomic():
+        advisory_lock(QuoteSeriesRollup, SERIES_LOCK_ID)
+        rows = claim_deltas(QuoteSeriesDelta, ('user_id', 'event', 'occurred_at', 'quote_count', 'total_amount'))
+        changes = _expand(rows)
+        existing = {
+            (rollup.resolution, rollup.bucket, rollup.user_id, rollup.event): rollup
+            for rollup in QuoteSeriesRollup.objects.select_for_update().filter(
+                bucket_filter((resolution, bucket) for resolution, bucket, _, _ in changes)
+            )
+        }
+
+        to_create, to_update = [], []
+        for key, (count, total) in changes.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                resolution, bucket, user_id, event = key
+                rollup = QuoteSeriesRollup(resolution=resolution, bucket=bucket, user_id=user_id, event=event)
+                to_create.append(rollup)
+            else:
+                to_update.append(rollup)
+            rollup.quote_count += count
+            rollup.total_amount += total
+
+        QuoteSeriesRollup.objects.bulk_create(to_create)
+        QuoteSeriesRollup.objects.bulk_update(to_update, ['quote_count', 'total_amount'])
+        return len(rows)
+
+
+def _rebuild_rows():
+    """Yield hourly ``(user_id, event, hour, count, amount)`` aggregates from ``Quote``."""
+    quotes = Quote.all_objects.annotate(owner=Coalesce('assigned_to', 'created_by'))
+    sources = {
+        'created': ('created_at', Q()),
+        'sent': ('sent_at', Q(sent_at__isnull=False)),
+        'approved': (Coalesce('approved_at', 'updated_at'), Q(status='approved')),
+        'rejected': ('updated_at', Q(status='rejected')),
+    }
+    for event, (moment, condition) in sources.items():
+        rows = quotes.filter(condition).annotate(hour=TruncHour(moment)).values('owner', 'hour').annotate(
+            count=Count('id'), amount=Sum('total'),
+        ).values_list('owner', 'hour', 'count', 'amount').order_by()
+        for owner, hour, count, amount in rows:
+            yield owner, event, hour, count, amount
+
+
+def rebuild_quote_series():
+    """
+    Recompute every bucket from the quotes' current timestamps. Rejections
+    and approvals without ``approved_at`` are dated by ``updated_at``.
+    """
+    with transaction.atomic():
+        advisory_lock(QuoteSeriesRollup, SERIES_LOCK_ID)
+        QuoteSeriesDelta.objects.all().delete()
+        QuoteSeriesRollup.objects.all().delete()
+        changes = _expand(_rebuild_rows())
+        return len(QuoteSeriesRollup.objects.bulk_create(
+            QuoteSeriesRollup(
+                resolution=resolution, bucket=bucket, user_id=user_id, event=event,
+                quote_count=count, total_amount=total,
+            )
+            for (resolution, bucket, user_id, event), (count, total) in changes.items()
+        ))
+
+
+def _empty_values():
+    return {**{event: 0 for event in SERIES_EVENTS}, 'revenue': Decimal('0')}
+
+
+def _add(values, event, count, amount):
+    if event in values:
+        values[event] += count or 0
+    if event == 'approved':
+        values['revenue'] += amount or 0
+
+
+def _finish(values):
+    decided = values['approved'] + values['rejected']
+    return {
+        **values,
+        'revenue': float(values['revenue']),
+        'conversion_rate': round(values['approved'] * 100 / decided, 2) if decided else None,
+    }
+
+
+def _scoped(queryset, user):
+    return queryset if user is None else queryset.filter(user=user)
+
+
+def get_series(start, end, resolution, user=None):
+    """
+    Return the ``resolution`` points overlapping ``[start, end)`` and the
+    totals of exactly that range (``start`` and ``end`` on hour boundaries).
+    """
+    buckets = {bucket: _empty_values() for bucket in iter_buckets(start, end, resolution)}
+    first = min(buckets) if buckets else start
+    rows = _scoped(QuoteSeriesRollup.objects, user).filter(
+        resolution=resolution, bucket__gte=first, bucket__lt=end,
+    ).values('bucket', 'event').annotate(
+        count=Sum('quote_count'), amount=Sum('total_amount'),
+    ).order_by()
+    for row in rows:
+        _add(buckets[timezone.localtime(row['bucket'])], row['event'], row['count'], row['amount'])
+
+    totals = _empty_values()
+    covering = cover_range(start, end)
+    if covering:
+        rows = _scoped(QuoteSeriesRollup.objects, user).filter(bucket_filter(covering)).values('event').annotate(
+            count=Sum('quote_count'), amount=Sum('total_amount'),
+        ).order_by()
+        for row in rows:
+            _add(totals, row['event'], row['count'], row['amount'])
+
+    pending = _scoped(QuoteSeriesDelta.objects, user).filter(
+        occurred_at__gte=first, occurred_at__lt=end,
+    ).values_list('event', 'occurred_at', 'quote_count', 'total_amount')
+    for event, occurred_at, count, amount in pending:
+        _add(buckets[bucket_start(occurred_at, resolution)], event, count, amount)
+        if occurred_at >= start:
+            _add(totals, event, count, amount)
+
+    return {
+        'resolution': resolution,
+        'time_zone': timezone.get_current_timezone_name(),
+        'start': timezone.localtime(start).isoformat(),
+        'end': timezone.localtime(end).isoformat(),
+        'totals': _finish(totals),
+        'points': [
+            {'bucket': bucket.isoformat(), **_finish(values)}
+            for bucket, values in sorted(buckets.items())
+        ],
+    }
@@ -0,0 +1,64 @@
+"""Signal receivers keeping the analytics rollups, cached results and report bodies in step."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from servicehub.apps.clients.models import Client
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils.audit import post_bulk_create
+from .columnar import delete_table
+from .models import Report
+from .distinct import record_quote_clients
+from .query_cache import invalidate
+from .rollups import record_quote_change
+from .series import record_quote_transition
+
+
+@receiver(post_save, sender=Quote)
+def update_quote_rollups(sender, instance, raw=False, **kwargs):
+    """Record the quote's move between rollup buckets, its series events and its client."""
+    if not raw:
+        record_quote_change(instance)
+        record_quote_transition(instance)
+        record_quote_clients(instance)
+
+
+@receiver(post_delete, sender=Quote)
+def remove_quote_from_rollups(sender, instance, **kwargs):
+    """Remove a hard-deleted quote from its rollup bucket."""
+    record_quote_change(instance, removed=True)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_cached_results(sender, instance, **kwargs):
+    """Invalidate cached analytics of the team and of the owners before and after the change, on commit."""
+    tag = 'quotes' if sender is Quote else 'clients'
+    snapshot = instance.get_snapshot()
+    owners = {
+        owner_id
+        for field in ('assigned_to_id', 'created_by_id')
+        for owner_id in (snapshot.get(field), getattr(instance, field))
+        if owner_id is not None
+    }
+    tags = [tag, *(f'{tag}:user:{owner_id}' for owner_id in owners)]
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+@receiver(post_bulk_create, sender=Client)
+def invalidate_bulk_created_results(sender, instances, **kwargs):
+    """Invalidate cached client analytics of the team and of the new clients' owners, on commit."""
+    owners = {instance.assigned_to_id or instance.created_by_id for instance in instances} - {None}
+    tags = ['clients', *(f'clients:user:{owner_id}' for owner_id in owners)]
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+@receiver(post_delete, sender=Report)
+def remove_report_table(sender, instance, **kwargs):
+    """Remove the columnar body of a deleted report once the deletion commits."""
+    if instance.manifest:
+        report_id = instance.pk
+        transaction.on_commit(lambda: delete_table(report_id))
@@ -0,0 +1,52 @@
+"""Celery tasks for the analytics app."""
+
+from celery import shared_task
+from django.conf import settings
+
+from .distinct import compact_distinct_clients
+from .metrics import materialize_sales_metrics
+from .quantiles import materialize_quote_sketches
+from .reports import generate_report
+from .rollups import compact_quote_rollups
+from .series import compact_quote_series
+
+
+@shared_task(name='analytics.compact_quote_rollups', ignore_result=True)
+def compact_quote_rollups_task():
+    """Fold pending quote rollup deltas into the daily rollup table."""
+    return compact_quote_rollups()
+
+
+@shared_task(name='analytics.compact_quote_series', ignore_result=True)
+def compact_quote_series_task():
+    """Fold pending quote events into the hour/day/week/month series."""
+    return compact_quote_series()
+
+
+@shared_task(name='analytics.compact_distinct_clients', ignore_result=True)
+def compact_distinct_clients_task():
+    """Fold pending client activity into the distinct-client counters."""
+    return compact_distinct_clients()
+
+
+@shared_task(name='analytics.materialize_sales_metrics', ignore_result=True)
+def materialize_sales_metrics_task():
+    """Recompute the sales metrics of the months touched since the last run."""
+    return len(materialize_sales_metrics())
+
+
+@shared_task(name='analytics.materialize_quote_sketches', ignore_result=True)
+def materialize_quote_sketches_task():
+    """Recompute the quote value sketches of the months touched since the last run."""
+    return len(materialize_quote_sketches())
+
+
+@shared_task(
+    name='analytics.generate_report',
+    ignore_result=True,
+    acks_late=True,
+    soft_time_limit=settings.REPORT_TASK_TIME_LIMIT,
+)
+def generate_report_task(report_id):
+    """Build a requested report and store its CSV/XLSX artifact."""
+    return generate_report(report_id)
@@ -0,0 +1,1193 @@
+"""
+Tests for Analytics app.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from servicehub.apps.clients.models import Client
+from servicehub.apps.quotes.models import Quote, QuoteItem
+from servicehub.apps.services.models import Service
+from .activity import ActivityRecorder, record_activity
+from .cohorts import COHORT_ROW_DTYPE, compute_cohorts
+from .columnar import read_columns, write_table
+from .distinct import compact_distinct_clients, get_distinct_clients, rebuild_distinct_clients
+from .leaderboard import RedisLeaderboard, period_buckets, rebuild_leaderboard
+from .metrics import materialize_sales_metrics
+from .quantiles import cover_days, materialize_quote_sketches
+from .query_cache import cached_query, flush_stats, get_cache_stats, invalidate, normalize_params
+from .models import (
+    DailyActivity, DistinctClientDelta, LeaderboardEntry, QuoteDailyRollup, QuoteRollupDelta, QuoteSeriesDelta, QuoteValueSketch, Report, SalesMetrics,
+)
+from .reports import generate_report
+from .rollups import compact_quote_rollups, get_quote_totals, rebuild_quote_rollups
+from .series import bucket_end, compact_quote_series, cover_range, get_series, rebuild_quote_series
+from .tasks import generate_report_task
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestQuoteRollups:
+    """Tests for the incremental quote rollups."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+
+    def _create_quote(self, subtotal='100.00'):
+        return Quote.objects.create(
+            client=self.client_obj,
+            title='Test Quote',
+            description='Test Description',
+            subtotal=Decimal(subtotal),
+            total=Decimal(subtotal),
+            created_by=self.user
+        )
+
+    def test_status_change_moves_quote_between_buckets(self):
+        """Test that saving a loaded quote records a move, not a new quote."""
+        quote = Quote.objects.get(pk=self._create_quote().pk)
+        quote.status = 'approved'
+        quote.save()
+
+        totals = get_quote_totals(self.user)
+        assert totals['draft']['count'] == 0
+        assert totals['approved'] == {'count': 1, 'total': Decimal('100.00')}
+
+    def test_untracked_change_records_nothing(self):
+        """Test that edits outside the bucket dimensions add no deltas."""
+        quote = Quote.objects.get(pk=self._create_quote().pk)
+        before = QuoteRollupDelta.objects.count()
+        quote.title = 'Renamed'
+        quote.save()
+
+        assert QuoteRollupDelta.objects.count() == before
+
+    def test_soft_delete_removes_contribution(self):
+        """Test that soft-deleted quotes leave the rollups."""
+        quote = Quote.objects.get(pk=self._create_quote().pk)
+        quote.delete()
+        compact_quote_rollups()
+
+        assert not QuoteDailyRollup.objects.exists()
+        assert get_quote_totals() == {}
+
+    def test_compaction_matches_rebuild(self):
+        """Test that compacted deltas equal a full recomputation."""
+        self._create_quote('100.00')
+        approved = Quote.objects.get(pk=self._create_quote('250.00').pk)
+        approved.status = 'approved'
+        approved.save()
+
+        assert compact_quote_rollups() == 4
+        assert not QuoteRollupDelta.objects.exists()
+        compacted = get_quote_totals()
+
+        rebuild_quote_rollups()
+        assert get_quote_totals() == compacted
+        assert compacted == {
+            'draft': {'count': 1, 'total': Decimal('100.00')},
+            'approved': {'count': 1, 'total': Decimal('250.00')},
+        }
+
+    def test_compaction_keeps_deltas_it_did_not_read(self, monkeypatch):
+        """Test that a delta committed during compaction is folded by the next run."""
+        self._create_quote('100.00')
+        self._create_quote('50.00')
+        late = QuoteRollupDelta.objects.order_by('id').first()
+        order_by = QuoteRollupDelta.objects.order_by
+        monkeypatch.setattr(QuoteRollupDelta.objects, 'order_by', lambda *fields: order_by(*fields).exclude(pk=late.pk))
+
+        assert compact_quote_rollups() == 1
+        assert list(QuoteRollupDelta.objects.values_list('pk', flat=True)) == [late.pk]
+        monkeypatch.undo()
+        assert compact_quote_rollups() == 1
+        assert get_quote_totals() == {'draft': {'count': 2, 'total': Decimal('150.00')}}
+
+
+@pytest.mark.django_db
+class TestDashboardAPI:
+    """Tests for the dashboard endpoint."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='admin_dashboard',
+            email='admin@example.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        for subtotal, quote_status in [('100.00', 'sent'), ('300.00', 'approved')]:
+            Quote.objects.create(
+                client=self.client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(subtotal),
+                total=Decimal(subtotal),
+                status=quote_status,
+                created_by=self.user
+            )
+
+    def test_dashboard_totals(self):
+        """Test the dashboard fields used by the frontend."""
+        compact_quote_rollups()
+        Quote.objects.create(
+            client=self.client_obj,
+            title='Pending delta',
+            description='Not compacted yet',
+            subtotal=Decimal('50.00'),
+            total=Decimal('50.00'),
+            created_by=self.user
+        )
+
+        response = self.client.get('/api/v1/analytics/dashboard/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_clients'] == 1
+        assert response.data['total_quotes'] == 3
+        assert response.data['pending_quotes'] == 2
+        assert response.data['approved_quotes'] == 1
+        assert response.data['total_revenue'] == 300.0
+
+    def test_salesperson_counts_owned_clients(self):
+        """Test that salespeople count the clients assigned to them or created by them and unassigned."""
+        seller = User.objects.create_user(
+            username='seller_dashboard',
+            email='seller@example.com',
+            password='testpass123',
+            role='salesperson'
+        )
+        for index, (created_by, assigned_to) in enumerate([
+            (seller, None), (self.user, seller), (seller, self.user),
+        ]):
+            Client.objects.create(
+                name=f'Seller Client {index}',
+                email=f'seller{index}@client.com',
+                phone='11999999999',
+                type='individual',
+                document=f'9876543210{index}',
+                created_by=created_by,
+                assigned_to=assigned_to
+            )
+
+        self.client.force_authenticate(user=seller)
+        response = self.client.get('/api/v1/analytics/dashboard/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_clients'] == 2
+
+
+@pytest.mark.django_db
+class TestSalesMetricsMaterializer:
+    """Tests for the SalesMetrics materializer."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.seller = User.objects.create_user(
+            username='seller',
+            email='seller@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.seller
+        )
+        for owner, total, quote_status in [
+            (self.seller, '100.00', 'approved'),
+            (self.seller, '300.00', 'rejected'),
+            (self.other, '50.00', 'sent'),
+        ]:
+            Quote.objects.create(
+                client=self.client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(total),
+                total=Decimal(total),
+                status=quote_status,
+                created_by=owner
+            )
+
+    def test_materializes_all_users_of_a_period(self):
+        """Test one run writes a row per user with the aggregated values."""
+        written = materialize_sales_metrics()
+
+        assert list(written.values()) == [2]
+        metrics = SalesMetrics.objects.get(user=self.seller)
+        assert metrics.total_quotes == 2
+        assert metrics.approved_quotes == 1
+        assert metrics.rejected_quotes == 1
+        assert metrics.total_revenue == Decimal('100.00')
+        assert metrics.average_quote_value == Decimal('200.00')
+        assert metrics.conversion_rate == Decimal('50.00')
+
+    def test_only_touched_periods_are_recomputed(self):
+        """Test incremental runs skip untouched periods and upsert in place."""
+        materialize_sales_metrics()
+        # Move the existing quotes out of the checkpoint overlap window.
+        Quote.all_objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        assert materialize_sales_metrics() == {}
+
+        quote = Quote.objects.filter(created_by=self.other).get()
+        quote.status = 'approved'
+        quote.save()
+
+        written = materialize_sales_metrics()
+        assert len(written) == 1
+        assert SalesMetrics.objects.count() == 2
+        assert SalesMetrics.objects.get(user=self.other).conversion_rate == Decimal('100.00')
+
+
+@pytest.mark.django_db
+class TestActivityRecorder:
+    """Tests for buffered DailyActivity ingestion."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.user = User.objects.create_user(
+            username='recorder',
+            email='recorder@example.com',
+            password='testpass123'
+        )
+
+    def _event(self, description='Event'):
+        return {
+            'user_id': self.user.pk,
+            'activity_type': 'quote_created',
+            'description': description,
+            'quote_id': None,
+            'metadata': {},
+            'created_at': timezone.now(),
+        }
+
+    def _recorder(self, tmp_path, queue_size=10, overflow='spill'):
+        recorder = ActivityRecorder(
+            queue_size=queue_size, batch_size=50, flush_interval=0.1,
+            overflow=overflow, spill_dir=tmp_path,
+        )
+        # Keep the flusher thread out of the test; drain explicitly instead.
+        recorder._ensure_thread = lambda: None
+        return recorder
+
+    def test_sync_mode_writes_immediately(self):
+        """Test that the default mode inserts inside the request."""
+        record_activity(self.user, 'client_added', 'Cliente criado', client_id=7)
+
+        activity = DailyActivity.objects.get()
+        assert activity.activity_type == 'client_added'
+        assert activity.metadata == {'client_id': 7}
+
+    def test_buffered_mode_enqueues_after_commit(self, settings, tmp_path, django_capture_on_commit_callbacks):
+        """Test that buffered events wait for the commit and land in one batch."""
+        settings.ACTIVITY_LOG_MODE = 'buffered'
+        recorder = self._recorder(tmp_path)
+        from . import activity
+        activity._recorder, previous = recorder, activity._recorder
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                record_activity(self.user, 'quote_sent', 'Primeiro')
+                record_activity(self.user, 'quote_sent', 'Segundo')
+                assert recorder.stats()['queue_depth'] == 0
+            recorder.drain()
+        finally:
+            activity._recorder = previous
+
+        assert DailyActivity.objects.count() == 2
+        assert recorder.stats()['batches'] == 1
+
+    def test_overflow_drop_counts_events(self, tmp_path):
+        """Test that a full queue under the drop policy discards and counts."""
+        recorder = self._recorder(tmp_path, queue_size=1, overflow='drop')
+        recorder.enqueue(self._event())
+        recorder.enqueue(self._event())
+
+        stats = recorder.stats()
+        assert stats['enqueued'] == 1
+        assert stats['dropped'] == 1
+
+    def test_overflow_spill_is_replayed(self, tmp_path):
+        """Test that spilled events are written back once the queue drains."""
+        recorder = self._recorder(tmp_path, queue_size=1)
+        for index in range(3):
+            recorder.enqueue(self._event(f'Event {index}'))
+        assert recorder.stats()['spilled'] == 2
+
+        recorder.drain()
+        recorder._replay_spilled()
+
+        assert DailyActivity.objects.count() == 3
+        assert recorder.stats()['replayed'] == 2
+        assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.django_db
+class TestReportGeneration:
+    """Tests for background report generation."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='reporter',
+            email='reporter@example.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        for total, quote_status in [('100.00', 'approved'), ('300.00', 'rejected'), ('50.00', 'sent')]:
+            Quote.objects.create(
+                client=self.client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(total),
+                total=Decimal(total),
+                status=quote_status,
+                created_by=self.user
+            )
+        self.today = timezone.localdate().isoformat()
+
+    def test_export_returns_job_and_builds_artifact(self, settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks):
+        """Test that export queues a job whose file can be downloaded once built."""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.REPORT_COLUMNS_DIR = str(tmp_path / 'columns')
+        queued = []
+        monkeypatch.setattr(generate_report_task, 'delay', queued.append)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post('/api/v1/analytics/reports/export/', {
+                'start_date': self.today, 'end_date': self.today, 'format': 'csv',
+            }, format='json')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'pending'
+        assert response.data['download_url'] is None
+        assert queued == [response.data['id']]
+
+        pending = self.client.get(f"/api/v1/analytics/reports/{response.data['id']}/download/")
+        assert pending.status_code == status.HTTP_409_CONFLICT
+
+        generate_report(response.data['id'])
+        report = self.client.get(f"/api/v1/analytics/reports/{response.data['id']}/")
+        assert report.data['status'] == 'completed'
+        assert report.data['progress'] == 100
+        assert report.data['row_count'] == 3
+        assert report.data['data']['summary']['revenue'] == 100.0
+        assert [column['name'] for column in report.data['columns']][:2] == ['quote_number', 'created_at']
+
+        download = self.client.get(report.data['download_url'])
+        content = b''.join(download.streaming_content).decode('utf-8-sig').splitlines()
+        assert content[0] == 'quote_number,created_at,client_name,owner,status,total'
+        assert len(content) == 4
+
+    @pytest.mark.parametrize('report_type, rows', [
+        ('sales', 3), ('revenue', 1), ('clients', 1), ('performance', 1),
+    ])
+    def test_report_types(self, settings, tmp_path, report_type, rows):
+        """Test every report type builds an XLSX artifact."""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.REPORT_COLUMNS_DIR = str(tmp_path / 'columns')
+        report = Report.objects.create(
+            name='Report', report_type=report_type, status='pending', progress=0,
+            file_format='xlsx', period_start=timezone.localdate(), period_end=timezone.localdate(),
+            created_by=self.user,
+        )
+
+        assert generate_report(report.pk) == rows
+        report.refresh_from_db()
+        assert report.status == 'completed'
+        assert report.file.name.endswith('.xlsx')
+
+    def test_export_rejects_unsupported_format(self):
+        """Test that formats without a renderer are refused."""
+        response = self.client.post('/api/v1/analytics/reports/export/', {
+            'start_date': self.today, 'end_date': self.today, 'format': 'pdf',
+        }, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Report.objects.exists()
+
+
+def test_columnar_table_round_trip(settings, tmp_path):
+    """Test encoding, slicing and the text fallback of the column files."""
+    settings.REPORT_COLUMNS_DIR = str(tmp_path)
+    created = timezone.now().replace(microsecond=0)
+    rows = [
+        ['approved', 3, Decimal('10.50'), created, 'x'],
+        ['sent', None, None, None, 7],
+        ['approved', 200, Decimal('1.25'), created, None],
+    ]
+
+    manifest = write_table(1, ['status', 'count', 'total', 'created_at', 'mixed'], rows)
+    kinds = {column['name']: (column['kind'], column['dtype']) for column in manifest['columns']}
+    assert manifest['rows'] == 3
+    assert kinds['status'] == ('string', 'int32')
+    assert kinds['count'] == ('float', 'float64')
+    assert kinds['mixed'][0] == 'string'
+
+    columns = read_columns(1, manifest)
+    assert columns['status'] == ['approved', 'sent', 'approved']
+    assert columns['count'] == [3.0, None, 200.0]
+    assert columns['total'] == [10.5, None, 1.25]
+    assert columns['created_at'] == [created, None, created]
+    assert columns['mixed'] == ['x', '7', None]
+    assert read_columns(1, manifest, columns=['status'], start=1, stop=2) == {'status': ['sent']}
+
+
+@pytest.mark.django_db
+class TestReportTableAPI:
+    """Tests for reports with columnar bodies."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='tables',
+            email='tables@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_tabular_data_is_stored_as_columns(self, settings, tmp_path):
+        """Test posting records, listing without data and slicing rows."""
+        settings.REPORT_COLUMNS_DIR = str(tmp_path)
+        response = self.client.post('/api/v1/analytics/reports/', {
+            'name': 'Vendas',
+            'report_type': 'sales',
+            'period_start': '2024-12-01',
+            'period_end': '2024-12-31',
+            'data': [{'seller': f'user{index % 3}', 'total': index} for index in range(25)],
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['data'] == {}
+        assert response.data['row_count'] == 25
+        assert Report.objects.get().manifest['columns'][1]['dtype'] == 'int8'
+
+        listing = self.client.get('/api/v1/analytics/reports/')
+        assert 'data' not in listing.data['results'][0]
+
+        rows = self.client.get(
+            f"/api/v1/analytics/reports/{response.data['id']}/rows/",
+            {'columns': 'total', 'offset': 20, 'limit': 3},
+        )
+        assert rows.data['columns'] == ['total']
+        assert rows.data['rows'] == [[20], [21], [22]]
+        assert rows.data['count'] == 25
+
+        unknown = self.client.get(f"/api/v1/analytics/reports/{response.data['id']}/rows/", {'columns': 'nope'})
+        assert unknown.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_owner_cannot_be_reassigned(self):
+        """Test that created_by is set from the request and ignored on writes."""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        response = self.client.post('/api/v1/analytics/reports/', {
+            'name': 'Vendas', 'report_type': 'sales', 'period_start': '2024-12-01',
+            'period_end': '2024-12-31', 'created_by': other.pk,
+        }, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['created_by'] == self.user.pk
+
+        response = self.client.patch(
+            f"/api/v1/analytics/reports/{response.data['id']}/", {'created_by': other.pk}, format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert Report.objects.get().created_by == self.user
+
+
+def test_cohort_matrices():
+    """Test cohort sizes, activity, repeat purchases and revenue."""
+    approvals = np.array([
+        # client, year, month, total
+        (1, 2023, 12, 10.0),  # first approval before the window: not a cohort member
+        (1, 2024, 1, 10.0),
+        (2, 2024, 1, 100.0),
+        (2, 2024, 1, 50.0),   # second approval in the cohort month
+        (3, 2024, 1, 20.0),
+        (3, 2024, 3, 30.0),
+        (4, 2024, 2, 40.0),
+    ], dtype=COHORT_ROW_DTYPE)
+
+    result = compute_cohorts(approvals, 2024 * 12, 2024 * 12 + 2)
+
+    assert [cohort['size'] for cohort in result['cohorts']] == [2, 1, 0]
+    assert result['active'][0] == [2, 0, 1]
+    assert result['repeat'][0] == [1, 1, 2]
+    assert result['repeat_rate'][0] == [0.5, 0.5, 1.0]
+    assert result['revenue'][0] == [170.0, 0.0, 30.0]
+    assert result['active'][1] == [1, 0, None]
+    assert result['active'][2] == [0, None, None]
+
+
+@pytest.mark.django_db
+class TestCohortAPI:
+    """Tests for the cohort endpoint."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='cohorts',
+            email='cohorts@example.com',
+            password='testpass123',
+            role='manager'
+        )
+        self.client.force_authenticate(user=self.user)
+        client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        for total in ('100.00', '50.00'):
+            Quote.objects.create(
+                client=client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(total),
+                total=Decimal(total),
+                status='approved',
+                approved_at=timezone.now(),
+                created_by=self.user
+            )
+
+    def test_cohorts_are_computed_and_cached(self, settings, django_assert_num_queries):
+        """Test the default range and that repeated calls hit the cache."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        month = timezone.localdate().strftime('%Y-%m')
+
+        response = self.client.get('/api/v1/analytics/cohorts/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['end'] == month
+        assert response.data['cohorts'][-1] == {'month': month, 'size': 1}
+        assert response.data['repeat'][-1][0] == 1
+        assert response.data['revenue'][-1][0] == 150.0
+
+        with django_assert_num_queries(0):
+            self.client.get('/api/v1/analytics/cohorts/')
+
+    def test_cohorts_validate_parameters_and_role(self, settings):
+        """Test month parsing, range limits and the manager restriction."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        assert self.client.get('/api/v1/analytics/cohorts/', {'start': '2024-13'}).status_code == 400
+        assert self.client.get('/api/v1/analytics/cohorts/', {'start': '2024-05', 'end': '2024-01'}).status_code == 400
+
+        self.user.role = 'salesperson'
+        self.user.save()
+        assert self.client.get('/api/v1/analytics/cohorts/').status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_cover_range_uses_coarsest_buckets():
+    """Test that a range is split into months, then days and hours at the edges."""
+    start = timezone.make_aware(datetime(2024, 1, 29, 10))
+    end = timezone.make_aware(datetime(2024, 4, 2, 5))
+
+    buckets = cover_range(start, end)
+
+    resolutions = [resolution for resolution, _ in buckets]
+    assert resolutions.count('month') == 2
+    assert resolutions.count('week') == 0
+    assert resolutions.count('day') == 3
+    assert resolutions.count('hour') == 14 + 5
+    cursor = start
+    for resolution, bucket in buckets:
+        assert bucket == cursor
+        cursor = bucket_end(bucket, resolution)
+    assert cursor == end
+
+
+@pytest.mark.django_db
+class TestQuoteSeries:
+    """Tests for the multi-resolution quote series."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='series',
+            email='series@example.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        self.now = timezone.now()
+        for total, quote_status in [('100.00', 'approved'), ('40.00', 'sent')]:
+            quote = Quote.objects.create(
+                client=self.client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(total),
+                total=Decimal(total),
+                created_by=self.user
+            )
+            quote = Quote.objects.get(pk=quote.pk)
+            quote.status = 'sent'
+            quote.sent_at = self.now
+            quote.save()
+            if quote_status == 'approved':
+                quote.status = 'approved'
+                quote.approved_at = self.now
+                quote.save()
+
+    def _series(self, resolution='day'):
+        start = timezone.localtime(self.now).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        return get_series(start, start + timedelta(days=5), resolution)
+
+    def test_transitions_record_events(self):
+        """Test that creation and status transitions each record one event."""
+        assert QuoteSeriesDelta.objects.count() == 5
+        totals = self._series()['totals']
+        assert totals['created'] == 2
+        assert totals['sent'] == 2
+        assert totals['approved'] == 1
+        assert totals['revenue'] == 100.0
+        assert totals['conversion_rate'] == 100.0
+
+        quote = Quote.objects.get(status='approved')
+        quote.title = 'Renamed'
+        quote.save()
+        assert QuoteSeriesDelta.objects.count() == 5
+
+    def test_compaction_matches_pending_and_rebuild(self):
+        """Test that compacted and rebuilt series equal the pending deltas."""
+        pending = {resolution: self._series(resolution) for resolution in ('hour', 'day', 'week', 'month')}
+
+        assert compact_quote_series() == 5
+        assert not QuoteSeriesDelta.objects.exists()
+        for resolution, expected in pending.items():
+            assert self._series(resolution) == expected
+
+        rebuild_quote_series()
+        for resolution, expected in pending.items():
+            assert self._series(resolution) == expected
+
+    def test_series_endpoint(self):
+        """Test the points, the validation and the owner scope of the endpoint."""
+        compact_quote_series()
+        today = timezone.localdate(self.now)
+        response = self.client.get('/api/v1/analytics/series/', {
+            'start': (today - timedelta(days=1)).isoformat(),
+            'end': today.isoformat(),
+        })
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['time_zone'] == 'America/Sao_Paulo'
+        assert len(response.data['points']) == 2
+        assert response.data['points'][-1]['approved'] == 1
+        assert response.data['totals']['revenue'] == 100.0
+
+        assert self.client.get('/api/v1/analytics/series/', {'resolution': 'year'}).status_code == 400
+        assert self.client.get('/api/v1/analytics/series/', {'start': 'yesterday'}).status_code == 400
+        assert self.client.get('/api/v1/analytics/series/', {
+            'resolution': 'hour', 'start': '2020-01-01', 'end': '2024-01-01',
+        }).status_code == 400
+
+        other = User.objects.create_user(username='other', password='testpass123', role='salesperson')
+        self.client.force_authenticate(user=other)
+        response = self.client.get('/api/v1/analytics/series/')
+        assert response.data['totals']['created'] == 0
+
+
+def test_cover_days_uses_whole_months():
+    """Test that a date range is covered by whole months and edge days."""
+    months, days = cover_days(timezone.datetime(2024, 1, 30).date(), timezone.datetime(2024, 4, 2).date())
+
+    assert [str(month) for month in months] == ['2024-02-01', '2024-03-01']
+    assert [str(day) for day in days] == ['2024-01-30', '2024-01-31', '2024-04-01', '2024-04-02']
+
+
+@pytest.mark.django_db
+class TestQuoteValueQuantiles:
+    """Tests for the quote value sketches and percentiles endpoint."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='quantiles',
+            email='quantiles@example.com',
+            password='testpass123',
+            role='manager'
+        )
+        self.client.force_authenticate(user=self.user)
+        client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        painting = Service.objects.create(name='Pintura', description='Pintura', category='Reformas', base_price=10)
+        for value in range(1, 101):
+            quote = Quote.objects.create(
+                client=client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal(value),
+                total=Decimal(value),
+                created_by=self.user
+            )
+            QuoteItem.objects.create(
+                quote=quote, service=painting, description='Pintura',
+                quantity=1, unit_price=Decimal(value), total=Decimal(value),
+            )
+
+    def test_percentiles_per_user_and_category(self):
+        """Test that materialized sketches answer exact percentiles for small buckets."""
+        written = materialize_quote_sketches()
+        assert sum(written.values()) == QuoteValueSketch.objects.count() == 4
+
+        response = self.client.get('/api/v1/analytics/quantiles/')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [{
+            'key': str(self.user.pk), 'label': 'quantiles', 'count': 100, 'min': 1.0, 'max': 100.0,
+            'exact': True, 'p50': 50.0, 'p90': 90.0, 'p99': 99.0,
+        }]
+
+        response = self.client.get('/api/v1/analytics/quantiles/', {'by': 'category'})
+        assert response.data['results'][0]['key'] == 'Reformas'
+        assert response.data['results'][0]['p90'] == 90.0
+
+    def test_quantiles_validate_parameters_and_role(self):
+        """Test parameter validation and the manager restriction."""
+        assert self.client.get('/api/v1/analytics/quantiles/', {'by': 'client'}).status_code == 400
+        assert self.client.get('/api/v1/analytics/quantiles/', {'start': '2024-02-30'}).status_code == 400
+
+        self.user.role = 'salesperson'
+        self.user.save()
+        assert self.client.get('/api/v1/analytics/quantiles/').status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestDistinctClients:
+    """Tests for the HyperLogLog distinct-client counters."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.manager = User.objects.create_user(
+            username='distinct_manager',
+            email='manager@example.com',
+            password='testpass123',
+            role='manager'
+        )
+        self.seller = User.objects.create_user(
+            username='distinct_seller',
+            email='seller@example.com',
+            password='testpass123',
+            role='salesperson'
+        )
+        clients = [
+            Client.objects.create(
+                name=f'Client {index}',
+                email=f'client{index}@example.com',
+                phone='11999999999',
+                type='individual',
+                document=f'1234567890{index}',
+                created_by=self.manager
+            )
+            for index in range(3)
+        ]
+        for client_obj in clients[:2] + clients[:1]:
+            Quote.objects.create(
+                client=client_obj,
+                title='Test Quote',
+                description='Test Description',
+                subtotal=Decimal('10.00'),
+                total=Decimal('10.00'),
+                created_by=self.seller
+            )
+        record_activity(self.manager, 'client_added', 'Cliente adicionado', client_id=clients[2].pk)
+        record_activity(self.manager, 'client_added', 'Cliente adicionado', client_id=clients[0].pk)
+        self.today = timezone.localdate()
+
+    def _counts(self):
+        result = get_distinct_clients(self.today - timedelta(days=40), self.today, 'week')
+        return result['distinct_clients'], {row['username']: row['distinct_clients'] for row in result['users']}
+
+    def test_counts_match_after_compaction_and_rebuild(self):
+        """Test that pending, compacted and rebuilt counters agree."""
+        assert DistinctClientDelta.objects.count() == 5
+        expected = (3, {'distinct_seller': 2, 'distinct_manager': 2})
+        assert self._counts() == expected
+
+        assert compact_distinct_clients() == 5
+        assert self._counts() == expected
+
+        rebuild_distinct_clients()
+        assert self._counts() == expected
+
+    def test_endpoint_scopes_users(self):
+        """Test the points of the endpoint and that salespeople only see themselves."""
+        compact_distinct_clients()
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get('/api/v1/analytics/distinct-clients/', {'resolution': 'month'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['distinct_clients'] == 3
+        assert response.data['users'][0]['points'][-1]['distinct_clients'] == 2
+        assert self.client.get('/api/v1/analytics/distinct-clients/', {'resolution': 'year'}).status_code == 400
+
+        self.client.force_authenticate(user=self.seller)
+        response = self.client.get('/api/v1/analytics/distinct-clients/')
+        assert [row['username'] for row in response.data['users']] == ['distinct_seller']
+
+
+@pytest.mark.django_db
+class TestLeaderboard:
+    """Tests for the salesperson leaderboard."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='leaderboard_admin',
+            email='admin@example.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.sellers = [
+            User.objects.create_user(
+                username=f'leaderboard_seller{index}',
+                email=f'seller{index}@example.com',
+                password='testpass123',
+                role='salesperson'
+            )
+            for index in range(3)
+        ]
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.admin
+        )
+        self.quotes = [
+            Quote.objects.create(
+                client=self.client_obj,
+                title='Test Quote',
+                description='Test Description',
+                status='sent',
+                subtotal=total,
+                total=total,
+                created_by=self.admin,
+                assigned_to=seller
+            )
+            for seller, total in [
+                (self.sellers[0], Decimal('100.00')),
+                (self.sellers[1], Decimal('300.00')),
+                (self.sellers[1], Decimal('50.00')),
+                (self.sellers[2], Decimal('200.00')),
+            ]
+        ]
+        self.client.force_authenticate(user=self.admin)
+        for quote in self.quotes[:3]:
+            response = self.client.post(f'/api/v1/quotes/quotes/{quote.id}/approve/')
+            assert response.status_code == status.HTTP_200_OK
+
+    def _entries(self):
+        return sorted(LeaderboardEntry.objects.values_list('period', 'bucket', 'user_id', 'revenue', 'approved'))
+
+    def test_approvals_update_every_period_once(self):
+        """Test that each approval counts once in its week, month and year."""
+        response = self.client.post(f'/api/v1/quotes/quotes/{self.quotes[0].id}/approve/')
+        assert response.status_code == status.HTTP_200_OK
+        buckets = period_buckets(timezone.localdate())
+        assert set(LeaderboardEntry.objects.values_list('period', 'bucket').distinct()) == set(buckets.items())
+        entry = LeaderboardEntry.objects.get(period='month', user=self.sellers[1])
+        assert (entry.revenue, entry.approved) == (Decimal('350.00'), 2)
+        assert LeaderboardEntry.objects.get(period='week', user=self.sellers[0]).approved == 1
+
+    def test_approving_twice_counts_once(self):
+        """Test that approving an approved quote neither re-ranks, re-dates nor re-logs it."""
+        quote = self.quotes[3]
+        self.client.post(f'/api/v1/quotes/quotes/{quote.id}/approve/')
+        quote.refresh_from_db()
+        approved_at = quote.approved_at
+
+        response = self.client.post(f'/api/v1/quotes/quotes/{quote.id}/approve/')
+        assert response.status_code == status.HTTP_200_OK
+        quote.refresh_from_db()
+        assert quote.approved_at == approved_at
+        entry = LeaderboardEntry.objects.get(period='month', user=self.sellers[2])
+        assert (entry.revenue, entry.approved) == (Decimal('200.00'), 1)
+        assert DailyActivity.objects.filter(activity_type='quote_approved', quote=quote).count() == 1
+
+    def test_rebuild_repairs_drift(self):
+        """Test that the rebuild recomputes the entries from the approved quotes."""
+        expected = self._entries()
+        LeaderboardEntry.objects.filter(user=self.sellers[0]).delete()
+        LeaderboardEntry.objects.filter(user=self.sellers[1]).update(approved=7)
+        assert rebuild_leaderboard() == 6
+        assert self._entries() == expected
+
+    def test_top_and_rank_endpoints(self):
+        """Test the top-N ranking and the requesting user's rank."""
+        response = self.client.get('/api/v1/analytics/leaderboard/', {'period': 'week', 'limit': 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['bucket'] == period_buckets(timezone.localdate())['week'].isoformat()
+        assert [(row['rank'], row['username'], row['score']) for row in response.data['results']] == [
+            (1, 'leaderboard_seller1', 350.0),
+        ]
+        response = self.client.get('/api/v1/analytics/leaderboard/', {'metric': 'approved'})
+        assert [row['score'] for row in response.data['results']] == [2, 1]
+
+        self.client.force_authenticate(user=self.sellers[0])
+        response = self.client.get('/api/v1/analytics/leaderboard/me/')
+        assert (response.data['rank'], response.data['score'], response.data['total']) == (2, 100.0, 2)
+        self.client.force_authenticate(user=self.sellers[2])
+        assert self.client.get('/api/v1/analytics/leaderboard/me/').data['rank'] is None
+        assert self.client.get('/api/v1/analytics/leaderboard/', {'period': 'day'}).status_code == 400
+        assert self.client.get('/api/v1/analytics/leaderboard/', {'date': '2026-13-01'}).status_code == 400
+
+
+class _FakeSortedSets:
+    """Sorted-set subset of the Redis client; pipelines run their commands on execute."""
+
+    def __init__(self):
+        self.sets = {}
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+    def zincrby(self, key, amount, member):
+        members = self.sets.setdefault(key, {})
+        members[str(member)] = members.get(str(member), 0) + amount
+        return members[str(member)]
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update({str(member): score for member, score in mapping.items()})
+
+    def _ordered(self, key):
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: (-item[1], item[0]))
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        return self._ordered(key)[start:stop + 1]
+
+    def zrevrank(self, key, member):
+        members = [name for name, _ in self._ordered(key)]
+        return members.index(str(member)) if str(member) in members else None
+
+    def zscore(self, key, member):
+        return self.sets.get(key, {}).get(str(member))
+
+    def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+    def scan_iter(self, match):
+        return [key for key in self.sets if key.startswith(match.rstrip('*'))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.sets.pop(key, None)
+
+
+def test_redis_leaderboard_ranks_and_replaces(settings):
+    settings.LEADERBOARD_KEY_PREFIX = 'test:leaderboard'
+    day = datetime(2026, 3, 11).date()
+    bucket = period_buckets(day)['month']
+    leaderboard = RedisLeaderboard(client=_FakeSortedSets())
+    leaderboard.record(1, day, Decimal('100.00'))
+    leaderboard.record(2, day, Decimal('40.00'))
+    leaderboard.record(2, day, Decimal('80.00'))
+
+    assert leaderboard.top('month', bucket, 'revenue', 10) == [(2, 120.0), (1, 100.0)]
+    assert leaderboard.top('year', bucket.replace(month=1), 'approved', 1) == [(2, 2)]
+    assert leaderboard.rank('week', period_buckets(day)['week'], 'revenue', 1) == (2, 100.0, 2)
+    assert leaderboard.rank('month', bucket, 'revenue', 3) == (None, None, 2)
+
+    leaderboard.replace({('month', bucket): {3: (Decimal('5.00'), 1)}})
+    assert leaderboard.top('month', bucket, 'revenue', 10) == [(3, 5.0)]
+    assert leaderboard.rank('week', period_buckets(day)['week'], 'revenue', 1) == (None, None, 0)
+
+
+def test_query_cache_coalesces_concurrent_misses(settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    cache.clear()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': len(calls)}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            cached_query('test', {'b': '2', 'a': ['1']}, 'all', compute, tags=['quotes'])
+        ))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == [{'value': 1}] * 4
+
+    assert cached_query('test', {'a': '1', 'b': '2', 'c': ''}, 'all', compute, tags=['quotes']) == {'value': 1}
+    invalidate('quotes')
+    assert cached_query('test', {'a': '1', 'b': '2'}, 'all', compute, tags=['quotes']) == {'value': 2}
+    stats = get_cache_stats()['test']
+    assert (stats['hits'], stats['coalesced'], stats['misses']) == (1, 3, 2)
+    assert normalize_params({'b': ['2', '1'], 'a': '', 'c': '3'}) == [['b', ['1', '2']], ['c', ['3']]]
+
+
+@pytest.mark.django_db
+class TestAnalyticsCache:
+    """Tests for the cached analytics endpoints."""
+
+    def setup_method(self):
+        """Setup test data."""
+        self.client = APIClient()
+        self.manager = User.objects.create_user(
+            username='cache_manager',
+            email='manager@example.com',
+            password='testpass123',
+            role='manager'
+        )
+        self.sellers = [
+            User.objects.create_user(
+                username=f'cache_seller{index}',
+                email=f'seller{index}@example.com',
+                password='testpass123',
+                role='salesperson'
+            )
+            for index in range(2)
+        ]
+        self.client_obj = Client.objects.create(
+            name='Test Client',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.manager
+        )
+
+    def _quote(self, seller):
+        return Quote.objects.create(
+            client=self.client_obj,
+            title='Test Quote',
+            description='Test Description',
+            subtotal=Decimal('10.00'),
+            total=Decimal('10.00'),
+            created_by=seller
+        )
+
+    def _total_quotes(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/v1/analytics/dashboard/')
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['total_quotes']
+
+    def test_saves_invalidate_team_and_owner_scopes(self, settings, django_assert_num_queries, django_capture_on_commit_callbacks):
+        """Test that results are cached per scope and invalidated by their owners' quotes."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        cache.clear()
+        assert (self._total_quotes(self.manager), self._total_quotes(self.sellers[0])) == (0, 0)
+        self.client.force_authenticate(user=self.manager)
+        with django_assert_num_queries(0):
+            self.client.get('/api/v1/analytics/dashboard/')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self._quote(self.sellers[1])
+        assert self._total_quotes(self.manager) == 1
+        assert self._total_quotes(self.sellers[0]) == 0
+        assert self._total_quotes(self.sellers[1]) == 1
+
+        flush_stats()
+        stats = get_cache_stats()['dashboard']
+        assert (stats['hits'], stats['misses']) == (2, 4)
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get('/api/v1/analytics/cache-stats/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        self.manager.role = 'admin'
+        self.manager.save()
+        response = self.client.get('/api/v1/analytics/cache-stats/')
+        assert response.data['endpoints']['dashboard']['hits'] == 2
+
+    def test_bulk_import_and_activity_invalidate_client_scopes(self, settings, django_capture_on_commit_callbacks):
+        """Test that bulk imported clients and logged client activity invalidate cached client results."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        cache.clear()
+        self.client.force_authenticate(user=self.manager)
+        assert self.client.get('/api/v1/analytics/dashboard/').data['total_clients'] == 1
+
+        body = 'name,email,phone,type,document\nNew Client,new@client.com,11988888888,individual,22222222222\n'
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.generic('POST', '/api/v1/clients/import/', body.encode('utf-8'), content_type='text/csv')
+        assert response.data['created'] == 1
+        assert self.client.get('/api/v1/analytics/dashboard/').data['total_clients'] == 2
+
+        self.client.force_authenticate(user=self.sellers[0])
+        assert self.client.get('/api/v1/analytics/distinct-clients/').data['distinct_clients'] == 0
+        with django_capture_on_commit_callbacks(execute=True):
+            record_activity(self.sellers[0], 'client_added', 'Cliente adicionado', client_id=self.client_obj.pk)
+        assert self.client.get('/api/v1/analytics/distinct-clients/').data['distinct_clients'] == 1
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SalesMetricsViewSet, DailyActivityViewSet, ReportViewSet
+from .views import SalesMetricsViewSet, DailyActivityViewSet, ReportViewSet, DashboardView, CohortView, SeriesView, QuantileView, DistinctClientsView, LeaderboardView, CacheStatsView
 
 router = DefaultRouter()
 router.register(r'metrics', SalesMetricsViewSet)
@@ -8,6 +8,14 @@ router.register(r'activities', DailyActivityViewSet)
 router.register(r'reports', ReportViewSet)
 
 urlpatterns = [
+    path('dashboard/', DashboardView.as_view(), name='analytics-dashboard'),
+    path('cohorts/', CohortView.as_view(), name='analytics-cohorts'),
+    path('series/', SeriesView.as_view(), name='analytics-series'),
+    path('quantiles/', QuantileView.as_view(), name='analytics-quantiles'),
+    path('distinct-clients/', DistinctClientsView.as_view(), name='analytics-distinct-clients'),
+    path('leaderboard/', LeaderboardView.as_view(), name='analytics-leaderboard'),
+    path('leaderboard/me/', LeaderboardView.as_view(mine=True), name='analytics-leaderboard-me'),
+    path('cache-stats/', CacheStatsView.as_view(), name='analytics-cache-stats'),
     path('', include(router.urls)),
 ]
 
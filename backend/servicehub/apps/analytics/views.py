@@ -1,12 +1,54 @@
-from rest_framework import viewsets
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from redis.exceptions import RedisError
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import SalesMetrics, DailyActivity, Report
-from .serializers import SalesMetricsSerializer, DailyActivitySerializer, ReportSerializer
+from .serializers import (
+    SalesMetricsSerializer, DailyActivitySerializer, ReportSerializer, ReportListSerializer, ReportExportSerializer,
+)
+from .activity import get_stats
+from .cohorts import get_cohorts, month_index
+from .columnar import read_rows
+from .distinct import RESOLUTIONS as DISTINCT_RESOLUTIONS, get_distinct_clients
+from .leaderboard import METRICS as LEADERBOARD_METRICS, PERIODS as LEADERBOARD_PERIODS, get_leaderboard, period_buckets
+from .metrics import parse_month
+from .quantiles import DIMENSIONS, get_quantiles
+from .query_cache import cached_query, get_cache_stats, request_scope, scope_tags
+from .rollups import PENDING_STATUSES, get_quote_totals
+from .series import RESOLUTIONS, bucket_start, get_series
+from .tasks import generate_report_task
+from servicehub.apps.clients.models import Client
+from servicehub.utils.filters import ReportFilter
+from servicehub.utils.permissions import IsAdmin, IsManager
+from servicehub.utils.querysets import EagerLoadingMixin
+
+User = get_user_model()
+
+REPORT_ROWS_PAGE_SIZE = 1000
+REPORT_ROWS_MAX_PAGE_SIZE = 10000
+MAX_COHORT_MONTHS = 60
+MAX_SERIES_POINTS = 1000
+QUANTILE_DEFAULT_DAYS = 90
+DISTINCT_POINT_DAYS = {'day': 1, 'week': 7, 'month': 28}
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
 
 
-class SalesMetricsViewSet(viewsets.ReadOnlyModelViewSet):
+class SalesMetricsViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Sales Metrics (Read-only).
     """
@@ -18,9 +60,13 @@ class SalesMetricsViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['user', 'period_start', 'period_end']
     ordering_fields = ['period_end']
     ordering = ['-period_end']
+    eager_loading = {
+        'list': {'select_related': ['user']},
+        'retrieve': {'select_related': ['user']},
+    }
 
 
-class DailyActivityViewSet(viewsets.ReadOnlyModelViewSet):
+class DailyActivityViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Daily Activities (Read-only).
     """
@@ -33,9 +79,22 @@ class DailyActivityViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['description']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    eager_loading = {
+        'list': {'select_related': ['user']},
+        'retrieve': {'select_related': ['user']},
+    }
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def ingestion(self, request):
+        """Backpressure counters of the activity recorder in the serving process."""
+        return Response({
+            'mode': settings.ACTIVITY_LOG_MODE,
+            'pid': os.getpid(),
+            'stats': get_stats(),
+        })
 
 
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for Reports.
     """
@@ -44,8 +103,401 @@ class ReportViewSet(viewsets.ModelViewSet):
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['report_type']
+    filterset_class = ReportFilter
     search_fields = ['name', 'description']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    eager_loading = {
+        action: {'select_related': ['created_by']}
+        for action in ['retrieve', 'update', 'partial_update', 'export']
+    }
+    eager_loading['list'] = {'select_related': ['created_by'], 'defer': ['data', 'manifest']}
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ReportListSerializer
+        return super().get_serializer_class()
+    
+    def get_queryset(self):
+        """Admins and managers see every report; other users their own."""
+        queryset = super().get_queryset()
+        if self.request.user.role in ('admin', 'manager'):
+            return queryset
+        return queryset.filter(created_by=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+    
+    @action(detail=False, methods=['post'])
+    def export(self, request):
+        """
+        Queue a report build and return the report as the job handle.
+        
+        Poll the report until ``status`` is ``completed`` and fetch the file
+        from ``download_url``.
+        """
+        serializer = ReportExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report = serializer.save(created_by=request.user)
+        transaction.on_commit(lambda: generate_report_task.delay(report.pk))
+        return Response(self.get_serializer(report).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def rows(self, request, pk=None):
+        """
+        Read a slice of the report table.
+        
+        ``columns`` (comma separated) selects columns, ``offset``/``limit``
+        the rows; only the requested parts of the column files are read.
+        """
+        report = self.get_object()
+        if not report.manifest:
+            return Response(
+                {'detail': 'Este relatório não possui dados tabulares.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        names = [column['name'] for column in report.manifest['columns']]
+        columns = request.query_params.get('columns')
+        columns = [name.strip() for name in columns.split(',') if name.strip()] if columns else None
+        unknown = sorted(set(columns or []) - set(names))
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', REPORT_ROWS_PAGE_SIZE)), 1), REPORT_ROWS_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'detail': 'offset e limit devem ser inteiros.'}, status=status.HTTP_400_BAD_REQUEST)
+        if unknown:
+            return Response({'columns': [f'Coluna desconhecida: {name}' for name in unknown]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        selected, rows = read_rows(report.pk, report.manifest, columns, offset, offset + limit)
+        return Response({
+            'columns': selected,
+            'count': report.row_count,
+            'offset': offset,
+            'limit': limit,
+            'rows': rows,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the generated CSV/XLSX file."""
+        report = self.get_object()
+        if report.status != 'completed' or not report.file:
+            return Response(
+                {'detail': 'O relatório ainda não está disponível.', 'status': report.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            report.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(report.file.name),
+        )
+
+
+
+class DashboardView(APIView):
+    """
+    Dashboard totals served from the quote rollups.
+    
+    Admins and managers see every quote; other users see the quotes assigned
+    to (or created by) them.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        scope = request_scope(request.user)
+        return Response(cached_query(
+            'dashboard', request.query_params, scope,
+            lambda: self.compute(request.user, scope == 'all'),
+            tags=scope_tags(scope, 'quotes', 'clients'),
+        ))
+    
+    def compute(self, user, sees_all):
+        totals = get_quote_totals(user=None if sees_all else user)
+        clients = Client.objects.all()
+        if not sees_all:
+            # Same owner rule as the quote totals: the assignee, else the creator.
+            clients = clients.filter(Q(assigned_to=user) | Q(assigned_to__isnull=True, created_by=user))
+        
+        def count(statuses):
+            return sum(totals.get(status, {}).get('count', 0) for status in statuses)
+        
+        return {
+            'total_clients': clients.count(),
+            'total_quotes': count(totals),
+            'pending_quotes': count(PENDING_STATUSES),
+            'approved_quotes': count(['approved']),
+            'total_revenue': float(totals.get('approved', {}).get('total', 0)),
+            'quotes_by_status': {
+                status: {'count': bucket['count'], 'total': float(bucket['total'])}
+                for status, bucket in totals.items()
+                if bucket['count']
+            },
+        }
 
+
+class CohortView(APIView):
+    """
+    Client cohorts by month of first approved quote (managers and admins).
+    
+    ``start`` and ``end`` are ``YYYY-MM`` cohort months, defaulting to the
+    last twelve months.
+    """
+    
+    permission_classes = [IsAuthenticated, IsManager]
+    
+    def get(self, request):
+        end_index = month_index(timezone.localdate())
+        try:
+            if request.query_params.get('end'):
+                end_index = month_index(parse_month(request.query_params['end'])[0])
+            start_index = end_index - 11
+            if request.query_params.get('start'):
+                start_index = month_index(parse_month(request.query_params['start'])[0])
+        except ValueError:
+            return Response({'detail': 'Use meses no formato AAAA-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= end_index - start_index < MAX_COHORT_MONTHS:
+            return Response(
+                {'detail': f'O intervalo deve ter entre 1 e {MAX_COHORT_MONTHS} meses.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_cohorts(start_index, end_index))
+
+
+def _parse_moment(value, end=False):
+    """
+    Parse a ``YYYY-MM-DD`` date or an ISO datetime (local time when naive).
+    A date ``end`` includes the whole day.
+    """
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class SeriesView(APIView):
+    """
+    Conversion and revenue series from the multi-resolution quote rollups.
+    
+    ``resolution`` is hour, day (default), week or month; ``start`` and
+    ``end`` are dates or datetimes, defaulting to the last 30 days, and are
+    widened to whole hours. Admins and managers see every owner (or one with
+    ``user``); other users see their own quotes.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        params = request.query_params
+        resolution = params.get('resolution', 'day')
+        if resolution not in RESOLUTIONS:
+            return Response(
+                {'detail': f'resolution deve ser um de: {", ".join(RESOLUTIONS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = _parse_moment(params['end'], end=True) if params.get('end') else timezone.now()
+            start = _parse_moment(params['start']) if params.get('start') else end - timedelta(days=30)
+        except ValueError:
+            return Response(
+                {'detail': 'Use datas AAAA-MM-DD ou data e hora ISO 8601.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start = bucket_start(start, 'hour')
+        if bucket_start(end, 'hour') < end:
+            end = bucket_start(end, 'hour') + timedelta(hours=1)
+        if start >= end:
+            return Response({'detail': 'start deve ser anterior a end.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        approximate_points = (end - start) / {
+            'hour': timedelta(hours=1), 'day': timedelta(days=1),
+            'week': timedelta(weeks=1), 'month': timedelta(days=28),
+        }[resolution]
+        if approximate_points > MAX_SERIES_POINTS:
+            return Response(
+                {'detail': f'O intervalo excede {MAX_SERIES_POINTS} pontos; use uma resolução maior.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user = request.user
+        if request.user.role in ('admin', 'manager'):
+            user = params.get('user') or None
+            if user is not None and not user.isdigit():
+                return Response({'detail': 'user deve ser um id.'}, status=status.HTTP_400_BAD_REQUEST)
+        scope = request_scope(request.user)
+        return Response(cached_query(
+            'series', params, scope,
+            lambda: get_series(start, end, resolution, user=user),
+            tags=scope_tags(scope, 'quotes'),
+        ))
+
+
+class QuantileView(APIView):
+    """
+    Quote value percentiles (p50, p90, p99) per owner or service category,
+    merged from the quote value sketches (managers and admins).
+    
+    ``by`` is ``user`` (default) or ``category``; ``start`` and ``end`` are
+    dates of quote creation, defaulting to the last 90 days; ``key`` (may be
+    repeated) limits the owners or categories returned.
+    """
+    
+    permission_classes = [IsAuthenticated, IsManager]
+    
+    def get(self, request):
+        params = request.query_params
+        dimension = params.get('by', 'user')
+        if dimension not in DIMENSIONS:
+            return Response(
+                {'detail': f'by deve ser um de: {", ".join(DIMENSIONS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+            start = parse_date(params['start']) if params.get('start') else end - timedelta(days=QUANTILE_DEFAULT_DAYS - 1)
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            return Response({'detail': 'Use datas no formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'detail': 'start deve ser anterior a end.'}, status=status.HTTP_400_BAD_REQUEST)
+        keys = params.getlist('key') or None
+        return Response(cached_query(
+            'quantiles', params, request_scope(request.user),
+            lambda: get_quantiles(dimension, start, end, keys=keys),
+            tags=['quote_sketches'],
+        ))
+
+
+class DistinctClientsView(APIView):
+    """
+    Approximate distinct active clients per user from HyperLogLog counters.
+    
+    ``resolution`` (day, week or month; default week) sets the points;
+    ``start`` and ``end`` are dates, defaulting to the last 12 weeks. Admins
+    and managers see every user (or those given in ``user``, which may be
+    repeated); other users see themselves.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        params = request.query_params
+        resolution = params.get('resolution', 'week')
+        if resolution not in DISTINCT_RESOLUTIONS:
+            return Response(
+                {'detail': f'resolution deve ser um de: {", ".join(DISTINCT_RESOLUTIONS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end = parse_date(params['end']) if params.get('end') else timezone.localdate()
+            start = parse_date(params['start']) if params.get('start') else end - timedelta(weeks=12) + timedelta(days=1)
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            return Response({'detail': 'Use datas no formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'detail': 'start deve ser anterior a end.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days / DISTINCT_POINT_DAYS[resolution] > MAX_SERIES_POINTS:
+            return Response(
+                {'detail': f'O intervalo excede {MAX_SERIES_POINTS} pontos; use uma resolução maior.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        users = [request.user.pk]
+        if request.user.role in ('admin', 'manager'):
+            users = params.getlist('user') or None
+            if users is not None and not all(user.isdigit() for user in users):
+                return Response({'detail': 'user deve ser um id.'}, status=status.HTTP_400_BAD_REQUEST)
+        scope = request_scope(request.user)
+        return Response(cached_query(
+            'distinct-clients', params, scope,
+            lambda: get_distinct_clients(start, end, resolution, users=users),
+            tags=scope_tags(scope, 'quotes', 'clients'),
+        ))
+
+
+class LeaderboardView(APIView):
+    """
+    Salesperson ranking by approved revenue or approved quotes.
+    
+    ``period`` is week, month (default) or year and ``date`` (default today)
+    picks the bucket; ``metric`` is ``revenue`` (default) or ``approved``.
+    ``GET leaderboard/`` returns the top ``limit`` users and
+    ``GET leaderboard/me/`` the requesting user's rank.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    mine = False
+    
+    def get(self, request):
+        params = request.query_params
+        period = params.get('period', 'month')
+        metric = params.get('metric', 'revenue')
+        if period not in LEADERBOARD_PERIODS or metric not in LEADERBOARD_METRICS:
+            return Response(
+                {'detail': (
+                    f'period deve ser um de: {", ".join(LEADERBOARD_PERIODS)}; '
+                    f'metric, um de: {", ".join(LEADERBOARD_METRICS)}.'
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            day = parse_date(params['date']) if params.get('date') else timezone.localdate()
+            limit = min(max(int(params.get('limit', LEADERBOARD_DEFAULT_LIMIT)), 1), LEADERBOARD_MAX_LIMIT)
+        except (TypeError, ValueError):
+            day = None
+        if day is None:
+            return Response(
+                {'detail': 'Use date no formato AAAA-MM-DD e limit inteiro.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        bucket = period_buckets(day)[period]
+        leaderboard = get_leaderboard()
+        result = {'period': period, 'bucket': bucket.isoformat(), 'metric': metric}
+        if self.mine:
+            rank, score, total = leaderboard.rank(period, bucket, metric, request.user.pk)
+            return Response({**result, 'rank': rank, 'score': score, 'total': total})
+        
+        top = leaderboard.top(period, bucket, metric, limit)
+        users = {
+            user.pk: user
+            for user in User.objects.filter(pk__in=[user_id for user_id, _ in top])
+        }
+        return Response({
+            **result,
+            'results': [
+                {
+                    'rank': position,
+                    'user': user_id,
+                    'username': users[user_id].username if user_id in users else None,
+                    'name': users[user_id].get_full_name() if user_id in users else '',
+                    'score': score,
+                }
+                for position, (user_id, score) in enumerate(top, start=1)
+            ],
+        })
+
+
+class CacheStatsView(APIView):
+    """
+    Hit, miss and latency counters of the analytics result cache per
+    endpoint (admins).
+    """
+    
+    permission_classes = [IsAuthenticated, IsAdmin]
+    
+    def get(self, request):
+        try:
+            stats = get_cache_stats()
+        except RedisError:
+            return Response({'detail': 'Cache indisponível.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'timeout': settings.ANALYTICS_CACHE_TIMEOUT, 'endpoints': stats})
@@ -0,0 +1,177 @@
+"""
+Streaming bulk import of clients from CSV or NDJSON.
+
+Rows are read lazily from the upload and processed in fixed-size chunks: each
+chunk is validated row by row, its ``email``/``document`` uniqueness and
+``assigned_to`` references are resolved with one query each, and the valid
+rows are written with a single ``bulk_create``. Only the error report is kept
+in memory.
+"""
+
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import Client
+from .serializers import ClientImportSerializer
+
+User = get_user_model()
+
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+IMPORT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+
+def get_import_format(content_type, filename=None):
+    """Return ``'csv'``, ``'ndjson'`` or ``None`` for an upload."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in IMPORT_CONTENT_TYPES:
+        return IMPORT_CONTENT_TYPES[content_type]
+    if filename:
+        for extension, import_format in IMPORT_EXTENSIONS.items():
+            if filename.lower().endswith(extension):
+                return import_format
+    return None
+
+
+def iter_lines(stream):
+    """Decode a binary line iterator (request body or upload) incrementally."""
+    return codecs.iterdecode(stream, 'utf-8-sig')
+
+
+def iter_csv_rows(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def iter_ndjson_rows(lines):
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, {'non_field_errors': ['JSON inválido.']}
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, {'non_field_errors': ['Cada linha deve ser um objeto JSON.']}
+            continue
+        yield line_number, row, None
+
+
+ROW_READERS = {
+    'csv': iter_csv_rows,
+    'ndjson': iter_ndjson_rows,
+}
+
+
+class ClientImporter:
+    """Import client rows chunk by chunk, collecting a per-row error report."""
+
+    def __init__(self, user, save, chunk_size=500):
+        self.user = user
+        self.save = save
+        self.chunk_size = chunk_size
+
+    def run(self, rows):
+        report = {'created': 0, 'failed': 0, 'errors': []}
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk, report)
+        return report
+
+    def _fail(self, report, line, errors):
+        report['failed'] += 1
+        report['errors'].append({'row': line, 'errors': errors})
+
+    def _import_chunk(self, chunk, report):
+        valid = []
+        for line, row, errors in chunk:
+            if errors:
+                self._fail(report, line, errors)
+                continue
+            serializer = ClientImportSerializer(data=self._clean_row(row))
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                self._fail(report, line, serializer.errors)
+
+        if not valid:
+            return
+
+        emails = {data['email'] for _, data in valid}
+        documents = {data['document'] for _, data in valid}
+        taken = list(Client.all_objects.filter(
+            Q(email__in=emails) | Q(document__in=documents)
+        ).values_list('email', 'document'))
+        taken_emails = {email for email, _ in taken}
+        taken_documents = {document for _, document in taken}
+
+        assignee_ids = {data['assigned_to'] for _, data in valid if data.get('assigned_to')}
+        known_assignees = set(
+            User.objects.filter(pk__in=assignee_ids).values_list('pk', flat=True)
+        ) if assignee_ids else set()
+
+        lines = []
+        instances = []
+        for line, data in valid:
+            errors = {}
+            if data['email'] in taken_emails:
+                errors['email'] = ['Já existe um cliente com este email.']
+            if data['document'] in taken_documents:
+                errors['document'] = ['Já existe um cliente com este CPF/CNPJ.']
+            assigned_to = data.pop('assigned_to', None)
+            if assigned_to and assigned_to not in known_assignees:
+                errors['assigned_to'] = ['Usuário não encontrado.']
+            if errors:
+                self._fail(report, line, errors)
+                continue
+            # Later rows in the same chunk must not reuse these keys either.
+            taken_emails.add(data['email'])
+            taken_documents.add(data['document'])
+            lines.append(line)
+            instances.append(Client(created_by=self.user, assigned_to_id=assigned_to, **data))
+
+        if not instances:
+            return
+
+        try:
+            with transaction.atomic():
+                self.save(instances)
+        except IntegrityError:
+            # A concurrent writer took one of the keys between the check and
+            # the insert; report the chunk rather than guessing which row.
+            for line in lines:
+                self._fail(report, line, {'non_field_errors': ['Conflito ao gravar o lote; reenvie a linha.']})
+            return
+        report['created'] += len(instances)
+
+    @staticmethod
+    def _clean_row(row):
+        """Drop empty cells so model defaults apply and ``required`` errors surface."""
+        cleaned = {}
+        for key, value in row.items():
+            if isinstance(value, str):
+                value = value.strip()
+            if key and value not in (None, ''):
+                cleaned[key.strip()] = value
+        return cleaned
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from servicehub.utils.models import SoftDeleteModel, AuditModel
@@ -50,6 +51,9 @@ class Client(SoftDeleteModel, AuditModel):
     # Timestamps
     last_contact = models.DateTimeField(_('último contato'), null=True, blank=True)
     
+    # Search (maintained by a database trigger, see servicehub.utils.search)
+    search_vector = SearchVectorField(_('vetor de busca'), null=True, editable=False)
+    
     class Meta:
         verbose_name = _('Cliente')
         verbose_name_plural = _('Clientes')
@@ -69,6 +69,23 @@ class ClientCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class ClientImportSerializer(ClientCreateSerializer):
+    """
+    Row serializer for bulk imports.
+    
+    Uniqueness and ``assigned_to`` are resolved once per chunk by the importer,
+    so the per-row validators that would each issue a query are disabled here.
+    """
+    
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta(ClientCreateSerializer.Meta):
+        extra_kwargs = {
+            'email': {'validators': []},
+            'document': {'validators': []},
+        }
+
+
 class ClientListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for list views."""
     
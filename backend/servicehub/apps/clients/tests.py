@@ -6,6 +6,7 @@ import pytest
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from servicehub.utils.models import AuditLog
 from .models import Client, ClientContact
 
 User = get_user_model()
@@ -156,3 +157,137 @@ class TestClientAPI:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data['results']) == 1
 
+    
+    def test_list_clients_cursor_pagination(self):
+        """Test walking every page of clients with the keyset cursor."""
+        self.client.force_authenticate(user=self.user)
+        for index in range(5):
+            Client.objects.create(
+                name=f'Client {index}',
+                email=f'client{index}@example.com',
+                phone='11999999999',
+                type='individual',
+                document=f'1234567890{index}',
+                created_by=self.user
+            )
+        # Force ties on created_at so the id tiebreaker is exercised.
+        Client.objects.update(created_at=Client.objects.first().created_at)
+        
+        seen = []
+        url = '/api/v1/clients/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 2
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        
+        assert sorted(seen, reverse=True) == seen
+        assert len(set(seen)) == 5
+    
+    def test_deleted_clients_paginated(self):
+        """Test the deleted action returns a paginated payload."""
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Removed Client',
+            email='removed@client.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        client.delete()
+        response = self.client.get('/api/v1/clients/deleted/')
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [client.id]
+    
+    def test_contacts_ignore_client_ordering(self):
+        """Test the contacts action ignores the client ``?ordering`` fields."""
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Contact Client',
+            email='contacts@client.com',
+            phone='11999999999',
+            type='company',
+            document='12345678000190',
+            created_by=self.user,
+            assigned_to=self.user
+        )
+        first = ClientContact.objects.create(client=client, name='First')
+        second = ClientContact.objects.create(client=client, name='Second')
+        response = self.client.get(f'/api/v1/clients/{client.id}/contacts/?ordering=status')
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [second.id, first.id]
+
+
+@pytest.mark.django_db
+class TestClientImportAPI:
+    """Tests for the bulk client import endpoint."""
+    
+    def setup_method(self):
+        """Setup test client and users."""
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='importer',
+            email='importer@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def test_import_csv(self):
+        """Test importing a CSV body with a duplicate and an invalid row."""
+        Client.objects.create(
+            name='Existing Client',
+            email='existing@client.com',
+            phone='11999999999',
+            type='individual',
+            document='11111111111',
+            created_by=self.user
+        )
+        body = (
+            'name,email,phone,type,document,city\n'
+            'First Client,first@client.com,11999999999,individual,22222222222,São Paulo\n'
+            'Dup Client,existing@client.com,11999999999,individual,33333333333,\n'
+            'X,bad,1,individual,44444444444,\n'
+            'Second Client,second@client.com,11988888888,company,55555555555555,\n'
+            'Twin Client,second@client.com,11988888888,company,66666666666666,\n'
+        )
+        response = self.client.generic(
+            'POST', '/api/v1/clients/import/', body.encode('utf-8'), content_type='text/csv'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 2
+        assert response.data['failed'] == 3
+        assert [error['row'] for error in response.data['errors']] == [4, 3, 6]
+        assert Client.objects.get(email='first@client.com').city == 'São Paulo'
+        assert Client.objects.get(email='second@client.com').created_by == self.user
+        assert AuditLog.objects.filter(model_name='Client', action='create').count() == 2
+    
+    def test_import_ndjson_in_chunks(self, monkeypatch):
+        """Test importing NDJSON across several chunks with one bad line."""
+        from .views import ClientViewSet
+        monkeypatch.setattr(ClientViewSet, 'import_chunk_size', 2)
+        lines = [
+            '{"name": "Client %d", "email": "c%d@client.com", "phone": "11999999999", '
+            '"document": "1234567890%d"}' % (index, index, index)
+            for index in range(5)
+        ]
+        lines.insert(2, '{not json')
+        response = self.client.generic(
+            'POST', '/api/v1/clients/import/', '\n'.join(lines).encode('utf-8'),
+            content_type='application/x-ndjson'
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['created'] == 5
+        assert response.data['errors'] == [
+            {'row': 3, 'errors': {'non_field_errors': ['JSON inválido.']}}
+        ]
+    
+    def test_import_rejects_unknown_format(self):
+        """Test unsupported content types are refused."""
+        response = self.client.generic(
+            'POST', '/api/v1/clients/import/', b'<xml/>', content_type='application/xml'
+        )
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
@@ -6,36 +6,59 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Client, ClientContact
 from .serializers import ClientSerializer, ClientCreateSerializer, ClientContactSerializer, ClientListSerializer
+from .importers import ClientImporter, ROW_READERS, get_import_format, iter_lines
+from servicehub.apps.analytics.activity import record_activity
 from servicehub.utils.audit import AuditMixin
+from servicehub.utils.querysets import EagerLoadingMixin
+from servicehub.utils.exports import ExportMixin
 from servicehub.utils.permissions import IsClientOwnerOrAdmin
 from servicehub.utils.filters import ClientFilter
+from servicehub.utils.pagination import FixedOrderingCursorPagination, KeysetCursorPagination
+from servicehub.utils.search import FullTextSearchFilter
 
 
-class ClientViewSet(AuditMixin, viewsets.ModelViewSet):
+class ClientViewSet(EagerLoadingMixin, AuditMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for Client management with audit trail and advanced filtering.
     
     Endpoints:
-    - GET /api/v1/clients/ - List all clients
+    - GET /api/v1/clients/ - List all clients (cursor paginated)
     - POST /api/v1/clients/ - Create a new client
+    - POST /api/v1/clients/import/ - Bulk import clients from CSV or NDJSON
+    - GET /api/v1/clients/export/?format=csv|ndjson|xlsx - Stream filtered clients
     - GET /api/v1/clients/{id}/ - Retrieve a client
     - PUT /api/v1/clients/{id}/ - Update a client
     - DELETE /api/v1/clients/{id}/ - Soft delete a client
     - POST /api/v1/clients/{id}/restore/ - Restore a deleted client
     - POST /api/v1/clients/{id}/add-contact/ - Add a contact
-    - GET /api/v1/clients/{id}/contacts/ - List contacts
-    - GET /api/v1/clients/deleted/list/ - List deleted clients
+    - GET /api/v1/clients/{id}/contacts/ - List contacts (cursor paginated)
+    - GET /api/v1/clients/deleted/ - List deleted clients (cursor paginated)
     """
     
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated, IsClientOwnerOrAdmin]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_class = ClientFilter
     search_fields = ['name', 'email', 'document', 'company_name', 'phone']
-    ordering_fields = ['created_at', 'name', 'status']
+    ordering_fields = ['created_at', 'name', 'status', 'search_rank']
     ordering = ['-created_at']
-    pagination_class = None  # Use default pagination
+    pagination_class = KeysetCursorPagination
+    eager_loading = {
+        action: {
+            'select_related': ['created_by', 'assigned_to'],
+            'prefetch_related': ['contacts'],
+        }
+        for action in ['retrieve', 'update', 'partial_update', 'deleted']
+    }
+    import_chunk_size = 500
+    export_filename = 'clientes'
+    export_fields = [
+        'id', 'name', 'email', 'phone', 'type', 'document',
+        'address', 'city', 'state', 'zip_code', 'company_name',
+        'contact_person', 'status', 'assigned_to', 'assigned_to__username',
+        'created_at', 'updated_at', 'last_contact',
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -46,7 +69,7 @@ class ClientViewSet(AuditMixin, viewsets.ModelViewSet):
     
     def get_permissions(self):
         """Override permissions for specific actions."""
-        if self.action in ['create', 'list']:
+        if self.action in ['create', 'list', 'import_clients', 'export']:
             return [IsAuthenticated()]
         return super().get_permissions()
     
@@ -54,6 +77,46 @@ class ClientViewSet(AuditMixin, viewsets.ModelViewSet):
         """Create and audit log."""
         serializer.save(created_by=self.request.user)
         super().perform_create(serializer)
+        record_activity(
+            self.request.user, 'client_added', f'Cliente {serializer.instance.name} adicionado',
+            client_id=serializer.instance.pk
+        )
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_clients(self, request):
+        """
+        Bulk import clients from a CSV or NDJSON stream.
+        
+        Send the file as the raw request body (``Content-Type: text/csv`` or
+        ``application/x-ndjson``) or as the ``file`` field of a multipart form.
+        """
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response(
+                    {'detail': 'Envie o arquivo no campo "file".'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            import_format = get_import_format(upload.content_type, upload.name)
+            stream = upload
+        else:
+            import_format = get_import_format(request.content_type)
+            # Read the underlying HttpRequest lazily; request.data would buffer it.
+            stream = request._request
+        
+        if import_format is None:
+            return Response(
+                {'detail': 'Formato não suportado. Use CSV ou NDJSON.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        importer = ClientImporter(
+            user=request.user,
+            save=self.perform_bulk_create,
+            chunk_size=self.import_chunk_size,
+        )
+        report = importer.run(ROW_READERS[import_format](iter_lines(stream)))
+        return Response(report, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
     def add_contact(self, request, pk=None):
@@ -68,9 +131,11 @@ class ClientViewSet(AuditMixin, viewsets.ModelViewSet):
     def contacts(self, request, pk=None):
         """Get all contacts for a client."""
         client = self.get_object()
-        contacts = client.contacts.all()
-        serializer = ClientContactSerializer(contacts, many=True)
-        return Response(serializer.data)
+        # The viewset's ``?ordering`` fields belong to Client, not ClientContact.
+        paginator = FixedOrderingCursorPagination()
+        page = paginator.paginate_queryset(client.contacts.all(), request, view=self)
+        serializer = ClientContactSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def restore(self, request, pk=None):
@@ -89,32 +154,15 @@ class ClientViewSet(AuditMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def deleted(self, request):
         """List deleted clients."""
-        deleted_clients = Client.all_objects.deleted_only()
-        serializer = self.get_serializer(deleted_clients, many=True)
-        return Response(serializer.data)
+        deleted_clients = self.apply_eager_loading(Client.objects.deleted_only())
+        page = self.paginate_queryset(deleted_clients)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
-        """Get audit history for a client."""
-        from servicehub.utils.models import AuditLog
-        
-        logs = AuditLog.objects.filter(
-            model_name='Client',
-            object_id=str(pk)
-        ).order_by('-created_at')
-        
-        data = [
-            {
-                'id': log.id,
-                'user': log.user,
-                'action': log.get_action_display(),
-                'old_values': log.old_values,
-                'new_values': log.new_values,
-                'created_at': log.created_at,
-            }
-            for log in logs
-        ]
-        return Response(data)
+        """Get audit history for a client (``start_date``/``end_date`` reach into the archive)."""
+        return Response(self.get_history(request, pk))
 
 
 class ClientContactViewSet(viewsets.ModelViewSet):
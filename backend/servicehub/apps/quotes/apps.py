@@ -1,8 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class QuotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicehub.apps.quotes'
     verbose_name = 'Orçamentos'
-
+    
+    def ready(self):
+        """Install the PostgreSQL search triggers and indexes after migrate."""
+        from servicehub.utils.search import install_search_triggers
+        post_migrate.connect(install_search_triggers, sender=self)
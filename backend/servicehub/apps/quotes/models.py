@@ -1,6 +1,6 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from servicehub.apps.clients.models import Client
 from servicehub.utils.models import SoftDeleteModel, AuditModel
@@ -45,6 +45,9 @@ class Quote(SoftDeleteModel, AuditModel):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='quotes_created')
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='quotes_assigned')
     
+    # Search (maintained by a database trigger, see servicehub.utils.search)
+    search_vector = SearchVectorField(_('vetor de busca'), null=True, editable=False)
+    
     class Meta:
         verbose_name = _('Orçamento')
         verbose_name_plural = _('Orçamentos')
@@ -54,27 +57,12 @@ class Quote(SoftDeleteModel, AuditModel):
             models.Index(fields=['status']),
             models.Index(fields=['client']),
             models.Index(fields=['deleted_at']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"{self.quote_number} - {self.client.name}"
 
-    @staticmethod
-    def _generate_quote_number():
-        """Return a unique quote identifier."""
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
-        return f"QT-{timestamp}"
-
-    def save(self, *args, **kwargs):
-        """Automatically populate the quote number when missing."""
-        if not self.quote_number:
-            # Guarantee uniqueness even if multiple objects are created quickly.
-            quote_number = self._generate_quote_number()
-            while Quote.objects.filter(quote_number=quote_number).exists():
-                quote_number = self._generate_quote_number()
-            self.quote_number = quote_number
-        super().save(*args, **kwargs)
-
 
 class QuoteItem(AuditModel):
     """
@@ -82,6 +70,7 @@ class QuoteItem(AuditModel):
     """
     
     quote = models.ForeignKey(Quote, on_delete=models.CASCADE, related_name='items')
+    service = models.ForeignKey('services.Service', on_delete=models.SET_NULL, null=True, blank=True, related_name='quote_items')
     description = models.CharField(_('descrição'), max_length=255)
     quantity = models.DecimalField(_('quantidade'), max_digits=10, decimal_places=2)
     unit_price = models.DecimalField(_('preço unitário'), max_digits=10, decimal_places=2)
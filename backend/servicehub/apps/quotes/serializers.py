@@ -6,7 +6,7 @@ from servicehub.utils.validators import QuoteValidator
 class QuoteItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuoteItem
-        fields = ['id', 'description', 'quantity', 'unit_price', 'total', 'order', 'created_at', 'updated_at']
+        fields = ['id', 'service', 'description', 'quantity', 'unit_price', 'total', 'order', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
@@ -102,6 +102,22 @@ class ProposalSerializer(serializers.ModelSerializer):
         return obj.is_deleted
 
 
+class ProposalListSerializer(serializers.ModelSerializer):
+    """Lightweight serializer for list views (no nested quote)."""
+    
+    quote_number = serializers.CharField(source='quote.quote_number', read_only=True)
+    client_name = serializers.CharField(source='quote.client.name', read_only=True)
+    total = serializers.DecimalField(source='quote.total', max_digits=10, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = Proposal
+        fields = [
+            'id', 'quote', 'quote_number', 'client_name', 'total', 'proposal_number',
+            'status', 'sent_at', 'accepted_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+
 class ProposalCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Proposal
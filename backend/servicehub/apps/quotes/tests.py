@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from servicehub.apps.clients.models import Client
+from servicehub.utils.testing import query_budget
 from .models import Quote, QuoteItem, Proposal
 
 User = get_user_model()
@@ -188,3 +189,138 @@ class TestQuoteAPI:
         quote.refresh_from_db()
         assert quote.status == 'approved'
 
+
+
+@pytest.mark.django_db
+class TestQuoteExportAPI:
+    """Tests for the streaming quote export."""
+    
+    def setup_method(self):
+        """Setup test client and data."""
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(
+            username='exporter',
+            email='exporter@example.com',
+            password='testpass123'
+        )
+        self.client_obj = Client.objects.create(
+            name='Cliente Exportação',
+            email='client@example.com',
+            phone='11999999999',
+            type='individual',
+            document='12345678901',
+            created_by=self.user
+        )
+        for title, quote_status in [('Approved Quote', 'approved'), ('Draft Quote', 'draft')]:
+            Quote.objects.create(
+                client=self.client_obj,
+                title=title,
+                description='Test Description',
+                subtotal=1000.00,
+                total=1000.00,
+                status=quote_status,
+                created_by=self.user
+            )
+        self.api_client.force_authenticate(user=self.user)
+    
+    def test_export_csv_applies_filters(self):
+        """Test CSV export honours QuoteFilter parameters."""
+        response = self.api_client.get('/api/v1/quotes/quotes/export/?status=approved')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'text/csv'
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        assert lines[0].startswith('id,quote_number,client,client_name,title')
+        assert len(lines) == 2
+        assert 'Cliente Exportação' in lines[1]
+        assert 'Approved Quote' in lines[1]
+    
+    def test_export_ndjson(self):
+        """Test NDJSON export emits one object per quote."""
+        import json
+        
+        response = self.api_client.get('/api/v1/quotes/quotes/export/?format=ndjson')
+        
+        assert response.status_code == status.HTTP_200_OK
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        assert sorted(record['title'] for record in records) == ['Approved Quote', 'Draft Quote']
+        assert records[0]['total'] == '1000.00'
+    
+    def test_export_xlsx(self):
+        """Test XLSX export produces a readable workbook."""
+        from io import BytesIO
+        from openpyxl import load_workbook
+        
+        response = self.api_client.get('/api/v1/quotes/quotes/export/?format=xlsx')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Disposition'].endswith('.xlsx"')
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        assert rows[0][:2] == ('id', 'quote_number')
+        assert len(rows) == 3
+
+
+@pytest.mark.django_db
+class TestQuoteQueryBudget:
+    """Tests that list and detail endpoints do not issue N+1 queries."""
+    
+    def setup_method(self):
+        """Setup quotes with items and proposals."""
+        self.api_client = APIClient()
+        self.user = User.objects.create_user(
+            username='budget',
+            email='budget@example.com',
+            password='testpass123'
+        )
+        self.api_client.force_authenticate(user=self.user)
+        for index in range(5):
+            client = Client.objects.create(
+                name=f'Client {index}',
+                email=f'client{index}@example.com',
+                phone='11999999999',
+                type='individual',
+                document=f'1234567890{index}',
+                created_by=self.user
+            )
+            quote = Quote.objects.create(
+                client=client,
+                title=f'Quote {index}',
+                description='Test Description',
+                subtotal=100.00,
+                total=100.00,
+                created_by=self.user
+            )
+            for order in range(3):
+                QuoteItem.objects.create(
+                    quote=quote,
+                    description=f'Item {order}',
+                    quantity=1,
+                    unit_price=100.00,
+                    total=100.00,
+                    order=order
+                )
+            Proposal.objects.create(quote=quote, proposal_number=f'PR-TEST-{index}')
+    
+    def test_proposal_list_budget(self):
+        """Test the proposal list costs a fixed number of queries."""
+        with query_budget(2):
+            response = self.api_client.get('/api/v1/quotes/proposals/')
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 5
+        assert response.data['results'][0]['client_name'].startswith('Client')
+    
+    def test_proposal_detail_budget(self):
+        """Test the proposal detail loads quote, client and items eagerly."""
+        proposal = Proposal.objects.first()
+        with query_budget(2):
+            response = self.api_client.get(f'/api/v1/quotes/proposals/{proposal.id}/')
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['quote']['items']) == 3
+    
+    def test_query_budget_reports_overrun(self):
+        """Test the helper fails loudly when the budget is exceeded."""
+        with pytest.raises(AssertionError, match='Query budget exceeded'):
+            with query_budget(1):
+                list(Quote.objects.all())
+                list(QuoteItem.objects.all())
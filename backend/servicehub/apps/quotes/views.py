@@ -4,24 +4,31 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db import transaction
 from django.utils import timezone
 from .models import Quote, Proposal
 from .serializers import (
     QuoteSerializer, QuoteCreateSerializer, ProposalSerializer,
-    ProposalCreateSerializer, QuoteListSerializer
+    ProposalCreateSerializer, ProposalListSerializer, QuoteListSerializer
 )
-from servicehub.utils.audit import AuditMixin
+from servicehub.apps.analytics.activity import record_activity
+from servicehub.apps.analytics.leaderboard import record_approval
+from servicehub.utils.audit import AuditMixin, diff_model, snapshot_model
+from servicehub.utils.querysets import EagerLoadingMixin
+from servicehub.utils.exports import ExportMixin
 from servicehub.utils.permissions import IsClientOwnerOrAdmin
 from servicehub.utils.filters import QuoteFilter
+from servicehub.utils.search import FullTextSearchFilter
 
 
-class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
+class QuoteViewSet(EagerLoadingMixin, AuditMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for Quote management with audit trail and advanced filtering.
     
     Endpoints:
     - GET /api/v1/quotes/quotes/ - List all quotes
     - POST /api/v1/quotes/quotes/ - Create a new quote
+    - GET /api/v1/quotes/quotes/export/?format=csv|ndjson|xlsx - Stream filtered quotes
     - GET /api/v1/quotes/quotes/{id}/ - Retrieve a quote
     - PUT /api/v1/quotes/quotes/{id}/ - Update a quote
     - DELETE /api/v1/quotes/quotes/{id}/ - Soft delete a quote
@@ -35,11 +42,25 @@ class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
     queryset = Quote.objects.all()
     serializer_class = QuoteSerializer
     permission_classes = [IsAuthenticated, IsClientOwnerOrAdmin]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_class = QuoteFilter
     search_fields = ['quote_number', 'title', 'client__name']
-    ordering_fields = ['created_at', 'total', 'status']
+    ordering_fields = ['created_at', 'total', 'status', 'search_rank']
     ordering = ['-created_at']
+    eager_loading = {
+        action: {
+            'select_related': ['client', 'created_by'],
+            'prefetch_related': ['items'],
+        }
+        for action in ['retrieve', 'update', 'partial_update', 'restore']
+    }
+    export_filename = 'orcamentos'
+    export_fields = [
+        'id', 'quote_number', 'client', 'client__name', 'title',
+        'subtotal', 'discount', 'tax', 'total', 'status', 'valid_until',
+        'sent_at', 'viewed_at', 'approved_at', 'created_by', 'assigned_to',
+        'created_at', 'updated_at',
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -52,16 +73,23 @@ class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
         """Create and audit log."""
         serializer.save(created_by=self.request.user)
         super().perform_create(serializer)
+        quote = serializer.instance
+        record_activity(
+            self.request.user, 'quote_created', f'Orçamento {quote.quote_number} criado', quote=quote
+        )
     
     @action(detail=True, methods=['post'])
     def send(self, request, pk=None):
         """Send a quote to the client."""
         quote = self.get_object()
+        snapshot = snapshot_model(quote)
         quote.status = 'sent'
         quote.sent_at = timezone.now()
         quote.save()
         
-        super().perform_update(self.get_serializer(quote, data={}))
+        old_values, new_values = diff_model(quote, snapshot)
+        self.log_audit('update', quote, old_values=old_values, new_values=new_values)
+        record_activity(request.user, 'quote_sent', f'Orçamento {quote.quote_number} enviado', quote=quote)
         
         return Response(
             {'detail': 'Orçamento enviado com sucesso.'},
@@ -72,9 +100,18 @@ class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
     def approve(self, request, pk=None):
         """Approve a quote."""
         quote = self.get_object()
-        quote.status = 'approved'
-        quote.approved_at = timezone.now()
-        quote.save()
+        with transaction.atomic():
+            # Lock the row so concurrent approvals see each other and rank the quote once.
+            quote = Quote.objects.select_for_update().get(pk=quote.pk)
+            if quote.status != 'approved':
+                quote.status = 'approved'
+                quote.approved_at = timezone.now()
+                quote.save()
+                record_approval(quote)
+                record_activity(
+                    request.user, 'quote_approved', f'Orçamento {quote.quote_number} aprovado',
+                    quote=quote, total=str(quote.total)
+                )
         
         return Response(
             {'detail': 'Orçamento aprovado com sucesso.'},
@@ -87,6 +124,7 @@ class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
         quote = self.get_object()
         quote.status = 'rejected'
         quote.save()
+        record_activity(request.user, 'quote_rejected', f'Orçamento {quote.quote_number} rejeitado', quote=quote)
         
         return Response(
             {'detail': 'Orçamento rejeitado.'},
@@ -109,29 +147,11 @@ class QuoteViewSet(AuditMixin, viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
-        """Get audit history for a quote."""
-        from servicehub.utils.models import AuditLog
-        
-        logs = AuditLog.objects.filter(
-            model_name='Quote',
-            object_id=str(pk)
-        ).order_by('-created_at')
-        
-        data = [
-            {
-                'id': log.id,
-                'user': log.user,
-                'action': log.get_action_display(),
-                'old_values': log.old_values,
-                'new_values': log.new_values,
-                'created_at': log.created_at,
-            }
-            for log in logs
-        ]
-        return Response(data)
+        """Get audit history for a quote (``start_date``/``end_date`` reach into the archive)."""
+        return Response(self.get_history(request, pk))
 
 
-class ProposalViewSet(AuditMixin, viewsets.ModelViewSet):
+class ProposalViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """
     ViewSet for Proposal management with audit trail.
     """
@@ -144,10 +164,22 @@ class ProposalViewSet(AuditMixin, viewsets.ModelViewSet):
     search_fields = ['proposal_number', 'quote__title']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    eager_loading = {
+        'list': {'select_related': ['quote__client']},
+        **{
+            action: {
+                'select_related': ['quote__client', 'quote__created_by'],
+                'prefetch_related': ['quote__items'],
+            }
+            for action in ['retrieve', 'update', 'partial_update']
+        },
+    }
     
     def get_serializer_class(self):
         if self.action == 'create':
             return ProposalCreateSerializer
+        elif self.action == 'list':
+            return ProposalListSerializer
         return ProposalSerializer
     
     def perform_create(self, serializer):
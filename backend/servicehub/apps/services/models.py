@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 
@@ -26,6 +27,9 @@ class Service(models.Model):
     # Additional Information
     notes = models.TextField(_('notas'), blank=True)
     
+    # Search (maintained by a database trigger, see servicehub.utils.search)
+    search_vector = SearchVectorField(_('vetor de busca'), null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
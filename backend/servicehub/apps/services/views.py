@@ -4,6 +4,8 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Service, ServiceCategory, ServiceOrder
 from .serializers import ServiceSerializer, ServiceCategorySerializer, ServiceOrderSerializer
+from servicehub.utils.querysets import EagerLoadingMixin
+from servicehub.utils.search import FullTextSearchFilter
 
 
 class ServiceViewSet(viewsets.ModelViewSet):
@@ -14,10 +16,10 @@ class ServiceViewSet(viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'category']
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'base_price']
+    ordering_fields = ['name', 'base_price', 'search_rank']
     ordering = ['name']
 
 
@@ -34,7 +36,7 @@ class ServiceCategoryViewSet(viewsets.ModelViewSet):
     ordering = ['name']
 
 
-class ServiceOrderViewSet(viewsets.ModelViewSet):
+class ServiceOrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for Service Orders.
     """
@@ -47,4 +49,8 @@ class ServiceOrderViewSet(viewsets.ModelViewSet):
     search_fields = ['order_number', 'service__name']
     ordering_fields = ['created_at', 'scheduled_date']
     ordering = ['-created_at']
+    eager_loading = {
+        action: {'select_related': ['service', 'assigned_to']}
+        for action in ['list', 'retrieve', 'update', 'partial_update']
+    }
 
@@ -73,6 +73,14 @@ class ChangePasswordSerializer(serializers.Serializer):
 class AuthTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom serializer that attaches user details to the token response."""
 
+    @classmethod
+    def get_token(cls, user):
+        # WebSocket connections read these claims instead of loading the user.
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data['user'] = UserSerializer(self.user).data
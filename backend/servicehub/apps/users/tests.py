@@ -7,6 +7,8 @@ from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from servicehub.apps.users import views
+
 User = get_user_model()
 
 
@@ -88,6 +90,18 @@ class TestUserAPI:
         response = self.client.get('/api/v1/users/')
         assert response.status_code == status.HTTP_200_OK
     
+    def test_online_users(self, monkeypatch):
+        """Test checking which users are online."""
+        checked = []
+        monkeypatch.setattr(views, 'online_users', lambda ids: checked.append(ids) or {3})
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/users/online/?ids=3,4&ids=3')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'online': [3], 'offline': [4]}
+        assert checked == [[3, 4]]
+        response = self.client.get('/api/v1/users/online/?ids=abc')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
     def test_change_password(self):
         """Test changing password."""
         self.client.force_authenticate(user=self.user)
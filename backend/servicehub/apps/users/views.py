@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenObtainPairView
+from servicehub.utils.presence import online_users
 from .models import UserProfile
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
@@ -14,6 +15,9 @@ from .serializers import (
 
 User = get_user_model()
 
+# Most user ids accepted by one presence check.
+MAX_PRESENCE_IDS = 500
+
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -28,6 +32,7 @@ class UserViewSet(viewsets.ModelViewSet):
     - POST /api/v1/users/register/ - Register a new user
     - POST /api/v1/users/{id}/change-password/ - Change password
     - GET /api/v1/users/me/ - Get current user
+    - GET /api/v1/users/online/?ids=1,2 - Which of these users are online
     """
     
     queryset = User.objects.all()
@@ -69,6 +74,33 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def online(self, request):
+        """Split the ``ids`` users into online and offline (one Redis round trip)."""
+        values = [
+            value.strip()
+            for param in request.query_params.getlist('ids')
+            for value in param.split(',')
+            if value.strip()
+        ]
+        try:
+            user_ids = list(dict.fromkeys(int(value) for value in values))
+        except ValueError:
+            return Response(
+                {'detail': 'IDs de usuário inválidos.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not user_ids or len(user_ids) > MAX_PRESENCE_IDS:
+            return Response(
+                {'detail': f'Informe de 1 a {MAX_PRESENCE_IDS} IDs de usuário.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        online = online_users(user_ids)
+        return Response({
+            'online': sorted(online),
+            'offline': sorted(set(user_ids) - online),
+        })
+    
     @action(detail=True, methods=['post'])
     def change_password(self, request, pk=None):
         """Change user password."""
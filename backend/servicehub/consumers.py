@@ -1,23 +1,150 @@
 """
 WebSocket Consumers for Real-time Notifications
+
+Consumers are routed in ``servicehub.routing`` and authenticated by
+``servicehub.utils.websocket.JWTAuthMiddleware``. Outgoing frames go
+through a bounded per-connection queue (``BoundedSendConsumer``), so a
+burst of group messages for a slow browser cannot pile up in the process.
 """
 
+import asyncio
 import json
-from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from django.contrib.auth.models import User
 import logging
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils.realtime import QUOTE_FILTERS, QUOTES_GROUP, quote_group
+from servicehub.utils.presence import get_presence
+from servicehub.utils.replay import get_replay_buffer
 
 logger = logging.getLogger(__name__)
 
+# Close code sent to connections that cannot keep up (application range 4000-4999).
+SLOW_CONSUMER_CLOSE_CODE = 4008
+# Close code for malformed subscription filters or ``last_seq``.
+INVALID_FILTER_CLOSE_CODE = 4400
+# Most values a single quote filter may list.
+MAX_FILTER_VALUES = 50
+# Recent quote events remembered to drop the copy sent to a second group.
+RECENT_EVENTS = 32
+
+QUOTE_STATUSES = {status for status, _ in Quote.STATUS_CHOICES}
+
+
+def parse_quote_filters(query_string):
+    """Return ``{filter: set of values}`` from a handshake query string; raise ``ValueError`` if invalid."""
+    query = parse_qs(query_string.decode())
+    filters = {}
+    for dimension in QUOTE_FILTERS:
+        values = {value.strip() for raw in query.get(dimension, ()) for value in raw.split(',') if value.strip()}
+        if not values:
+            continue
+        if len(values) > MAX_FILTER_VALUES:
+            raise ValueError(f'Too many values for {dimension}')
+        if dimension == 'status':
+            if not values <= QUOTE_STATUSES:
+                raise ValueError(f'Unknown status in {sorted(values)}')
+        else:
+            values = {int(value) for value in values}
+        filters[dimension] = values
+    return filters
+
+
+class BoundedSendConsumer(AsyncWebsocketConsumer):
+    """
+    Consumer whose ``send`` enqueues frames for a writer task.
+    
+    The queue holds ``WEBSOCKET_SEND_QUEUE_SIZE`` frames. When it is full,
+    ``WEBSOCKET_OVERFLOW`` decides what happens: ``drop`` discards the oldest
+    queued frame and later tells the client how many were lost, while
+    ``close`` disconnects. A frame the server does not take within
+    ``WEBSOCKET_SEND_TIMEOUT`` seconds also closes the connection. Accept and
+    close messages bypass the queue.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.send_queue = asyncio.Queue(maxsize=settings.WEBSOCKET_SEND_QUEUE_SIZE)
+        self.dropped_frames = 0
+        self.writer = None
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if close:
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+            return
+        if self.send_queue.full():
+            if settings.WEBSOCKET_OVERFLOW == 'close':
+                logger.warning('Closing slow WebSocket connection %s', self.channel_name)
+                await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+                return
+            self.send_queue.get_nowait()
+            self.dropped_frames += 1
+        self.send_queue.put_nowait((text_data, bytes_data))
+        if self.writer is None:
+            self.writer = asyncio.ensure_future(self.write_frames())
+
+    async def write_frames(self):
+        while True:
+            text_data, bytes_data = await self.send_queue.get()
+            try:
+                await asyncio.wait_for(
+                    super().send(text_data=text_data, bytes_data=bytes_data),
+                    settings.WEBSOCKET_SEND_TIMEOUT,
+                )
+                if self.dropped_frames and self.send_queue.empty():
+                    dropped, self.dropped_frames = self.dropped_frames, 0
+                    await asyncio.wait_for(
+                        super().send(text_data=json.dumps({'type': 'dropped', 'count': dropped})),
+                        settings.WEBSOCKET_SEND_TIMEOUT,
+                    )
+            except asyncio.TimeoutError:
+                logger.warning('Closing stalled WebSocket connection %s', self.channel_name)
+                await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+                return
+
+    async def websocket_disconnect(self, message):
+        if self.writer is not None:
+            self.writer.cancel()
+        await super().websocket_disconnect(message)
 
-class NotificationConsumer(AsyncWebsocketConsumer):
-    """Consumer for real-time notifications"""
+
+def _replay_key(event):
+    # A restarted counter reuses numbers, so a replayed copy must also match type and time.
+    return event['type'], event.get('timestamp')
+
+
+class NotificationConsumer(BoundedSendConsumer):
+    """
+    Consumer for real-time notifications.
+    
+    Notifications carry a per-user ``seq`` when ``REALTIME_REPLAY_SIZE`` is
+    set. A client reconnecting with ``?last_seq=<n>`` first receives the
+    buffered notifications after ``n`` (see ``servicehub.utils.replay``), or
+    ``{"type": "resync", "seq": <current>}`` when some of them are gone and it
+    must reload from the API. Notifications published while the replay is
+    read can also arrive live; those copies are skipped. Live notifications
+    are otherwise never dropped by ``seq``: workers send them concurrently, so
+    they may arrive out of order, and the counter restarts at 1 after
+    ``REALTIME_REPLAY_TTL`` or a Redis restart.
+    
+    The connection also marks the user online (``servicehub.utils.presence``)
+    until it closes or ``PRESENCE_TTL`` seconds pass without a ``ping``.
+    """
 
     async def connect(self):
         """Handle WebSocket connection"""
         self.user = self.scope['user']
         self.user_id = self.user.id if self.user.is_authenticated else None
+        self.replayed = {}
+        self.presence_touched = None
         
         if not self.user.is_authenticated:
             await self.close()
@@ -25,6 +152,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
         # Create user-specific group
         self.group_name = f'notifications_{self.user_id}'
+
+        last_seq = parse_qs(self.scope.get('query_string', b'').decode()).get('last_seq')
+        try:
+            last_seq = int(last_seq[0]) if last_seq else None
+        except ValueError:
+            await self.close(code=INVALID_FILTER_CLOSE_CODE)
+            return
         
         # Join group
         await self.channel_layer.group_add(
@@ -34,6 +168,45 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         logger.info(f'User {self.user_id} connected to notifications')
+        await self.track_presence('touch')
+        if last_seq is not None:
+            await self.replay(last_seq)
+
+    async def replay(self, last_seq):
+        """Send the notifications missed after ``last_seq``, or a resync signal."""
+        buffer = get_replay_buffer()
+        current, missed = None, None
+        if buffer is not None:
+            try:
+                current, missed = await sync_to_async(buffer.since, thread_sensitive=False)(self.user_id, last_seq)
+            except RedisError:
+                logger.warning('Replay buffer unavailable for user %s', self.user_id, exc_info=True)
+        if missed is None:
+            await self.send(text_data=json.dumps({'type': 'resync', 'seq': current}))
+            return
+        for event in missed:
+            await getattr(self, event['type'].replace('.', '_'))(event)
+        # Live copies of these may already be queued behind this handler.
+        self.replayed = {event['seq']: _replay_key(event) for event in missed}
+
+    async def track_presence(self, method):
+        """Call ``touch`` or ``leave`` on the presence tracker for this connection."""
+        if method == 'touch':
+            self.presence_touched = time.monotonic()
+        try:
+            await sync_to_async(getattr(get_presence(), method), thread_sensitive=False)(
+                self.user_id, self.channel_name,
+            )
+        except RedisError:
+            logger.warning('Presence unavailable for user %s', self.user_id, exc_info=True)
+
+    def is_new(self, event):
+        """Whether ``event`` was not already sent by the replay on connect."""
+        seq = event.get('seq')
+        if seq in self.replayed and self.replayed[seq] == _replay_key(event):
+            del self.replayed[seq]
+            return False
+        return True
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
@@ -42,6 +215,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            if self.presence_touched is not None:
+                await self.track_presence('leave')
             logger.info(f'User {self.user_id} disconnected from notifications')
 
     async def receive(self, text_data):
@@ -51,6 +226,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             message_type = data.get('type')
             
             if message_type == 'ping':
+                # Heartbeats refresh presence at most three times per PRESENCE_TTL.
+                if time.monotonic() - self.presence_touched >= settings.PRESENCE_TTL / 3:
+                    await self.track_presence('touch')
                 await self.send(text_data=json.dumps({
                     'type': 'pong',
                     'timestamp': str(datetime.now())
@@ -60,8 +238,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def notification_message(self, event):
         """Send notification to WebSocket"""
+        if not self.is_new(event):
+            return
         await self.send(text_data=json.dumps({
             'type': event['type'],
+            'seq': event.get('seq'),
             'title': event['title'],
             'message': event['message'],
             'data': event.get('data', {}),
@@ -70,8 +251,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def quote_update(self, event):
         """Send quote update to WebSocket"""
+        if not self.is_new(event):
+            return
         await self.send(text_data=json.dumps({
             'type': 'quote_update',
+            'seq': event.get('seq'),
             'quote_id': event['quote_id'],
             'status': event['status'],
             'message': event['message'],
@@ -80,8 +264,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def client_update(self, event):
         """Send client update to WebSocket"""
+        if not self.is_new(event):
+            return
         await self.send(text_data=json.dumps({
             'type': 'client_update',
+            'seq': event.get('seq'),
             'client_id': event['client_id'],
             'action': event['action'],
             'data': event.get('data', {}),
@@ -89,36 +276,72 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         }))
 
 
-class QuoteConsumer(AsyncWebsocketConsumer):
-    """Consumer for quote updates"""
+class QuoteConsumer(BoundedSendConsumer):
+    """
+    Consumer for quote updates.
+    
+    Filters are chosen at connect time in the query string: ``client``,
+    ``assigned_to`` (the owner) and ``status``, each repeated or
+    comma-separated (``?status=sent,viewed&assigned_to=3``). The connection
+    joins one sharded group per value of the most selective filter (see
+    ``realtime.quote_groups``) and checks the others on each event, so a quote
+    event only reaches the sockets interested in it. A quote that leaves a
+    filter (new owner or status) is announced once more to its old
+    subscribers. Admins and managers without filters join ``quotes_updates``
+    and receive every event. Other users default to their own quotes.
+    """
 
     async def connect(self):
         """Handle WebSocket connection"""
         self.user = self.scope['user']
+        self.groups_joined = []
+        self.recent_events = deque(maxlen=RECENT_EVENTS)
         
         if not self.user.is_authenticated:
             await self.close()
             return
 
-        self.group_name = 'quotes_updates'
-        
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        try:
+            self.filters = parse_quote_filters(self.scope.get('query_string', b''))
+        except ValueError:
+            await self.close(code=INVALID_FILTER_CLOSE_CODE)
+            return
+        if not self.filters and self.user.role not in ('admin', 'manager'):
+            self.filters = {'assigned_to': {self.user.id}}
+
+        dimension = next((name for name in QUOTE_FILTERS if name in self.filters), None)
+        if dimension is None:
+            self.groups_joined = [QUOTES_GROUP]
+        else:
+            self.groups_joined = sorted(quote_group(dimension, value) for value in self.filters[dimension])
+        for group_name in self.groups_joined:
+            await self.channel_layer.group_add(group_name, self.channel_name)
         
         await self.accept()
         logger.info(f'User {self.user.id} connected to quotes')
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        for group_name in getattr(self, 'groups_joined', ()):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+    def wants(self, event):
+        """Whether ``event`` matches every filter; a current or previous value matches."""
+        key = (event['type'], event['quote_id'], event.get('timestamp'))
+        if key in self.recent_events:
+            # Delivered through two groups (old and new value of the filter).
+            return False
+        self.recent_events.append(key)
+        for dimension, values in self.filters.items():
+            candidates = {event.get(dimension), event.get(f'old_{dimension}')}
+            if not candidates & values:
+                return False
+        return True
 
     async def quote_created(self, event):
         """Send quote created message"""
+        if not self.wants(event):
+            return
         await self.send(text_data=json.dumps({
             'type': 'quote_created',
             'quote_id': event['quote_id'],
@@ -130,6 +353,8 @@ class QuoteConsumer(AsyncWebsocketConsumer):
 
     async def quote_status_changed(self, event):
         """Send quote status change message"""
+        if not self.wants(event):
+            return
         await self.send(text_data=json.dumps({
             'type': 'quote_status_changed',
             'quote_id': event['quote_id'],
@@ -138,8 +363,22 @@ class QuoteConsumer(AsyncWebsocketConsumer):
             'timestamp': event.get('timestamp'),
         }))
 
+    async def quote_updated(self, event):
+        """Send quote update or deletion message"""
+        if not self.wants(event):
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'quote_updated',
+            'quote_id': event['quote_id'],
+            'action': event['action'],
+            'status': event['status'],
+            'value': event['value'],
+            'assigned_to': event.get('assigned_to'),
+            'timestamp': event.get('timestamp'),
+        }))
+
 
-class ActivityConsumer(AsyncWebsocketConsumer):
+class ActivityConsumer(BoundedSendConsumer):
     """Consumer for activity feed"""
 
     async def connect(self):
@@ -161,10 +400,11 @@ class ActivityConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        if self.user.is_authenticated:
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
 
     async def activity_log(self, event):
         """Send activity log message"""
@@ -0,0 +1,29 @@
+"""
+Management command moving expired log partitions to the cold archive.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicehub.utils.partitions import archive_partitions, get_partitioned_models, partitioning_supported
+
+
+class Command(BaseCommand):
+    help = 'Detach AuditLog and DailyActivity partitions past retention and archive them as NDJSON'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=None,
+            help='Months kept in the database (default: PARTITION_RETENTION_MONTHS)'
+        )
+    
+    def handle(self, *args, **options):
+        if not partitioning_supported():
+            raise CommandError('Log partitioning requires PostgreSQL.')
+        
+        for model in get_partitioned_models():
+            archived = archive_partitions(model, retention_months=options['retention_months'])
+            for name, rows in archived.items():
+                self.stdout.write(f'Archived {name} ({rows} rows)')
+        self.stdout.write(self.style.SUCCESS('Archiving finished.'))
@@ -0,0 +1,29 @@
+"""
+Management command creating the upcoming monthly log partitions.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicehub.utils.partitions import create_partitions, get_partitioned_models, partitioning_supported
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly AuditLog and DailyActivity partitions for the coming months'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=None,
+            help='Months to create after the current one (default: PARTITION_MONTHS_AHEAD)'
+        )
+    
+    def handle(self, *args, **options):
+        if not partitioning_supported():
+            raise CommandError('Log partitioning requires PostgreSQL.')
+        
+        for model in get_partitioned_models():
+            created = create_partitions(model, months_ahead=options['months_ahead'])
+            for name in created:
+                self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS('Partitions are up to date.'))
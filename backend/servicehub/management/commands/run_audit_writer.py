@@ -0,0 +1,45 @@
+"""
+Management command draining the audit log stream into the database.
+"""
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from servicehub.utils.audit_pipeline import AuditStreamWriter
+
+
+class Command(BaseCommand):
+    help = 'Write queued audit log entries to the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.AUDIT_LOG_BATCH_SIZE,
+            help='Maximum number of entries per insert'
+        )
+        parser.add_argument(
+            '--flush-interval',
+            type=float,
+            default=settings.AUDIT_LOG_FLUSH_INTERVAL,
+            help='Seconds to wait for a batch to fill before flushing it'
+        )
+
+    def handle(self, *args, **options):
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        writer = AuditStreamWriter(
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+        )
+        self.stdout.write(f'Writing audit entries from {writer.stream} as {writer.consumer}...')
+        writer.run(should_stop=lambda: bool(stopping))
+        self.stdout.write(self.style.SUCCESS('Audit writer stopped.'))
@@ -0,0 +1,8 @@
+"""
+Models owned by the ``servicehub`` app.
+
+The shared models live in ``servicehub.utils.models``; importing them here
+gives the app a models module so their tables are created.
+"""
+
+from servicehub.utils.models import AuditLog, IdentifierSequence  # noqa: F401
@@ -0,0 +1,13 @@
+"""
+WebSocket URL routes for ServiceHub.
+"""
+
+from django.urls import path
+
+from .consumers import ActivityConsumer, NotificationConsumer, QuoteConsumer
+
+websocket_urlpatterns = [
+    path('ws/notifications/', NotificationConsumer.as_asgi()),
+    path('ws/quotes/', QuoteConsumer.as_asgi()),
+    path('ws/activity/', ActivityConsumer.as_asgi()),
+]
@@ -0,0 +1,22 @@
+"""Celery tasks for the shared ServiceHub infrastructure."""
+
+from celery import shared_task
+
+from servicehub.utils.partitions import (
+    archive_partitions,
+    create_partitions,
+    get_partitioned_models,
+    partitioning_supported,
+)
+
+
+@shared_task(name='servicehub.maintain_log_partitions', ignore_result=True)
+def maintain_log_partitions_task():
+    """Create the upcoming log partitions and archive the expired ones."""
+    if not partitioning_supported():
+        return 0
+    archived = 0
+    for model in get_partitioned_models():
+        create_partitions(model)
+        archived += len(archive_partitions(model))
+    return archived
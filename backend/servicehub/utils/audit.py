@@ -2,12 +2,21 @@
 Audit and logging utilities for ServiceHub.
 """
 
+import logging
+from datetime import datetime, time, timedelta
 from functools import wraps
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from servicehub.utils.models import AuditLog
-import json
-from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from servicehub.utils.audit_pipeline import build_entry, emit
+from servicehub.utils.models import AuditLog, FieldTrackingMixin, get_tracked_fields, to_json_value
+from servicehub.utils.partitions import read_archive
+
+logger = logging.getLogger(__name__)
+
+# ``bulk_create`` sends no ``post_save``; receivers get ``instances`` instead.
+post_bulk_create = Signal()
 
 
 def audit_action(action_type):
@@ -22,16 +31,16 @@ def audit_action(action_type):
                 ip_address = get_client_ip(request)
                 user_agent = request.META.get('HTTP_USER_AGENT', '')
                 
-                AuditLog.objects.create(
+                emit([build_entry(
                     user=user,
                     action=action_type,
                     model_name=self.queryset.model.__name__,
                     object_id=getattr(self, 'kwargs', {}).get('pk', 'N/A'),
                     ip_address=ip_address,
                     user_agent=user_agent,
-                )
-            except Exception as e:
-                print(f"Error logging action: {e}")
+                )])
+            except Exception:
+                logger.exception('Error logging action')
             
             return result
         return wrapper
@@ -57,89 +66,146 @@ def log_model_changes(sender, instance, created, **kwargs):
             new_values = serialize_model(instance)
         else:
             action = 'update'
-            # Get previous values from database
-            try:
-                old_instance = sender.objects.get(pk=instance.pk)
-                old_values = serialize_model(old_instance)
-                new_values = serialize_model(instance)
-            except sender.DoesNotExist:
-                old_values = {}
-                new_values = serialize_model(instance)
+            # The load snapshot is only refreshed once save() returns.
+            old_values, new_values = diff_model(instance)
         
-        AuditLog.objects.create(
-            user='system',
+        emit([build_entry(
             action=action,
             model_name=sender.__name__,
-            object_id=str(instance.pk),
+            object_id=instance.pk,
             old_values=old_values,
             new_values=new_values,
-        )
-    except Exception as e:
-        print(f"Error logging model changes: {e}")
+        )])
+    except Exception:
+        logger.exception('Error logging model changes')
 
 
 def serialize_model(instance):
     """Serialize model instance to JSON-compatible dict."""
-    data = {}
-    for field in instance._meta.get_fields():
-        if field.many_to_one or field.one_to_one:
-            continue
-        if field.many_to_many:
-            continue
-        
-        try:
-            value = getattr(instance, field.name)
-            if hasattr(value, 'isoformat'):
-                data[field.name] = value.isoformat()
-            else:
-                data[field.name] = str(value)
-        except Exception:
-            pass
-    
-    return data
+    return {
+        name: to_json_value(getattr(instance, attname))
+        for name, attname in get_tracked_fields(type(instance))
+    }
+
+
+def snapshot_model(instance):
+    """Return what ``diff_model`` needs later to find the changed fields."""
+    if isinstance(instance, FieldTrackingMixin):
+        return instance.get_snapshot()
+    return serialize_model(instance)
+
+
+def diff_model(instance, snapshot=None):
+    """Return ``(old_values, new_values)`` restricted to the changed fields."""
+    if isinstance(instance, FieldTrackingMixin):
+        return instance.get_changes(snapshot)
+    old_values = snapshot or {}
+    new_values = serialize_model(instance)
+    changed = [name for name, value in new_values.items() if old_values.get(name) != value]
+    return (
+        {name: old_values[name] for name in changed if name in old_values},
+        {name: new_values[name] for name in changed},
+    )
+
+
+def get_audit_history(model_name, object_id, start=None, end=None):
+    """
+    Return the audit entries of one object created in ``[start, end)``,
+    newest first. Entries moved out of the database by partition retention
+    are read back from the archive when ``start`` reaches that far.
+    """
+    logs = AuditLog.objects.filter(model_name=model_name, object_id=str(object_id))
+    if start is not None:
+        logs = logs.filter(created_at__gte=start)
+    if end is not None:
+        logs = logs.filter(created_at__lt=end)
+    logs = list(logs.order_by('-created_at'))
+    if start is not None:
+        logs += read_archive(AuditLog, start, end, model_name=model_name, object_id=object_id)
+        logs.sort(key=lambda log: log.created_at, reverse=True)
+    return logs
+
+
+def _parse_history_date(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValidationError({name: 'Use o formato AAAA-MM-DD.'})
+    return day
 
 
 class AuditMixin:
-    """Mixin to add audit logging to viewsets."""
+    """
+    Mixin to add audit logging to viewsets.
     
-    def perform_create(self, serializer):
-        """Log creation."""
-        serializer.save()
-        AuditLog.objects.create(
+    Entries are handed to ``servicehub.utils.audit_pipeline``, which writes
+    them in batches outside the request when ``AUDIT_LOG_MODE`` is ``stream``.
+    """
+    
+    def build_audit_entry(self, action, instance, old_values=None, new_values=None):
+        return build_entry(
             user=self.request.user.username,
-            action='create',
+            action=action,
             model_name=self.queryset.model.__name__,
-            object_id=str(serializer.instance.pk),
-            new_values=serialize_model(serializer.instance),
+            object_id=instance.pk,
+            old_values=old_values,
+            new_values=new_values,
             ip_address=get_client_ip(self.request),
         )
     
+    def log_audit(self, action, instance, old_values=None, new_values=None):
+        emit([self.build_audit_entry(action, instance, old_values, new_values)])
+    
+    def perform_create(self, serializer):
+        """Log creation."""
+        serializer.save()
+        self.log_audit('create', serializer.instance, new_values=serialize_model(serializer.instance))
+    
+    def perform_bulk_create(self, instances):
+        """Bulk insert instances and queue their audit entries as one batch."""
+        model = self.queryset.model
+        created = model.objects.bulk_create(instances)
+        post_bulk_create.send(sender=model, instances=created)
+        emit([
+            self.build_audit_entry('create', instance, new_values=serialize_model(instance))
+            for instance in created
+        ])
+        return created
+    
     def perform_update(self, serializer):
         """Log update."""
-        old_instance = self.get_object()
-        old_values = serialize_model(old_instance)
+        # Diff against the values the instance was loaded with instead of
+        # fetching the row again; only changed fields are stored.
+        snapshot = snapshot_model(serializer.instance)
         
         serializer.save()
         
-        AuditLog.objects.create(
-            user=self.request.user.username,
-            action='update',
-            model_name=self.queryset.model.__name__,
-            object_id=str(serializer.instance.pk),
-            old_values=old_values,
-            new_values=serialize_model(serializer.instance),
-            ip_address=get_client_ip(self.request),
-        )
+        old_values, new_values = diff_model(serializer.instance, snapshot)
+        self.log_audit('update', serializer.instance, old_values=old_values, new_values=new_values)
     
     def perform_destroy(self, instance):
         """Log deletion."""
-        AuditLog.objects.create(
-            user=self.request.user.username,
-            action='delete',
-            model_name=self.queryset.model.__name__,
-            object_id=str(instance.pk),
-            old_values=serialize_model(instance),
-            ip_address=get_client_ip(self.request),
-        )
+        self.log_audit('delete', instance, old_values=serialize_model(instance))
         instance.delete()
-
+    
+    def get_history(self, request, pk):
+        """Serialize the audit history of ``pk`` for the ``history`` actions."""
+        start_date = _parse_history_date(request, 'start_date')
+        end_date = _parse_history_date(request, 'end_date')
+        start = timezone.make_aware(datetime.combine(start_date, time.min)) if start_date else None
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)) if end_date else None
+        
+        logs = get_audit_history(self.queryset.model.__name__, pk, start, end)
+        return [
+            {
+                'id': log.id,
+                'user': log.user,
+                'action': log.get_action_display(),
+                'old_values': log.old_values,
+                'new_values': log.new_values,
+                'created_at': log.created_at,
+            }
+            for log in logs
+        ]
@@ -0,0 +1,170 @@
+"""
+Batched, asynchronous delivery of audit log entries.
+
+The write path only calls ``emit``. In ``sync`` mode (``AUDIT_LOG_MODE``,
+the default and what the tests use) entries are inserted right away with one
+``bulk_create``. In ``stream`` mode they are appended to a Redis stream when
+the surrounding transaction commits, one pipelined round trip per batch, and
+the ``run_audit_writer`` command drains the stream into ``AuditLog``. It
+flushes whenever ``AUDIT_LOG_BATCH_SIZE`` entries are buffered or
+``AUDIT_LOG_FLUSH_INTERVAL`` seconds have passed since the first one.
+
+Delivery is at least once. Stream entries are acknowledged only after their
+batch is inserted. Entries left pending by a writer that died are reclaimed.
+Each entry carries an ``event_id``, so a redelivered entry is dropped by the
+unique constraint. If Redis cannot be reached, entries are written directly.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import RedisError, ResponseError
+
+from servicehub.utils.models import AuditLog
+from servicehub.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+WRITER_GROUP = 'audit-writers'
+
+
+def build_entry(action, model_name, object_id, user='system', old_values=None,
+                new_values=None, ip_address=None, user_agent=''):
+    """Return an audit entry ready for ``emit``."""
+    return {
+        'event_id': uuid.uuid4().hex,
+        'user': user,
+        'action': action,
+        'model_name': model_name,
+        'object_id': str(object_id),
+        'old_values': old_values or {},
+        'new_values': new_values or {},
+        'ip_address': ip_address,
+        'user_agent': user_agent or '',
+        'created_at': timezone.now(),
+    }
+
+
+def write_entries(entries):
+    """Insert entries in one statement, skipping any already delivered."""
+    AuditLog.objects.bulk_create(
+        [AuditLog(**entry) for entry in entries],
+        ignore_conflicts=True,
+    )
+
+
+def emit(entries, using='default'):
+    """Record audit entries according to ``AUDIT_LOG_MODE``."""
+    entries = list(entries)
+    if not entries:
+        return
+    if settings.AUDIT_LOG_MODE != 'stream':
+        write_entries(entries)
+        return
+    # Entries for a rolled back transaction are never published.
+    transaction.on_commit(lambda: publish(entries), using=using)
+
+
+def publish(entries):
+    """Append entries to the audit stream, falling back to a direct insert."""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for entry in entries:
+            pipe.xadd(settings.AUDIT_LOG_STREAM, {'entry': encode_entry(entry)})
+        pipe.execute()
+    except RedisError:
+        logger.warning('Audit stream unavailable, writing %d entries directly', len(entries), exc_info=True)
+        write_entries(entries)
+
+
+def encode_entry(entry):
+    return json.dumps(entry, cls=DjangoJSONEncoder)
+
+
+def decode_entry(payload):
+    entry = json.loads(payload)
+    entry['created_at'] = parse_datetime(entry['created_at'])
+    return entry
+
+
+class AuditStreamWriter:
+    """Consume the audit stream and insert entries in batches."""
+
+    def __init__(self, client=None, batch_size=None, flush_interval=None,
+                 consumer=None, claim_idle=60):
+        self.client = client or get_redis()
+        self.stream = settings.AUDIT_LOG_STREAM
+        self.batch_size = batch_size or settings.AUDIT_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_LOG_FLUSH_INTERVAL
+        self.consumer = consumer or f'{socket.gethostname()}-{os.getpid()}'
+        self.claim_idle = claim_idle
+
+    def ensure_group(self):
+        try:
+            self.client.xgroup_create(self.stream, WRITER_GROUP, id='0', mkstream=True)
+        except ResponseError as exc:
+            if 'BUSYGROUP' not in str(exc):
+                raise
+
+    def run(self, should_stop=lambda: False):
+        self.ensure_group()
+        self.recover()
+        next_recovery = time.monotonic() + self.claim_idle
+        buffer = []
+        deadline = None
+
+        while not should_stop():
+            now = time.monotonic()
+            wait = self.flush_interval if deadline is None else max(deadline - now, 0.001)
+            response = self.client.xreadgroup(
+                WRITER_GROUP, self.consumer, {self.stream: '>'},
+                count=self.batch_size - len(buffer), block=int(wait * 1000),
+            )
+            for _, messages in response or []:
+                buffer.extend(messages)
+
+            now = time.monotonic()
+            if buffer and deadline is None:
+                deadline = now + self.flush_interval
+            if buffer and (len(buffer) >= self.batch_size or now >= deadline):
+                self.flush(buffer)
+                buffer, deadline = [], None
+            if now >= next_recovery:
+                self.recover()
+                next_recovery = now + self.claim_idle
+
+        if buffer:
+            self.flush(buffer)
+
+    def recover(self):
+        """Flush entries delivered to writers that stopped before acknowledging them."""
+        start = '0-0'
+        while True:
+            start, messages = self.client.xautoclaim(
+                self.stream, WRITER_GROUP, self.consumer,
+                min_idle_time=self.claim_idle * 1000, start_id=start, count=self.batch_size,
+            )[:2]
+            if messages:
+                self.flush(messages)
+            if start in (b'0-0', '0-0'):
+                return
+
+    def flush(self, messages):
+        """Insert a batch of stream messages, then acknowledge and drop them."""
+        entries = [decode_entry(fields[b'entry']) for _, fields in messages if fields]
+        if entries:
+            close_old_connections()
+            write_entries(entries)
+        message_ids = [message_id for message_id, _ in messages]
+        self.client.xack(self.stream, WRITER_GROUP, *message_ids)
+        self.client.xdel(self.stream, *message_ids)
+        return len(entries)
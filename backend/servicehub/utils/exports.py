@@ -0,0 +1,159 @@
+"""
+Streaming exports (CSV, NDJSON and XLSX) for ServiceHub viewsets.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and written to a ``StreamingHttpResponse`` one chunk at a
+time, so memory use does not depend on the number of exported rows. XLSX is
+spooled through a temporary file because the format is a zip archive that can
+only be finalised once every row is known.
+"""
+
+import csv
+import json
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _localize(value):
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+def _rows_from_data(data):
+    """Turn a non-streamed payload (usually an error) into a header and rows."""
+    if isinstance(data, dict):
+        return list(data), [list(data.values())]
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        return list(data[0]), [list(item.values()) for item in data]
+    return ['detail'], [[data]]
+
+
+class ExportRenderer(BaseRenderer):
+    """Base class for export renderers; ``stream`` yields the encoded bytes."""
+
+    def stream(self, header, rows):
+        raise NotImplementedError('Export renderers must implement .stream()')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        header, rows = _rows_from_data(data)
+        return b''.join(self.stream(header, rows))
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, header, rows):
+        writer = csv.writer(_Echo())
+        # BOM so spreadsheet tools detect UTF-8 (accents in names and cities).
+        yield ('\ufeff' + writer.writerow(header)).encode(self.charset)
+        for row in rows:
+            line = writer.writerow([
+                _localize(value).isoformat() if isinstance(value, (date, datetime)) else value
+                for value in row
+            ])
+            yield line.encode(self.charset)
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, header, rows):
+        for row in rows:
+            record = dict(zip(header, (_localize(value) for value in row)))
+            yield (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode(self.charset)
+
+
+class XLSXRenderer(ExportRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+    charset = None
+    render_style = 'binary'
+
+    def stream(self, header, rows):
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append([self._cell(value) for value in row])
+
+        with tempfile.TemporaryFile() as spool:
+            workbook.save(spool)
+            spool.seek(0)
+            while True:
+                block = spool.read(XLSX_STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    @staticmethod
+    def _cell(value):
+        value = _localize(value)
+        if isinstance(value, datetime):
+            # Excel has no notion of time zones.
+            return value.replace(tzinfo=None)
+        if isinstance(value, Decimal):
+            return float(value)
+        if value is not None and not isinstance(value, (int, float, str, date)):
+            return str(value)
+        return value
+
+
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer, XLSXRenderer]
+
+
+class ExportMixin:
+    """
+    Add a ``GET <list-url>/export/`` action streaming the filtered queryset.
+
+    Views declare ``export_fields`` as ORM lookups; they may span relations
+    (``client__name`` is exported as ``client_name``) since rows are fetched
+    with ``values_list``. The format is chosen with ``?format=csv|ndjson|xlsx`` or
+    the ``Accept`` header, defaulting to CSV.
+    """
+
+    export_fields = ()
+    export_filename = 'export'
+    export_chunk_size = EXPORT_CHUNK_SIZE
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Stream the filtered list as CSV, NDJSON or XLSX."""
+        header = [lookup.replace('__', '_') for lookup in self.export_fields]
+        rows = self.get_export_queryset().values_list(*self.export_fields).iterator(
+            chunk_size=self.export_chunk_size
+        )
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(header, rows),
+            content_type=renderer.media_type,
+        )
+        filename = f'{self.export_filename}-{timezone.localdate():%Y%m%d}.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -3,6 +3,7 @@ Custom filters for ServiceHub.
 """
 
 from django_filters import rest_framework as filters
+from servicehub.apps.analytics.models import Report
 from servicehub.apps.clients.models import Client
 from servicehub.apps.quotes.models import Quote
 from servicehub.apps.services.models import Service, ServiceOrder
@@ -100,3 +101,16 @@ class ServiceOrderFilter(filters.FilterSet):
         model = ServiceOrder
         fields = ['order_number', 'service', 'status', 'scheduled_after', 'scheduled_before']
 
+
+
+class ReportFilter(filters.FilterSet):
+    """Filters for Report; ``start_date``/``end_date`` keep reports overlapping the range."""
+    
+    report_type = filters.ChoiceFilter(field_name='report_type', choices=Report.REPORT_TYPES)
+    status = filters.ChoiceFilter(field_name='status', choices=Report.STATUS_CHOICES)
+    start_date = filters.DateFilter(field_name='period_end', lookup_expr='gte')
+    end_date = filters.DateFilter(field_name='period_start', lookup_expr='lte')
+    
+    class Meta:
+        model = Report
+        fields = ['report_type', 'status', 'start_date', 'end_date']
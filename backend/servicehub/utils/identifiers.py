@@ -0,0 +1,123 @@
+"""
+Allocation of ``PREFIX-YYYYMMDD-NNNN`` identifiers.
+
+Quote (``QT``), proposal (``PR``) and service order (``SO``) numbers are drawn
+from one counter per prefix and day, kept in ``IdentifierSequence`` and
+starting at 1 every day. Each worker process reserves a block of
+``IDENTIFIER_BLOCK_SIZE`` values with a single round trip and hands them out
+from memory, so generating a number never queries the target table and two
+workers can never receive the same value. Numbers are therefore unique but
+not consecutive across workers.
+
+On PostgreSQL a block is reserved with one ``INSERT ... ON CONFLICT DO
+UPDATE ... RETURNING`` on a dedicated autocommit connection, outside the
+request's transaction (``ATOMIC_REQUESTS``). The process opens one such
+connection per database and shares it between threads under the allocator
+lock, which reservations hold anyway. The counter row is locked only
+for that statement, and a request that rolls back never returns its block to
+another worker. Other backends update the row with ``select_for_update`` on
+the request's own connection.
+
+The numeric part is zero-padded to ``IDENTIFIER_SUFFIX_LENGTH`` digits; a day
+with more identifiers than that simply gets longer numbers.
+"""
+
+import os
+import threading
+
+from django.db import InterfaceError, OperationalError, connections, transaction
+from django.utils import timezone
+
+
+IDENTIFIER_SUFFIX_LENGTH = 4
+IDENTIFIER_BLOCK_SIZE = 50
+
+
+class IdentifierAllocator:
+    """Hand out per-day counter values from per-process blocks reserved in the database."""
+
+    def __init__(self, block_size=IDENTIFIER_BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._pid = os.getpid()
+
+    def next_value(self, prefix, day, using='default'):
+        key = (using, prefix)
+        with self._lock:
+            block_day, current, end = self._blocks.get(key, (None, 0, 0))
+            if block_day != day or current >= end:
+                current = self._reserve_block(prefix, day, using)
+                end = current + self.block_size
+            self._blocks[key] = (day, current + 1, end)
+            return current
+
+    def generate(self, prefix, using='default'):
+        """Return the next ``PREFIX-YYYYMMDD-NNNN`` identifier for ``prefix``."""
+        today = timezone.now().strftime('%Y%m%d')
+        value = self.next_value(prefix, today, using)
+        return f'{prefix}-{today}-{value:0{IDENTIFIER_SUFFIX_LENGTH}d}'
+
+    def reset(self):
+        """Forget the reserved blocks (their unused values are skipped) and close the counter connections."""
+        with self._lock:
+            self._blocks.clear()
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
+
+    def _reserve_block(self, prefix, day, using):
+        """Reserve ``block_size`` values of the ``prefix`` counter for ``day`` and return the first one."""
+        from servicehub.utils.models import IdentifierSequence
+
+        name = f'{prefix}-{day}'
+        if connections[using].vendor == 'postgresql':
+            return self._reserve_postgresql(IdentifierSequence._meta.db_table, name, using)
+
+        with transaction.atomic(using=using):
+            sequence, _ = IdentifierSequence.objects.using(using).select_for_update().get_or_create(
+                name=name, defaults={'last_value': 0}
+            )
+            first = sequence.last_value + 1
+            sequence.last_value += self.block_size
+            sequence.save(update_fields=['last_value'])
+        return first
+
+    def _counter_connection(self, using):
+        """Return the process's autocommit connection for counter updates. Call with ``_lock`` held."""
+        if self._pid != os.getpid():
+            # A forked worker must not share the parent's socket; open its own.
+            self._connections = {}
+            self._pid = os.getpid()
+        if using not in self._connections:
+            connection = connections.create_connection(using)
+            connection.inc_thread_sharing()
+            self._connections[using] = connection
+        return self._connections[using]
+
+    def _reserve_postgresql(self, table, name, using):
+        connection = self._counter_connection(using)
+        table = connection.ops.quote_name(table)
+        for attempt in range(2):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {table} (name, last_value) VALUES (%s, %s) '
+                        f'ON CONFLICT (name) DO UPDATE SET last_value = {table}.last_value + EXCLUDED.last_value '
+                        'RETURNING last_value',
+                        [name, self.block_size],
+                    )
+                    return cursor.fetchone()[0] - self.block_size + 1
+            except (InterfaceError, OperationalError):
+                # A dropped connection is reopened once; the statement is atomic on its own.
+                connection.close()
+                if attempt:
+                    raise
+
+
+allocator = IdentifierAllocator()
+
+
+def generate_identifier(prefix, using='default'):
+    return allocator.generate(prefix, using)
@@ -2,11 +2,93 @@
 Base models and mixins for ServiceHub.
 """
 
+from functools import lru_cache
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
 
+@lru_cache(maxsize=None)
+def get_tracked_fields(model):
+    """Return ``(name, attname)`` pairs of the concrete fields tracked for ``model``."""
+    untracked = getattr(model, 'untracked_fields', ())
+    return tuple(
+        (field.name, field.attname)
+        for field in model._meta.concrete_fields
+        if field.name not in untracked
+    )
+
+
+def to_json_value(value):
+    """Convert a field value to its compact JSON representation."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class FieldTrackingMixin:
+    """
+    Remember field values as they were loaded so changes can be diffed in memory.
+    
+    The snapshot is taken in ``from_db`` from the values the row was read with
+    and refreshed after every ``save``, so computing a diff never queries the
+    database. ``untracked_fields`` lists fields left out of diffs.
+    """
+    
+    untracked_fields = ('search_vector', 'updated_at')
+    _loaded_values = {}
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def get_snapshot(self):
+        """Return the values the tracked fields had when loaded or last saved."""
+        return dict(self._loaded_values)
+    
+    def get_changes(self, snapshot=None):
+        """
+        Return ``(old_values, new_values)`` for the fields that differ from
+        ``snapshot`` (by default the loaded values). Fields absent from the
+        snapshot, as on a new instance, only appear in ``new_values``.
+        """
+        if snapshot is None:
+            snapshot = self._loaded_values
+        old_values = {}
+        new_values = {}
+        for name, attname in get_tracked_fields(type(self)):
+            if attname not in self.__dict__:
+                continue
+            value = self.__dict__[attname]
+            if attname in snapshot:
+                if snapshot[attname] == value:
+                    continue
+                old_values[name] = to_json_value(snapshot[attname])
+            new_values[name] = to_json_value(value)
+        return old_values, new_values
+    
+    def _refresh_snapshot(self, fields=None):
+        saved = {
+            attname: self.__dict__[attname]
+            for name, attname in get_tracked_fields(type(self))
+            if attname in self.__dict__ and (fields is None or name in fields or attname in fields)
+        }
+        self._loaded_values = {**self._loaded_values, **saved}
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._refresh_snapshot(kwargs.get('update_fields'))
+    
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._refresh_snapshot(fields)
+
+
 class SoftDeleteManager(models.Manager):
     """Manager for soft-deleted models."""
     
@@ -20,7 +102,7 @@ class SoftDeleteManager(models.Manager):
         return super().get_queryset().filter(deleted_at__isnull=False)
 
 
-class SoftDeleteModel(models.Model):
+class SoftDeleteModel(FieldTrackingMixin, models.Model):
     """Abstract model for soft delete functionality."""
     
     deleted_at = models.DateTimeField(_('deletado em'), null=True, blank=True)
@@ -50,7 +132,7 @@ class SoftDeleteModel(models.Model):
         return self.deleted_at is not None
 
 
-class AuditModel(models.Model):
+class AuditModel(FieldTrackingMixin, models.Model):
     """Abstract model for audit trail."""
     
     created_by = models.CharField(_('criado por'), max_length=255, null=True, blank=True)
@@ -90,7 +172,10 @@ class AuditLog(models.Model):
     new_values = models.JSONField(_('valores novos'), default=dict, blank=True)
     ip_address = models.GenericIPAddressField(_('endereço IP'), null=True, blank=True)
     user_agent = models.TextField(_('user agent'), blank=True)
-    created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
+    # Set when the action happened, not when the entry reached the database.
+    created_at = models.DateTimeField(_('criado em'), default=timezone.now)
+    # Lets redelivered entries from the audit stream be ignored.
+    event_id = models.CharField(_('ID do evento'), max_length=32, unique=True, null=True, editable=False)
     
     class Meta:
         verbose_name = _('Log de Auditoria')
@@ -104,3 +189,20 @@ class AuditLog(models.Model):
     def __str__(self):
         return f"{self.get_action_display()} - {self.model_name} ({self.object_id})"
 
+
+
+class IdentifierSequence(models.Model):
+    """
+    Per-day counter behind generated identifiers, named ``<prefix>-<YYYYMMDD>``
+    (see ``servicehub.utils.identifiers``).
+    """
+    
+    name = models.CharField(_('nome'), max_length=50, unique=True)
+    last_value = models.BigIntegerField(_('último valor'), default=0)
+    
+    class Meta:
+        verbose_name = _('Sequência de Identificadores')
+        verbose_name_plural = _('Sequências de Identificadores')
+    
+    def __str__(self):
+        return f"{self.name} ({self.last_value})"
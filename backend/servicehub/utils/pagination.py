@@ -0,0 +1,129 @@
+"""
+Custom pagination classes for ServiceHub.
+"""
+
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the full ordering tuple.
+
+    DRF's ``CursorPagination`` only stores the first ordering field in the
+    cursor and falls back to OFFSET for ties. Here the cursor carries every
+    ordering field plus the primary key as a tiebreaker, so each page is a
+    single ``WHERE (created_at, id) < (...)`` range scan regardless of depth.
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(current_position, reverse))
+
+        # Positions are unique, so the offset is only ever non-zero for
+        # cursors built by the stock implementation; honour it regardless.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                values = json.loads(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _get_keyset_filter(self, position, reverse):
+        """Build the lexicographic ``(f1, f2, ...) > (v1, v2, ...)`` predicate."""
+        values = json.loads(position)
+        keyset = Q()
+        equal_prefix = Q()
+        for field, value in zip(self.ordering, values):
+            attr = field.lstrip('-')
+            # Test for: (cursor reversed) XOR (field reversed)
+            lookup = 'lt' if reverse != field.startswith('-') else 'gt'
+            keyset |= equal_prefix & Q(**{f'{attr}__{lookup}': value})
+            equal_prefix &= Q(**{attr: value})
+        return keyset
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            attr = field.lstrip('-')
+            value = instance[attr] if isinstance(instance, dict) else getattr(instance, attr)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return json.dumps(values, separators=(',', ':'))
+
+
+class FixedOrderingCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination in the class ``ordering`` only.
+
+    For nested lists served by a viewset action, where ``?ordering`` names
+    fields of the parent model and must not reach the child queryset.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
@@ -0,0 +1,373 @@
+"""
+Monthly range partitioning of the append-only log tables, with a cold archive.
+
+``AuditLog`` and ``DailyActivity`` are partitioned on PostgreSQL by
+``created_at``, one partition per UTC calendar month (``<table>_pYYYYMM``),
+plus a ``<table>_default`` partition that catches rows outside them. Indexes
+and the primary key ``(id, created_at)`` are declared on the parent, so every
+partition carries its own small ``(user, created_at)`` index and date filters
+only visit the matching months.
+
+The apps do not ship migrations, so ``install_partitioning`` runs from
+``post_migrate`` and converts a plain table in place the first time. After
+that:
+
+- ``create_partitions`` adds the partitions for the next
+  ``PARTITION_MONTHS_AHEAD`` months, moving any matching rows out of the
+  default partition.
+- ``archive_partitions`` detaches the partitions older than
+  ``PARTITION_RETENTION_MONTHS`` and writes each one to
+  ``PARTITION_ARCHIVE_DIR/<table>/<partition>.ndjson.gz``. Rows are written as
+  independent gzip members of ``ARCHIVE_BLOCK_ROWS`` rows, described by a
+  ``<partition>.index.json`` sidecar that holds the byte offset and time range
+  of each block. The table is dropped only after the archive is written and
+  the row count matches.
+
+``read_archive`` uses the sidecars to decompress only the blocks that overlap
+the requested range. It works on any backend.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+
+
+PARTITIONED_MODELS = ('servicehub.AuditLog', 'analytics.DailyActivity')
+PARTITION_KEY = 'created_at'
+ARCHIVE_BLOCK_ROWS = 1000
+
+
+def get_partitioned_models():
+    return [apps.get_model(label) for label in PARTITIONED_MODELS]
+
+
+def partitioning_supported(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def month_start(value):
+    """Return the first day of the UTC month containing ``value`` (date or datetime)."""
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Return the aware ``[start, end)`` datetimes of ``month``."""
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc)
+    return start, end
+
+
+def partition_name(model, month):
+    return f'{model._meta.db_table}_p{month:%Y%m}'
+
+
+def _parse_partition(model, name):
+    match = re.fullmatch(rf'{re.escape(model._meta.db_table)}_p(\d{{4}})(\d{{2}})', name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def build_partition_sql(model, month):
+    """Return the statements creating ``month``'s partition of ``model``."""
+    table = model._meta.db_table
+    name = partition_name(model, month)
+    start, end = (value.isoformat(sep=' ') for value in month_bounds(month))
+    return [
+        f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS);',
+        # Rows written before the partition existed landed in the default one.
+        f"""
+        WITH moved AS (
+            DELETE FROM {table}_default
+            WHERE {PARTITION_KEY} >= '{start}' AND {PARTITION_KEY} < '{end}'
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved;
+        """,
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}');",
+    ]
+
+
+def build_conversion_sql(model, schema_editor):
+    """Return the statements replacing ``model``'s plain table by a partitioned one."""
+    table = model._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    pk = model._meta.pk.column
+    statements = [
+        f'ALTER TABLE {table} RENAME TO {legacy};',
+        f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({PARTITION_KEY});',
+        f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;',
+        f'INSERT INTO {table} SELECT * FROM {legacy};',
+        # Dropping the old table frees its constraint, index and sequence names.
+        f'DROP TABLE {legacy};',
+        # Identity columns are not allowed on partitioned tables before PostgreSQL 17.
+        f'CREATE SEQUENCE {table}_{pk}_seq OWNED BY {table}.{pk};',
+        f"ALTER TABLE {table} ALTER COLUMN {pk} SET DEFAULT nextval('{table}_{pk}_seq');",
+        f"SELECT setval('{table}_{pk}_seq', COALESCE((SELECT MAX({pk}) FROM {table}), 0) + 1, false);",
+        # Unique constraints on a partitioned table must include the partition key.
+        f'ALTER TABLE {table} ADD PRIMARY KEY ({pk}, {PARTITION_KEY});',
+    ]
+    for field in model._meta.local_concrete_fields:
+        if field.unique and not field.primary_key:
+            statements.append(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_{field.column}_{PARTITION_KEY}_uniq '
+                f'UNIQUE ({field.column}, {PARTITION_KEY});'
+            )
+        if field.remote_field and field.db_constraint:
+            statements.append(str(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s')))
+    statements += [str(statement) for statement in schema_editor._model_indexes_sql(model)]
+    return statements
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def _list_partitions(cursor, model):
+    """Return ``{month: attached}`` for the monthly tables of ``model``, attached or not."""
+    table = model._meta.db_table
+    cursor.execute(
+        """
+        SELECT c.relname, i.inhparent IS NOT NULL
+        FROM pg_class c
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = to_regclass(%s)
+        WHERE c.relkind = 'r' AND c.relname LIKE %s
+        """,
+        [table, f'{table}_p%'],
+    )
+    partitions = {}
+    for name, attached in cursor.fetchall():
+        month = _parse_partition(model, name)
+        if month is not None:
+            partitions[month] = attached
+    return partitions
+
+
+def create_partitions(model, months_ahead=None, using='default'):
+    """Create the missing partitions up to ``months_ahead`` months from now; return their names."""
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    connection = connections[using]
+    current = month_start(datetime.now(dt_timezone.utc))
+    created = []
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        existing = _list_partitions(cursor, model)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            for statement in build_partition_sql(model, month):
+                cursor.execute(statement)
+            created.append(partition_name(model, month))
+    return created
+
+
+def install_partitioning(sender, using='default', **kwargs):
+    """``post_migrate`` handler partitioning ``sender``'s log tables on PostgreSQL."""
+    if not partitioning_supported(using):
+        return
+
+    connection = connections[using]
+    for model in sender.get_models():
+        if model._meta.label not in PARTITIONED_MODELS:
+            continue
+        table = model._meta.db_table
+        with connection.schema_editor() as schema_editor, connection.cursor() as cursor:
+            if _is_partitioned(cursor, table):
+                continue
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', {PARTITION_KEY} AT TIME ZONE 'UTC')::date FROM {table}"
+            )
+            months = [row[0] for row in cursor.fetchall()]
+            for statement in build_conversion_sql(model, schema_editor):
+                schema_editor.execute(statement, params=None)
+            for month in sorted(months):
+                for statement in build_partition_sql(model, month):
+                    schema_editor.execute(statement, params=None)
+        create_partitions(model, using=using)
+
+
+def get_archive_dir(model):
+    return Path(settings.PARTITION_ARCHIVE_DIR) / model._meta.db_table
+
+
+def _json_fields(model):
+    return [field for field in model._meta.concrete_fields if field.get_internal_type() == 'JSONField']
+
+
+def write_archive(model, month, rows):
+    """
+    Write ``rows`` (dicts keyed by attname, oldest first) as ``month``'s
+    archive of ``model`` and return the sidecar index.
+    """
+    directory = get_archive_dir(model)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = partition_name(model, month)
+    data_path = directory / f'{name}.ndjson.gz'
+    index_path = directory / f'{name}.index.json'
+    start, end = month_bounds(month)
+
+    blocks, block, offset, total = [], [], 0, 0
+    digest = hashlib.sha256()
+    with open(f'{data_path}.tmp', 'wb') as archive:
+        def flush():
+            nonlocal offset
+            payload = gzip.compress(
+                ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in block).encode()
+            )
+            archive.write(payload)
+            digest.update(payload)
+            blocks.append({
+                'offset': offset,
+                'length': len(payload),
+                'rows': len(block),
+                'min': block[0][PARTITION_KEY].isoformat(),
+                'max': block[-1][PARTITION_KEY].isoformat(),
+            })
+            offset += len(payload)
+            block.clear()
+
+        for row in rows:
+            block.append(row)
+            total += 1
+            if len(block) >= ARCHIVE_BLOCK_ROWS:
+                flush()
+        if block:
+            flush()
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    index = {
+        'model': model._meta.label,
+        'partition': name,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'rows': total,
+        'sha256': digest.hexdigest(),
+        'blocks': blocks,
+    }
+    os.replace(f'{data_path}.tmp', data_path)
+    with open(f'{index_path}.tmp', 'w', encoding='utf-8') as sidecar:
+        json.dump(index, sidecar, indent=2)
+    os.replace(f'{index_path}.tmp', index_path)
+    return index
+
+
+def _iter_partition_rows(model, name, using):
+    """Stream a detached partition as dicts keyed by attname, oldest first."""
+    connection = connections[using]
+    json_fields = {field.column: field for field in _json_fields(model)}
+    columns = {field.column: field.attname for field in model._meta.concrete_fields}
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(f'SELECT * FROM {name} ORDER BY {PARTITION_KEY}, {model._meta.pk.column}')
+        names = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(ARCHIVE_BLOCK_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                record = {}
+                for column, value in zip(names, row):
+                    if column in json_fields:
+                        value = json_fields[column].from_db_value(value, None, connection)
+                    record[columns[column]] = value
+                yield record
+
+
+def archive_partition(model, month, using='default'):
+    """Detach, archive and drop ``month``'s partition of ``model``; return the row count."""
+    table = model._meta.db_table
+    name = partition_name(model, month)
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if _list_partitions(cursor, model).get(month):
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name};')
+
+    with transaction.atomic(using=using):
+        index = write_archive(model, month, _iter_partition_rows(model, name, using))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {name}')
+            expected = cursor.fetchone()[0]
+            if expected != index['rows']:
+                raise RuntimeError(f'Archive of {name} holds {index["rows"]} rows, expected {expected}')
+            cursor.execute(f'DROP TABLE {name};')
+    return index['rows']
+
+
+def archive_partitions(model, retention_months=None, using='default'):
+    """Archive every partition older than the retention window; return ``{name: rows}``."""
+    if retention_months is None:
+        retention_months = settings.PARTITION_RETENTION_MONTHS
+    cutoff = add_months(month_start(datetime.now(dt_timezone.utc)), -retention_months)
+    with connections[using].cursor() as cursor:
+        # Partitions detached by an interrupted run are picked up again.
+        months = sorted(month for month in _list_partitions(cursor, model) if month < cutoff)
+    return {
+        partition_name(model, month): archive_partition(model, month, using=using)
+        for month in months
+    }
+
+
+def _load_index(path):
+    with open(path, encoding='utf-8') as sidecar:
+        return json.load(sidecar)
+
+
+def read_archive(model, start=None, end=None, **filters):
+    """
+    Return unsaved ``model`` instances from the archive created in
+    ``[start, end)`` and matching ``filters`` (exact attname values),
+    newest first.
+    """
+    directory = get_archive_dir(model)
+    if not directory.is_dir():
+        return []
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    wanted = {key: str(value) for key, value in filters.items()}
+
+    def overlaps(low, high):
+        return (end is None or datetime.fromisoformat(low) < end) and (
+            start is None or datetime.fromisoformat(high) >= start
+        )
+
+    instances = []
+    for index_path in sorted(directory.glob('*.index.json')):
+        index = _load_index(index_path)
+        if not overlaps(index['start'], index['end']):
+            continue
+        with open(directory / f'{index["partition"]}.ndjson.gz', 'rb') as archive:
+            for block in index['blocks']:
+                if not overlaps(block['min'], block['max']):
+                    continue
+                archive.seek(block['offset'])
+                lines = gzip.decompress(archive.read(block['length'])).decode().splitlines()
+                for line in lines:
+                    record = json.loads(line)
+                    if any(str(record.get(key)) != value for key, value in wanted.items()):
+                        continue
+                    instance = model(**{
+                        attname: fields[attname].to_python(value)
+                        for attname, value in record.items() if attname in fields
+                    })
+                    created_at = getattr(instance, PARTITION_KEY)
+                    if (start is None or created_at >= start) and (end is None or created_at < end):
+                        instances.append(instance)
+    instances.sort(key=lambda instance: getattr(instance, PARTITION_KEY), reverse=True)
+    return instances
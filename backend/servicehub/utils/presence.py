@@ -0,0 +1,73 @@
+"""
+Online presence of users connected over WebSocket.
+
+``NotificationConsumer``, the socket every signed-in page keeps open, records
+each connection as a member of the user's Redis sorted set, scored by the
+time it stops counting: ``PRESENCE_TTL`` seconds after the connect or the
+latest ``ping`` heartbeat. Disconnects remove the member. A connection lost
+without one (a crashed worker) simply ages out, and the key expires with its
+last member, so nothing has to be swept.
+
+``online_users`` answers "who is online among these ids" with one ``ZCOUNT``
+per user in a single pipelined round trip, e.g. to decide between a
+WebSocket push and a WhatsApp message.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Live WebSocket connections per user in Redis sorted sets."""
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.prefix = settings.PRESENCE_KEY_PREFIX
+        self.ttl = settings.PRESENCE_TTL
+
+    def _key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def touch(self, user_id, connection):
+        """Mark ``connection`` of ``user_id`` online for another ``PRESENCE_TTL`` seconds."""
+        now = time.time()
+        key = self._key(user_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(key, {connection: now + self.ttl})
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def leave(self, user_id, connection):
+        self.client.zrem(self._key(user_id), connection)
+
+    def online(self, user_ids):
+        """Return the set of ``user_ids`` with at least one live connection."""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return set()
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcount(self._key(user_id), f'({now}', '+inf')
+        return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+
+
+def get_presence():
+    return PresenceTracker()
+
+
+def online_users(user_ids):
+    """Return the ids among ``user_ids`` that are online; none when Redis is unavailable."""
+    try:
+        return get_presence().online(user_ids)
+    except RedisError:
+        logger.warning('Presence unavailable, treating %d users as offline', len(user_ids), exc_info=True)
+        return set()
@@ -0,0 +1,33 @@
+"""
+Queryset helpers shared by the ServiceHub viewsets.
+"""
+
+
+class EagerLoadingMixin:
+    """
+    Apply a per-action ``select_related``/``prefetch_related`` plan.
+    
+    Views declare ``eager_loading`` as a mapping of action name to a dict with
+    optional ``select_related``, ``prefetch_related`` and ``defer`` sequences,
+    matching what the serializer used by that action reads. Actions without an entry
+    (exports, imports, custom endpoints that only touch the row itself) get
+    the plain queryset.
+    """
+    
+    eager_loading = {}
+    
+    def get_queryset(self):
+        return self.apply_eager_loading(super().get_queryset())
+    
+    def apply_eager_loading(self, queryset):
+        """Apply the current action's plan; use it for querysets built by hand."""
+        plan = self.eager_loading.get(self.action)
+        if not plan:
+            return queryset
+        if plan.get('select_related'):
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        if plan.get('defer'):
+            queryset = queryset.defer(*plan['defer'])
+        return queryset
@@ -0,0 +1,335 @@
+"""
+Model change events for the WebSocket consumers.
+
+Saves and deletes of ``Quote``, ``Client`` and ``ServiceOrder`` (see
+``servicehub.utils.signals``) are described once the transaction commits,
+so rolled back changes are never announced. Each change becomes messages for
+the channel-layer groups the consumers join:
+
+- quote groups: ``quote.created``, ``quote.status_changed`` or
+  ``quote.updated``. They go to ``quotes_updates``, which only admins and
+  managers without filters join, and to one group per filter value:
+  ``quotes_client_<id>``, ``quotes_assigned_to_<id>`` (the owner, i.e.
+  ``assigned_to`` falling back to ``created_by``) and
+  ``quotes_status_<status>``. When the owner or status changes, the group of
+  the previous value receives the event too, so its subscribers learn the
+  quote left. ``QuoteConsumer`` joins the groups of one filter and checks
+  the others on each event, so every quote event reaches only the sockets
+  interested in it;
+- ``notifications_<id>`` of the owners (``assigned_to`` and ``created_by``):
+  ``quote.update``, ``client.update`` or ``notification.message`` for
+  service orders;
+- ``activity_<id>`` of the same users: ``activity.log``.
+
+``REALTIME_EVENTS_MODE`` selects how they are sent:
+
+- ``sync``: from the request, right after the commit. This is the default for
+  tests and local development.
+- ``coalesced``: changes are queued for a background thread in each process.
+  The thread waits ``REALTIME_COALESCE_WINDOW`` seconds (200 ms) after the
+  first change and merges changes to the same object, so 50 saves of a quote
+  become one message per group. It keeps the first known previous status and
+  the latest values. The merged messages are then sent with concurrent
+  ``group_send`` calls on the thread's own event loop. The queue holds at most
+  ``REALTIME_QUEUE_SIZE`` changes; further ones are dropped and counted, since
+  clients can always reload from the API.
+
+When ``REALTIME_REPLAY_SIZE`` is set, ``notifications_<id>`` messages are
+stamped with the user's next sequence number and buffered right before they
+are sent, so reconnecting clients can replay what they missed (see
+``servicehub.utils.replay``). If Redis is unavailable they go out unstamped.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .replay import get_replay_buffer
+
+logger = logging.getLogger(__name__)
+
+QUOTES_GROUP = 'quotes_updates'
+# Quote subscription filters, most selective first.
+QUOTE_FILTERS = ('client', 'assigned_to', 'status')
+
+ACTION_LABELS = {'created': 'criado', 'updated': 'atualizado', 'deleted': 'excluído'}
+
+
+def quote_group(dimension, value):
+    """Return the group of quote events whose ``dimension`` is ``value``."""
+    return f'quotes_{dimension}_{value}'
+
+
+def describe_change(instance, created=False, deleted=False):
+    """Return a plain description of a saved or deleted instance, or ``None`` for other models."""
+    label = instance._meta.label
+    if label not in ('quotes.Quote', 'clients.Client', 'services.ServiceOrder'):
+        return None
+    snapshot = instance.get_snapshot() if hasattr(instance, 'get_snapshot') else {}
+    if getattr(instance, 'deleted_at', None) is not None:
+        deleted = True
+    change = {
+        'model': label,
+        'id': instance.pk,
+        'created': created,
+        'deleted': deleted,
+        'old_status': None if created else snapshot.get('status'),
+        'status': instance.status,
+        'owners': sorted({
+            owner_id
+            for owner_id in (getattr(instance, 'assigned_to_id', None), getattr(instance, 'created_by_id', None))
+            if owner_id is not None
+        }),
+        'timestamp': timezone.now().isoformat(),
+        'changes': 1,
+    }
+    if label == 'quotes.Quote':
+        old_owner = snapshot.get('assigned_to_id') or snapshot.get('created_by_id')
+        change.update(
+            label=instance.quote_number, title=instance.title,
+            client=instance.client_id, value=str(instance.total),
+            assigned_to=instance.assigned_to_id or instance.created_by_id,
+            old_assigned_to=None if created else old_owner,
+        )
+    elif label == 'clients.Client':
+        change.update(label=instance.name)
+    else:
+        change.update(label=instance.order_number)
+    return change
+
+
+def merge_changes(first, later):
+    """Fold ``later`` into ``first``: the first previous status, the latest values."""
+    merged = {**later}
+    merged['created'] = first['created'] or later['created']
+    merged['old_status'] = first['old_status']
+    if 'old_assigned_to' in first:
+        merged['old_assigned_to'] = first['old_assigned_to']
+    merged['owners'] = sorted(set(first['owners']) | set(later['owners']))
+    merged['changes'] = first['changes'] + later['changes']
+    return merged
+
+
+def quote_groups(change):
+    """Return the groups receiving the events of a quote change."""
+    groups = {QUOTES_GROUP, quote_group('client', change['client'])}
+    for dimension in ('assigned_to', 'status'):
+        for value in (change[dimension], change[f'old_{dimension}']):
+            if value is not None:
+                groups.add(quote_group(dimension, value))
+    return sorted(groups)
+
+
+def build_messages(change):
+    """Return the ``(group, message)`` pairs announcing ``change``."""
+    action = 'deleted' if change['deleted'] else 'created' if change['created'] else 'updated'
+    timestamp = change['timestamp']
+    messages = []
+    if change['model'] == 'quotes.Quote':
+        entity = 'quote'
+        event = {
+            'quote_id': change['id'], 'client': change['client'], 'status': change['status'],
+            'assigned_to': change['assigned_to'], 'old_assigned_to': change['old_assigned_to'],
+            'old_status': change['old_status'], 'value': change['value'], 'timestamp': timestamp,
+        }
+        if action == 'created':
+            event.update(type='quote.created', title=change['title'])
+        elif action == 'updated' and change['old_status'] not in (None, change['status']):
+            event.update(type='quote.status_changed', new_status=change['status'])
+        else:
+            event.update(type='quote.updated', action=action)
+        messages.extend((group, event) for group in quote_groups(change))
+        notification = {
+            'type': 'quote.update', 'quote_id': change['id'], 'status': change['status'],
+            'message': f'Orçamento {change["label"]} {ACTION_LABELS[action]}', 'timestamp': timestamp,
+        }
+    elif change['model'] == 'clients.Client':
+        entity = 'client'
+        notification = {
+            'type': 'client.update', 'client_id': change['id'], 'action': action,
+            'data': {'name': change['label'], 'status': change['status']}, 'timestamp': timestamp,
+        }
+    else:
+        entity = 'service_order'
+        notification = {
+            'type': 'notification.message', 'title': 'Pedido de Serviço',
+            'message': f'Pedido {change["label"]} {ACTION_LABELS[action]}',
+            'data': {'service_order_id': change['id'], 'status': change['status']}, 'timestamp': timestamp,
+        }
+
+    for owner_id in change['owners']:
+        messages.append((f'notifications_{owner_id}', notification))
+        messages.append((f'activity_{owner_id}', {
+            'type': 'activity.log', 'action': action, 'user': owner_id,
+            'entity': {'type': entity, 'id': change['id'], 'label': change['label'], 'status': change['status']},
+            'timestamp': timestamp,
+        }))
+    return messages
+
+
+async def send_messages(messages):
+    """Send ``(group, message)`` pairs concurrently; return the number that failed."""
+    layer = get_channel_layer()
+    if layer is None:
+        return len(messages)
+    results = await asyncio.gather(
+        *(layer.group_send(group, message) for group, message in messages),
+        return_exceptions=True,
+    )
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        logger.warning('Could not send %d realtime messages', len(failed), exc_info=failed[0])
+    return len(failed)
+
+
+def sequence_messages(messages):
+    """Return ``messages`` with the notifications stamped and buffered for replay."""
+    buffer = get_replay_buffer()
+    positions = [index for index, (group, _) in enumerate(messages) if group.startswith('notifications_')]
+    if buffer is None or not positions:
+        return messages
+    try:
+        stamped = buffer.append([
+            (int(messages[index][0].rpartition('_')[2]), messages[index][1]) for index in positions
+        ])
+    except RedisError:
+        logger.warning('Replay buffer unavailable, notifications sent without sequence numbers', exc_info=True)
+        return messages
+    messages = list(messages)
+    for index, message in zip(positions, stamped):
+        messages[index] = (messages[index][0], message)
+    return messages
+
+
+class EventPublisher:
+    """Per-process queue of changes coalesced and sent by a background thread."""
+
+    def __init__(self, queue_size, window):
+        self.window = window
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._loop = None
+        self._stats = {'enqueued': 0, 'dropped': 0, 'coalesced': 0, 'sent': 0, 'failed': 0, 'batches': 0}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def enqueue(self, change):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self._count(dropped=1)
+            logger.warning('Dropped realtime event for %s %s (queue full)', change['model'], change['id'])
+        else:
+            self._count(enqueued=1)
+
+    def _ensure_thread(self):
+        # Worker processes are forked after import; start one thread per process.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, name='realtime-publisher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get()
+                self.publish(self._collect(first))
+            except Exception:
+                logger.exception('Realtime publisher failed')
+
+    def _collect(self, first):
+        """Merge the changes arriving within the window after ``first``, keyed by object."""
+        pending = {(first['model'], first['id']): first}
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                change = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            key = (change['model'], change['id'])
+            pending[key] = merge_changes(pending[key], change) if key in pending else change
+        return list(pending.values())
+
+    def publish(self, changes):
+        messages = sequence_messages([message for change in changes for message in build_messages(change)])
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        failed = self._loop.run_until_complete(send_messages(messages))
+        self._count(
+            coalesced=sum(change['changes'] - 1 for change in changes),
+            sent=len(messages) - failed, failed=failed, batches=1,
+        )
+
+    def drain(self):
+        """Publish whatever is queued in the calling thread (shutdown and tests)."""
+        changes = {}
+        while True:
+            try:
+                change = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            key = (change['model'], change['id'])
+            changes[key] = merge_changes(changes[key], change) if key in changes else change
+        if changes:
+            self.publish(list(changes.values()))
+
+
+_publisher = None
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None:
+        _publisher = EventPublisher(
+            queue_size=settings.REALTIME_QUEUE_SIZE,
+            window=settings.REALTIME_COALESCE_WINDOW,
+        )
+    return _publisher
+
+
+def _send_now(change):
+    try:
+        async_to_sync(send_messages)(sequence_messages(build_messages(change)))
+    except Exception:
+        logger.warning('Could not publish realtime event for %s %s', change['model'], change['id'], exc_info=True)
+
+
+def publish_change(instance, created=False, deleted=False):
+    """Announce the change of ``instance`` to its WebSocket groups once the transaction commits."""
+    change = describe_change(instance, created=created, deleted=deleted)
+    if change is None:
+        return
+    if settings.REALTIME_EVENTS_MODE == 'coalesced':
+        transaction.on_commit(lambda: get_publisher().enqueue(change))
+    else:
+        transaction.on_commit(lambda: _send_now(change))
@@ -0,0 +1,17 @@
+"""
+Shared Redis connection for ServiceHub features that talk to Redis directly.
+"""
+
+import redis
+from django.conf import settings
+
+
+_client = None
+
+
+def get_redis():
+    """Return a process-wide client for ``settings.REDIS_URL``."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
@@ -0,0 +1,89 @@
+"""
+Per-user replay buffer for the notification stream.
+
+Every message for a ``notifications_<id>`` group is stamped with the user's
+next sequence number (``seq``) and kept in a Redis sorted set scored by it.
+The set is trimmed to the last ``REALTIME_REPLAY_SIZE`` messages, and both
+keys expire ``REALTIME_REPLAY_TTL`` seconds after the user's last message. A
+reconnecting ``NotificationConsumer`` passes the last ``seq`` it saw and
+receives only the messages after it. When some of them are no longer
+buffered (trimmed, expired, or the counter restarted), ``since`` returns
+``None`` and the client is told to resync from the API instead.
+
+Keys share a ``{<user id>}`` hash tag, so they stay on one node in a Redis
+cluster.
+"""
+
+import json
+from collections import Counter
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+
+class ReplayBuffer:
+    """Sequence counters and bounded message buffers in Redis, one pair per user."""
+
+    def __init__(self, client=None):
+        self.client = client or get_redis()
+        self.prefix = settings.REALTIME_REPLAY_KEY_PREFIX
+        self.size = settings.REALTIME_REPLAY_SIZE
+        self.ttl = settings.REALTIME_REPLAY_TTL
+
+    def _keys(self, user_id):
+        return f'{self.prefix}:{{{user_id}}}:seq', f'{self.prefix}:{{{user_id}}}:events'
+
+    def append(self, messages):
+        """Stamp and buffer ``(user_id, message)`` pairs; return the stamped messages in order."""
+        counts = Counter(user_id for user_id, _ in messages)
+        if not counts:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, count in counts.items():
+            pipe.incrby(self._keys(user_id)[0], count)
+        next_seq = {
+            user_id: last - counts[user_id] + 1 for user_id, last in zip(counts, pipe.execute())
+        }
+
+        stamped = []
+        pipe = self.client.pipeline(transaction=True)
+        for user_id, message in messages:
+            message = {**message, 'seq': next_seq[user_id]}
+            next_seq[user_id] += 1
+            pipe.zadd(self._keys(user_id)[1], {json.dumps(message, default=str): message['seq']})
+            stamped.append(message)
+        for user_id in counts:
+            seq_key, events_key = self._keys(user_id)
+            pipe.zremrangebyrank(events_key, 0, -self.size - 1)
+            pipe.expire(seq_key, self.ttl)
+            pipe.expire(events_key, self.ttl)
+        pipe.execute()
+        return stamped
+
+    def since(self, user_id, last_seq):
+        """
+        Return ``(current seq, messages after last_seq)``; the messages are
+        ``None`` when the gap cannot be replayed in full.
+        """
+        seq_key, events_key = self._keys(user_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(seq_key)
+        pipe.zrange(events_key, 0, 0, withscores=True)
+        pipe.zrangebyscore(events_key, f'({last_seq}', '+inf')
+        current, oldest, members = pipe.execute()
+        current = int(current or 0)
+        if last_seq > current:
+            return current, None
+        if last_seq == current:
+            return current, []
+        if not oldest or oldest[0][1] > last_seq + 1:
+            return current, None
+        return current, [json.loads(member) for member in members]
+
+
+def get_replay_buffer():
+    """Return the replay buffer, or ``None`` when ``REALTIME_REPLAY_SIZE`` is 0."""
+    if not settings.REALTIME_REPLAY_SIZE:
+        return None
+    return ReplayBuffer()
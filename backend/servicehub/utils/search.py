@@ -0,0 +1,221 @@
+"""
+Full-text and trigram search for ServiceHub.
+
+On PostgreSQL every searchable model carries a ``search_vector`` column that a
+trigger keeps up to date using the ``portuguese_unaccent`` text search
+configuration (Portuguese stemming plus accent folding). Identifier-like
+columns (email, document, phone, numbers) get trigram GIN indexes so the
+substring lookups issued by ``SearchFilter`` are served from an index as well.
+The DDL is installed from ``post_migrate`` because the apps do not ship
+migrations. Other backends (SQLite in tests) fall back to the stock
+``icontains`` behaviour.
+"""
+
+import operator
+import re
+from dataclasses import dataclass
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+
+SEARCH_CONFIG = 'portuguese_unaccent'
+SEARCH_VECTOR_FIELD = 'search_vector'
+SEARCH_RANK_FIELD = 'search_rank'
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    """Describe how a model's ``search_vector`` and trigram indexes are built."""
+
+    # (column or SQL expression over NEW, tsvector weight)
+    weights: tuple
+    # Columns matched by substring through a trigram index.
+    trigram_fields: tuple = ()
+    # Extra columns whose change must refresh the vector.
+    watch: tuple = ()
+
+
+SEARCH_DOCUMENTS = {
+    'clients.Client': SearchDocument(
+        weights=(('name', 'A'), ('company_name', 'A'), ('email', 'B')),
+        trigram_fields=('email', 'document', 'phone'),
+    ),
+    'quotes.Quote': SearchDocument(
+        weights=(
+            ('title', 'A'),
+            ('(SELECT name FROM clients_client WHERE id = NEW.client_id)', 'B'),
+        ),
+        trigram_fields=('quote_number',),
+        watch=('client_id',),
+    ),
+    'services.Service': SearchDocument(
+        weights=(('name', 'A'), ('description', 'B')),
+        trigram_fields=('name',),
+    ),
+}
+
+
+SEARCH_SETUP_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{config}') THEN
+        CREATE TEXT SEARCH CONFIGURATION {config} (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION {config}
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END
+$$;
+"""
+
+# Renaming a client must refresh the denormalised name in its quotes' vectors.
+CLIENT_RENAME_SQL = """
+CREATE OR REPLACE FUNCTION clients_client_search_cascade() RETURNS trigger AS $$
+BEGIN
+    UPDATE quotes_quote SET search_vector = NULL WHERE client_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS clients_client_search_cascade ON clients_client;
+CREATE TRIGGER clients_client_search_cascade
+    AFTER UPDATE OF name ON clients_client
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION clients_client_search_cascade();
+"""
+
+
+def get_search_document(model):
+    return SEARCH_DOCUMENTS.get(model._meta.label)
+
+
+def _column_sql(expression):
+    return f'NEW.{expression}' if re.fullmatch(r'\w+', expression) else expression
+
+
+def build_search_sql(model, document):
+    """Return the trigger, index and backfill statements for ``model``."""
+    table = model._meta.db_table
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({_column_sql(expr)}, '')), '{weight}')"
+        for expr, weight in document.weights
+    )
+    watched = [expr for expr, _ in document.weights if re.fullmatch(r'\w+', expr)]
+    watched += list(document.watch) + [SEARCH_VECTOR_FIELD]
+
+    statements = [
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.{SEARCH_VECTOR_FIELD} := {vector};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+        """,
+        f'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table};',
+        f"""
+        CREATE TRIGGER {table}_search_vector_update
+            BEFORE INSERT OR UPDATE OF {', '.join(watched)} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update();
+        """,
+        f'CREATE INDEX IF NOT EXISTS {table}_search_vector_gin '
+        f'ON {table} USING gin ({SEARCH_VECTOR_FIELD});',
+    ]
+    # Match the ``UPPER(col::text) LIKE UPPER(...)`` SQL Django emits for icontains.
+    statements += [
+        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+        f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops);'
+        for column in document.trigram_fields
+    ]
+    # Backfill rows written before the trigger existed.
+    statements.append(
+        f'UPDATE {table} SET {SEARCH_VECTOR_FIELD} = NULL WHERE {SEARCH_VECTOR_FIELD} IS NULL;'
+    )
+    return statements
+
+
+def install_search_triggers(sender, using='default', **kwargs):
+    """``post_migrate`` handler installing the search DDL for ``sender``'s models."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    models = [
+        (model, get_search_document(model))
+        for model in sender.get_models()
+        if get_search_document(model) is not None
+    ]
+    if not models:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SETUP_SQL.format(config=SEARCH_CONFIG))
+        for model, document in models:
+            for statement in build_search_sql(model, document):
+                cursor.execute(statement)
+        if sender.label == 'quotes':
+            cursor.execute(CLIENT_RENAME_SQL)
+
+
+def build_prefix_query(term):
+    """Turn free text into a ``to_tsquery`` prefix expression, or ``None``."""
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    ``SearchFilter`` backed by the ``search_vector`` column on PostgreSQL.
+
+    Each search term must match either the full-text vector (prefix match) or
+    one of the document's trigram fields. Ordering by ``search_rank`` (for
+    example ``?search=silva&ordering=-search_rank``) annotates a relevance
+    score; views opt in by listing ``search_rank`` in ``ordering_fields``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        document = get_search_document(queryset.model)
+        search_terms = self.get_search_terms(request)
+        if document is None or connections[queryset.db].vendor != 'postgresql':
+            queryset = super().filter_queryset(request, queryset, view)
+            return self._annotate_rank(request, queryset, None)
+
+        if not search_terms:
+            return self._annotate_rank(request, queryset, None)
+
+        conditions = []
+        for search_term in search_terms:
+            queries = [
+                Q(**{f'{column}__icontains': search_term})
+                for column in document.trigram_fields
+            ]
+            prefix_query = build_prefix_query(search_term)
+            if prefix_query:
+                queries.append(Q(**{SEARCH_VECTOR_FIELD: self._get_query(prefix_query)}))
+            conditions.append(reduce(operator.or_, queries))
+        queryset = queryset.filter(reduce(operator.and_, conditions))
+
+        prefix_query = build_prefix_query(' '.join(search_terms))
+        return self._annotate_rank(
+            request, queryset, self._get_query(prefix_query) if prefix_query else None
+        )
+
+    def _get_query(self, prefix_query):
+        return SearchQuery(prefix_query, config=SEARCH_CONFIG, search_type='raw')
+
+    def _annotate_rank(self, request, queryset, query):
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        if SEARCH_RANK_FIELD not in ordering:
+            return queryset
+        if query is None:
+            rank = Value(0.0, output_field=FloatField())
+        else:
+            rank = SearchRank(F(SEARCH_VECTOR_FIELD), query)
+        return queryset.annotate(**{SEARCH_RANK_FIELD: rank})
@@ -2,58 +2,34 @@
 
 from __future__ import annotations
 
-import secrets
-
-
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
+from servicehub.apps.clients.models import Client
 from servicehub.apps.quotes.models import Proposal, Quote
 from servicehub.apps.services.models import ServiceOrder
-
-
-
-IDENTIFIER_SUFFIX_LENGTH = 4
-MAX_IDENTIFIER_ATTEMPTS = 100
-
-
-def _generate_unique_identifier(model, field_name, prefix):
-    """Return a unique identifier using the legacy ``PREFIX-YYYYMMDD-XXXX`` format."""
-
-    today = timezone.now().strftime("%Y%m%d")
-    lookup_manager = getattr(model, "_default_manager", model.objects)
-
-    for _ in range(MAX_IDENTIFIER_ATTEMPTS):
-        random_suffix = secrets.randbelow(10**IDENTIFIER_SUFFIX_LENGTH)
-        identifier = f"{prefix}-{today}-{random_suffix:0{IDENTIFIER_SUFFIX_LENGTH}d}"
-        if not lookup_manager.filter(**{field_name: identifier}).exists():
-            return identifier
-
-    raise RuntimeError(
-        "Unable to generate a unique identifier after "
-        f"{MAX_IDENTIFIER_ATTEMPTS} attempts"
-    )
+from servicehub.utils.identifiers import generate_identifier
+from servicehub.utils.realtime import publish_change
 
 
 @receiver(pre_save, sender=Quote)
-def generate_quote_number(sender, instance, **kwargs):
+def generate_quote_number(sender, instance, using='default', **kwargs):
     """Generate quote number automatically."""
     if not instance.quote_number:
-        instance.quote_number = _generate_unique_identifier(Quote, 'quote_number', 'QT')
+        instance.quote_number = generate_identifier('QT', using=using)
 
 
 @receiver(pre_save, sender=Proposal)
-def generate_proposal_number(sender, instance, **kwargs):
+def generate_proposal_number(sender, instance, using='default', **kwargs):
     """Generate proposal number automatically."""
     if not instance.proposal_number:
-        instance.proposal_number = _generate_unique_identifier(Proposal, 'proposal_number', 'PR')
+        instance.proposal_number = generate_identifier('PR', using=using)
 
 
 @receiver(pre_save, sender=ServiceOrder)
-def generate_order_number(sender, instance, **kwargs):
+def generate_order_number(sender, instance, using='default', **kwargs):
     """Generate service order number automatically."""
     if not instance.order_number:
-        instance.order_number = _generate_unique_identifier(ServiceOrder, 'order_number', 'SO')
+        instance.order_number = generate_identifier('SO', using=using)
 
 
 @receiver(pre_save, sender=Quote)
@@ -61,3 +37,19 @@ def calculate_quote_total(sender, instance, **kwargs):
     """Calculate quote total automatically."""
     instance.total = instance.subtotal - instance.discount + instance.tax
 
+
+@receiver(post_save, sender=Quote)
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=ServiceOrder)
+def publish_saved_instance(sender, instance, created=False, raw=False, **kwargs):
+    """Announce the change to the WebSocket groups once it commits."""
+    if not raw:
+        publish_change(instance, created=created)
+
+
+@receiver(post_delete, sender=Quote)
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=ServiceOrder)
+def publish_deleted_instance(sender, instance, **kwargs):
+    """Announce the deletion to the WebSocket groups once it commits."""
+    publish_change(instance, deleted=True)
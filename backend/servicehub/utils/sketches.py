@@ -0,0 +1,209 @@
+"""
+Mergeable streaming sketches for analytics rollups.
+
+``KLLSketch`` is the quantile sketch of Karnin, Lang and Liberty ("Optimal
+Quantile Approximation in Streams", 2016). Values enter level 0. A level
+that is full when the sketch as a whole exceeds its capacity is sorted and
+every other item, starting at a random offset, moves up a level with twice
+the weight. Capacities shrink geometrically (factor 2/3) below the top
+level, so the sketch keeps at most about ``3 * k`` values whatever the
+stream length. Merging concatenates the levels and compacts again, so
+sketches of disjoint buckets combine into the sketch of their union with the
+same guarantees.
+
+Error bounds for the default ``k = 200``:
+
+- a sketch that never compacted, i.e. that holds at most ``k`` values, is
+  exact;
+- otherwise the rank of a returned quantile differs from the requested rank
+  by at most about 1.65% of ``n`` with 99% confidence (about 1.33% for one
+  side only). The error is in rank, not value: ``p90`` lies between the
+  true ``p88.35`` and ``p91.65``.
+
+Sketches are serialised with ``to_dict`` into plain JSON.
+
+``HyperLogLog`` estimates the number of distinct values (Flajolet et al.,
+2007). Values are hashed to 64 bits with BLAKE2b, so estimates do not depend
+on the process. The first ``precision`` bits choose a register, which keeps
+the longest run of leading zeros seen in the remaining bits. Merging takes
+the register-wise maximum, so the union of buckets is exact up to the
+estimator's error. With the default precision of 12 (4096 one-byte
+registers) the relative standard error is ``1.04 / sqrt(4096)``, about
+1.6%; small counts use linear counting and are close to exact. Registers are
+stored zlib-compressed, which keeps sparse sketches to a few dozen bytes.
+"""
+
+import hashlib
+import math
+import random
+import zlib
+
+import numpy as np
+
+
+KLL_K = 200
+KLL_CAPACITY_RATIO = 2 / 3
+KLL_MIN_CAPACITY = 8
+# Normalised rank error of KLL_K at 99% confidence (two-sided).
+KLL_RANK_ERROR = 0.0165
+
+
+class KLLSketch:
+    """KLL quantile sketch over floats."""
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(KLL_MIN_CAPACITY, math.ceil(self.k * KLL_CAPACITY_RATIO ** depth))
+
+    def _bounds(self, low, high):
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update(self, value):
+        value = float(value)
+        self.levels[0].append(value)
+        self.n += 1
+        self._bounds(value, value)
+        self._compress()
+
+    def extend(self, values):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch and return it."""
+        if other.k != self.k:
+            raise ValueError('Cannot merge KLL sketches of different k')
+        if not other.n:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._bounds(other.min, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        # Lazy compaction: only when the sketch as a whole is over capacity,
+        # and then only the lowest level that is full.
+        while sum(map(len, self.levels)) > sum(map(self._capacity, range(len(self.levels)))):
+            level = next(
+                level for level in range(len(self.levels))
+                if len(self.levels[level]) >= self._capacity(level)
+            )
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            items = sorted(self.levels[level])
+            kept = [items.pop(random.randrange(len(items)))] if len(items) % 2 else []
+            self.levels[level + 1].extend(items[random.getrandbits(1)::2])
+            self.levels[level] = kept
+
+    def quantiles(self, fractions):
+        """Return the values at the ``fractions`` (0..1) of the rank, ``None`` when empty."""
+        if not self.n:
+            return [None] * len(fractions)
+        values = np.array([value for items in self.levels for value in items])
+        weights = np.array([1 << level for level, items in enumerate(self.levels) for _ in items])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        result = []
+        for fraction in fractions:
+            if fraction <= 0:
+                result.append(self.min)
+            elif fraction >= 1:
+                result.append(self.max)
+            else:
+                index = min(np.searchsorted(cumulative, fraction * cumulative[-1]), len(values) - 1)
+                result.append(float(values[index]))
+        return result
+
+    def quantile(self, fraction):
+        return self.quantiles([fraction])[0]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'min': self.min, 'max': self.max, 'levels': self.levels}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [list(items) for items in data['levels']] or [[]]
+        return sketch
+
+
+HLL_PRECISION = 12
+# Relative standard error of HLL_PRECISION.
+HLL_STANDARD_ERROR = round(1.04 / math.sqrt(1 << HLL_PRECISION), 4)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError('Register count does not match the precision')
+
+    @staticmethod
+    def _hash(value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def add(self, value):
+        hashed = self._hash(value)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Fold ``other`` into this counter and return it."""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLog counters of different precision')
+        merged = np.maximum(
+            np.frombuffer(self.registers, dtype=np.uint8),
+            np.frombuffer(other.registers, dtype=np.uint8),
+        )
+        self.registers = bytearray(merged.tobytes())
+        return self
+
+    def count(self):
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        zeros = int(np.count_nonzero(registers == 0))
+        if zeros == self.size:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / float(np.sum(np.exp2(-registers.astype(np.float64))))
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(precision=data[0], registers=zlib.decompress(data[1:]))
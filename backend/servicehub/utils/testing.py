@@ -0,0 +1,36 @@
+"""
+Test helpers for ServiceHub.
+"""
+
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def query_budget(max_queries, using='default'):
+    """
+    Fail when the wrapped block runs more than ``max_queries`` queries.
+    
+    Usage::
+    
+        with query_budget(4):
+            client.get('/api/v1/quotes/proposals/')
+    
+    The budget should not depend on the number of rows returned; seed more
+    than one page worth of objects so an N+1 regression shows up.
+    """
+    context = CaptureQueriesContext(connections[using])
+    with context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = '\n'.join(
+            f'{index}. {query["sql"]}'
+            for index, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(
+            f'Query budget exceeded: {executed} queries executed, budget is {max_queries}.\n'
+            f'{queries}'
+        )
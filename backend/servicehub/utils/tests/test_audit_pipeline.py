@@ -0,0 +1,100 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from servicehub.utils import audit_pipeline
+from servicehub.utils.models import AuditLog
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def xadd(self, stream, fields):
+        self._commands.append((stream, fields))
+
+    def execute(self):
+        if self._client.fail:
+            raise RedisConnectionError("redis is down")
+        for stream, fields in self._commands:
+            self._client.streams.setdefault(stream, []).append(
+                (f"{len(self._client.streams.get(stream, [])) + 1}-0".encode(), {
+                    key.encode(): value.encode() for key, value in fields.items()
+                })
+            )
+
+
+class _FakeRedis:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.streams = {}
+        self.acked = []
+        self.deleted = []
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def xack(self, stream, group, *ids):
+        self.acked.extend(ids)
+
+    def xdel(self, stream, *ids):
+        self.deleted.extend(ids)
+
+
+def _entry(object_id=1):
+    return audit_pipeline.build_entry(
+        action="update",
+        model_name="Client",
+        object_id=object_id,
+        old_values={"status": "active"},
+        new_values={"status": "inactive"},
+    )
+
+
+@pytest.mark.django_db
+def test_emit_writes_immediately_in_sync_mode(settings):
+    settings.AUDIT_LOG_MODE = "sync"
+
+    audit_pipeline.emit([_entry(1), _entry(2)])
+
+    assert AuditLog.objects.filter(model_name="Client").count() == 2
+
+
+@pytest.mark.django_db
+def test_emit_publishes_after_commit_in_stream_mode(settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.AUDIT_LOG_MODE = "stream"
+    client = _FakeRedis()
+    monkeypatch.setattr(audit_pipeline, "get_redis", lambda: client)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        audit_pipeline.emit([_entry(1), _entry(2)])
+        assert client.streams == {}
+
+    assert len(callbacks) == 1
+    assert len(client.streams[settings.AUDIT_LOG_STREAM]) == 2
+    assert not AuditLog.objects.exists()
+
+
+@pytest.mark.django_db
+def test_publish_falls_back_to_database(settings, monkeypatch):
+    monkeypatch.setattr(audit_pipeline, "get_redis", lambda: _FakeRedis(fail=True))
+
+    audit_pipeline.publish([_entry(1)])
+
+    assert AuditLog.objects.get().new_values == {"status": "inactive"}
+
+
+@pytest.mark.django_db
+def test_writer_flush_inserts_acknowledges_and_ignores_redelivery(settings, monkeypatch):
+    client = _FakeRedis()
+    monkeypatch.setattr(audit_pipeline, "get_redis", lambda: client)
+    audit_pipeline.publish([_entry(1), _entry(2)])
+    messages = client.streams[settings.AUDIT_LOG_STREAM]
+    writer = audit_pipeline.AuditStreamWriter(client=client, consumer="test")
+
+    assert writer.flush(messages) == 2
+    writer.flush(messages)
+
+    assert AuditLog.objects.count() == 2
+    assert client.acked == [b"1-0", b"2-0", b"1-0", b"2-0"]
+    assert client.deleted == client.acked
@@ -0,0 +1,63 @@
+import pytest
+
+from servicehub.apps.clients.models import Client
+from servicehub.utils.audit import diff_model, serialize_model, snapshot_model
+from servicehub.utils.models import get_tracked_fields
+
+
+def _create_client(**kwargs):
+    defaults = {
+        "name": "John Doe",
+        "email": "john@example.com",
+        "phone": "11999999999",
+        "document": "12345678901",
+    }
+    defaults.update(kwargs)
+    return Client.objects.create(**defaults)
+
+
+@pytest.mark.django_db
+def test_changes_are_diffed_against_loaded_values(django_assert_num_queries):
+    client = Client.objects.get(pk=_create_client().pk)
+    client.status = "inactive"
+    client.city = "Campinas"
+
+    with django_assert_num_queries(0):
+        old_values, new_values = client.get_changes()
+
+    assert old_values == {"status": "active", "city": ""}
+    assert new_values == {"status": "inactive", "city": "Campinas"}
+
+
+@pytest.mark.django_db
+def test_snapshot_is_refreshed_after_save():
+    client = Client.objects.get(pk=_create_client().pk)
+    snapshot = snapshot_model(client)
+    client.status = "blocked"
+    client.save()
+
+    assert client.get_changes() == ({}, {})
+    assert diff_model(client, snapshot) == ({"status": "active"}, {"status": "blocked"})
+
+
+@pytest.mark.django_db
+def test_new_instance_reports_only_new_values():
+    client = Client(name="Jane", email="jane@example.com", phone="1", document="2")
+
+    old_values, new_values = client.get_changes()
+
+    assert old_values == {}
+    assert new_values["name"] == "Jane"
+
+
+@pytest.mark.django_db
+def test_serialize_model_uses_cached_concrete_fields(user):
+    client = _create_client(assigned_to=user)
+
+    data = serialize_model(client)
+
+    assert "search_vector" not in data
+    assert "quotes" not in data
+    assert data["assigned_to"] == user.pk
+    assert data["last_contact"] is None
+    assert get_tracked_fields(Client) is get_tracked_fields(Client)
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from servicehub.apps.clients.models import Client
+from servicehub.utils import partitions
+from servicehub.utils.models import AuditLog
+
+
+def _entry(object_id, created_at, action='update'):
+    return {
+        'id': int(created_at.timestamp()),
+        'user': 'archivist',
+        'action': action,
+        'model_name': 'Client',
+        'object_id': str(object_id),
+        'old_values': {'name': 'Old'},
+        'new_values': {'name': 'New'},
+        'ip_address': None,
+        'user_agent': '',
+        'created_at': created_at,
+        'event_id': None,
+    }
+
+
+def test_build_partition_sql_moves_default_rows_before_attaching():
+    statements = partitions.build_partition_sql(AuditLog, date(2024, 12, 1))
+
+    assert statements[0] == 'CREATE TABLE servicehub_auditlog_p202412 (LIKE servicehub_auditlog INCLUDING DEFAULTS);'
+    assert 'DELETE FROM servicehub_auditlog_default' in statements[1]
+    assert statements[2].endswith(
+        "FOR VALUES FROM ('2024-12-01 00:00:00+00:00') TO ('2025-01-01 00:00:00+00:00');"
+    )
+
+
+def test_install_partitioning_is_noop_off_postgres():
+    sender = type('Sender', (), {'get_models': lambda self: [AuditLog]})()
+
+    partitions.install_partitioning(sender, using='default')
+
+
+def test_archive_reads_only_matching_blocks(settings, tmp_path, monkeypatch):
+    settings.PARTITION_ARCHIVE_DIR = str(tmp_path)
+    monkeypatch.setattr(partitions, 'ARCHIVE_BLOCK_ROWS', 2)
+    month = date(2023, 1, 1)
+    first = datetime(2023, 1, 5, tzinfo=dt_timezone.utc)
+    rows = [_entry(object_id, first + timedelta(days=offset)) for offset, object_id in enumerate([1, 2, 1, 1])]
+
+    index = partitions.write_archive(AuditLog, month, rows)
+    assert index['rows'] == 4
+    assert [block['rows'] for block in index['blocks']] == [2, 2]
+
+    logs = partitions.read_archive(AuditLog, first + timedelta(days=2), model_name='Client', object_id=1)
+    assert [log.created_at for log in logs] == [first + timedelta(days=3), first + timedelta(days=2)]
+    assert logs[0].new_values == {'name': 'New'}
+    assert partitions.read_archive(AuditLog, datetime(2023, 2, 1, tzinfo=dt_timezone.utc)) == []
+
+
+@pytest.mark.django_db
+def test_history_merges_archive_for_old_ranges(settings, tmp_path):
+    settings.PARTITION_ARCHIVE_DIR = str(tmp_path)
+    user = get_user_model().objects.create_user(username='historian', password='pass12345', role='admin')
+    client_obj = Client.objects.create(
+        name='Maria Silva', email='maria@example.com', phone='11999999999',
+        document='12345678901', created_by=user,
+    )
+    partitions.write_archive(AuditLog, date(2023, 1, 1), [
+        _entry(client_obj.pk, datetime(2023, 1, 10, tzinfo=dt_timezone.utc)),
+    ])
+    api = APIClient()
+    api.force_authenticate(user=user)
+    url = f'/api/v1/clients/{client_obj.pk}/history/'
+
+    recent = api.get(url)
+    full = api.get(url, {'start_date': '2023-01-01'})
+
+    assert len(full.data) == len(recent.data) + 1
+    assert full.data[-1]['action'] == 'Atualização'
+    assert api.get(url, {'start_date': '01/2023'}).status_code == 400
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+from servicehub import consumers
+from servicehub.utils import presence
+from servicehub.utils.presence import PresenceTracker
+
+
+class _FakeRedis:
+    """Sorted-set subset of the Redis client; pipelines run their commands on execute."""
+
+    def __init__(self):
+        self.sets = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                client.round_trips += 1
+                return [getattr(client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        for member, score in list(self.sets.get(key, {}).items()):
+            if score <= high:
+                del self.sets[key][member]
+
+    def expire(self, key, seconds):
+        return key in self.sets
+
+    def zcount(self, key, low, high):
+        low = float(low.lstrip("("))
+        return sum(score > low for score in self.sets.get(key, {}).values())
+
+
+@pytest.fixture
+def tracker(settings, monkeypatch):
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    tracker = PresenceTracker(client=_FakeRedis())
+    monkeypatch.setattr(presence, "get_presence", lambda: tracker)
+    monkeypatch.setattr(consumers, "get_presence", lambda: tracker)
+    return tracker
+
+
+def test_presence_counts_live_connections(tracker):
+    tracker.touch(1, "tab-a")
+    tracker.touch(1, "tab-b")
+    tracker.touch(2, "tab-c")
+    tracker.client.sets["presence:3"] = {"crashed": time.time() - 1}
+
+    tracker.leave(1, "tab-a")
+    tracker.client.round_trips = 0
+    assert presence.online_users([1, 2, 3, 4, 2]) == {1, 2}
+    assert tracker.client.round_trips == 1
+
+    tracker.leave(1, "tab-b")
+    assert presence.online_users([1, 2]) == {2}
+
+
+@pytest.mark.asyncio
+async def test_notification_socket_marks_user_online(tracker):
+    token = AccessToken()
+    token["user_id"] = 7
+    communicator = WebsocketCommunicator(
+        application, f"/ws/notifications/?token={token}", headers=[(b"origin", b"http://localhost")]
+    )
+    connected, _ = await communicator.connect()
+    assert connected
+    assert presence.online_users([7]) == {7}
+
+    await communicator.send_json_to({"type": "ping"})
+    assert (await communicator.receive_json_from())["type"] == "pong"
+    await communicator.disconnect()
+    assert presence.online_users([7]) == set()
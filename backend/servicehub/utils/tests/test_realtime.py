@@ -0,0 +1,108 @@
+import time
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from servicehub.apps.clients.models import Client
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils import realtime
+
+
+class _FakeChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+    def groups(self):
+        result = {}
+        for group, message in self.sent:
+            result.setdefault(group, []).append(message["type"])
+        return result
+
+
+@pytest.fixture
+def layer(monkeypatch):
+    layer = _FakeChannelLayer()
+    monkeypatch.setattr(realtime, "get_channel_layer", lambda: layer)
+    return layer
+
+
+def _change(model="quotes.Quote", object_id=1, old_status="sent", status="sent", **fields):
+    return {
+        "model": model, "id": object_id, "created": False, "deleted": False,
+        "old_status": old_status, "status": status, "owners": [7], "timestamp": "2024-01-01T10:00:00",
+        "changes": 1, "label": f"QT-{object_id}", "title": "Quote", "client": 3, "value": "10.00",
+        "assigned_to": 7, "old_assigned_to": 7, **fields,
+    }
+
+
+def test_coalesced_publisher_merges_bursts(layer):
+    publisher = realtime.EventPublisher(queue_size=100, window=0.2)
+    publisher.enqueue(_change(old_status="draft"))
+    for _ in range(49):
+        publisher.enqueue(_change())
+    publisher.enqueue(_change(model="clients.Client", object_id=3, old_status="active", status="active"))
+
+    deadline = time.monotonic() + 2
+    while publisher.stats()["batches"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert layer.groups() == {
+        "quotes_updates": ["quote.status_changed"],
+        "quotes_client_3": ["quote.status_changed"],
+        "quotes_assigned_to_7": ["quote.status_changed"],
+        "quotes_status_draft": ["quote.status_changed"],
+        "quotes_status_sent": ["quote.status_changed"],
+        "notifications_7": ["quote.update", "client.update"],
+        "activity_7": ["activity.log", "activity.log"],
+    }
+    status_changed = layer.sent[0][1]
+    assert (status_changed["old_status"], status_changed["new_status"]) == ("draft", "sent")
+    stats = publisher.stats()
+    assert (stats["enqueued"], stats["coalesced"], stats["sent"]) == (51, 49, 9)
+
+
+@pytest.mark.django_db
+def test_sync_mode_publishes_committed_changes(settings, layer, django_capture_on_commit_callbacks):
+    settings.REALTIME_EVENTS_MODE = "sync"
+    seller = get_user_model().objects.create_user(username="seller", password="testpass123")
+    with django_capture_on_commit_callbacks(execute=True):
+        client = Client.objects.create(
+            name="Client", email="client@example.com", phone="11999999999",
+            type="individual", document="12345678901", assigned_to=seller,
+        )
+        quote = Quote.objects.create(
+            client=client, title="Quote", subtotal=Decimal("10.00"), created_by=seller,
+        )
+    assert layer.groups() == {
+        f"notifications_{seller.pk}": ["client.update", "quote.update"],
+        f"activity_{seller.pk}": ["activity.log", "activity.log"],
+        "quotes_updates": ["quote.created"],
+        f"quotes_client_{client.pk}": ["quote.created"],
+        f"quotes_assigned_to_{seller.pk}": ["quote.created"],
+        "quotes_status_draft": ["quote.created"],
+    }
+
+    layer.sent.clear()
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        quote.status = "sent"
+        quote.save()
+    assert layer.sent == [] and len(callbacks) >= 1
+    for callback in callbacks:
+        callback()
+    assert ("quotes_updates", "quote.status_changed") in [(group, message["type"]) for group, message in layer.sent]
+
+
+def test_quote_events_reach_old_and_new_filter_groups():
+    change = _change(old_status="sent", status="approved", assigned_to=8, old_assigned_to=7)
+    groups = [group for group, message in realtime.build_messages(change) if group.startswith("quotes_")]
+    assert groups == [
+        "quotes_assigned_to_7", "quotes_assigned_to_8", "quotes_client_3",
+        "quotes_status_approved", "quotes_status_sent", "quotes_updates",
+    ]
+
+    merged = realtime.merge_changes(change, _change(status="rejected", assigned_to=9, old_assigned_to=8))
+    assert (merged["old_assigned_to"], merged["assigned_to"], merged["old_status"]) == (7, 9, "sent")
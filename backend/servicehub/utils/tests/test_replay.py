@@ -0,0 +1,138 @@
+import pytest
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+from servicehub import consumers
+from servicehub.utils import realtime
+from servicehub.utils.replay import ReplayBuffer
+
+
+class _FakeRedis:
+    """Counter and sorted-set subset of the Redis client; pipelines run their commands on execute."""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+        return Pipeline()
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        return key in self.values or key in self.sets
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    def _ordered(self, key):
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: item[1])
+
+    def zremrangebyrank(self, key, start, stop):
+        ordered = self._ordered(key)
+        stop = len(ordered) + stop if stop < 0 else stop
+        for member, _ in ordered[start:max(stop + 1, 0)]:
+            del self.sets[key][member]
+
+    def zrange(self, key, start, stop, withscores=False):
+        return self._ordered(key)[start:stop + 1]
+
+    def zrangebyscore(self, key, low, high):
+        low = float(low.lstrip("("))
+        return [member for member, score in self._ordered(key) if score > low]
+
+
+@pytest.fixture
+def replay_buffer(settings, monkeypatch):
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    settings.REALTIME_REPLAY_SIZE = 3
+    buffer = ReplayBuffer(client=_FakeRedis())
+    monkeypatch.setattr(realtime, "get_replay_buffer", lambda: buffer)
+    monkeypatch.setattr(consumers, "get_replay_buffer", lambda: buffer)
+    return buffer
+
+
+def _notification(number, timestamp="2024-01-01T10:00:00"):
+    return {
+        "type": "quote.update", "quote_id": number, "status": "sent", "message": f"ORC-{number}",
+        "timestamp": timestamp,
+    }
+
+
+def test_replay_buffer_keeps_the_last_messages(replay_buffer):
+    messages = realtime.sequence_messages([
+        ("notifications_7", _notification(1)), ("quotes_updates", {"type": "quote.updated"}),
+        ("notifications_7", _notification(2)), ("notifications_8", _notification(3)),
+    ])
+    assert [message.get("seq") for _, message in messages] == [1, None, 2, 1]
+
+    assert replay_buffer.since(7, 0) == (2, [{**_notification(1), "seq": 1}, {**_notification(2), "seq": 2}])
+    assert replay_buffer.since(7, 2) == (2, [])
+    assert replay_buffer.since(7, 5) == (2, None)
+
+    realtime.sequence_messages([("notifications_7", _notification(number)) for number in range(3, 6)])
+    assert [message["seq"] for message in replay_buffer.since(7, 2)[1]] == [3, 4, 5]
+    assert replay_buffer.since(7, 1) == (5, None)
+
+
+def _token(user_id):
+    token = AccessToken()
+    token["user_id"] = user_id
+    return str(token)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_the_gap_or_asks_for_resync(replay_buffer):
+    realtime.sequence_messages([("notifications_7", _notification(number)) for number in range(1, 6)])
+    origin = [(b"origin", b"http://localhost")]
+
+    communicator = WebsocketCommunicator(application, f"/ws/notifications/?token={_token(7)}&last_seq=3", headers=origin)
+    connected, _ = await communicator.connect()
+    assert connected
+    assert [(await communicator.receive_json_from())["seq"] for _ in range(2)] == [4, 5]
+    await communicator.disconnect()
+
+    communicator = WebsocketCommunicator(application, f"/ws/notifications/?token={_token(7)}&last_seq=1", headers=origin)
+    connected, _ = await communicator.connect()
+    assert connected
+    assert await communicator.receive_json_from() == {"type": "resync", "seq": 5}
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_live_notifications_skip_only_replayed_copies(replay_buffer):
+    stamped = realtime.sequence_messages([("notifications_7", _notification(number)) for number in range(1, 4)])
+    communicator = WebsocketCommunicator(
+        application, f"/ws/notifications/?token={_token(7)}&last_seq=2", headers=[(b"origin", b"http://localhost")]
+    )
+    connected, _ = await communicator.connect()
+    assert connected
+    assert (await communicator.receive_json_from())["seq"] == 3
+
+    layer = get_channel_layer()
+    # The live copy of the replayed message, one arriving out of order, and one after a counter reset.
+    for message in (stamped[2][1], stamped[1][1], {**_notification(9, "2024-01-02T08:00:00"), "seq": 3}):
+        await layer.group_send("notifications_7", message)
+    received = [await communicator.receive_json_from() for _ in range(2)]
+    assert [(message["seq"], message["quote_id"]) for message in received] == [(2, 2), (3, 9)]
+    assert await communicator.receive_nothing()
+    await communicator.disconnect()
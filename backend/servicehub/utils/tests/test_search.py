@@ -0,0 +1,51 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from servicehub.apps.clients.models import Client
+from servicehub.apps.quotes.models import Quote
+from servicehub.utils import search
+
+
+def test_build_prefix_query_strips_operators():
+    assert search.build_prefix_query("joão's & silva") == 'joão:* & s:* & silva:*'
+    assert search.build_prefix_query('!@#') is None
+
+
+def test_build_search_sql_watches_vector_and_related_columns():
+    document = search.get_search_document(Quote)
+
+    statements = search.build_search_sql(Quote, document)
+    trigger = next(sql for sql in statements if 'CREATE TRIGGER' in sql)
+
+    assert 'UPDATE OF title, client_id, search_vector ON quotes_quote' in trigger
+    assert any('(UPPER(quote_number::text)) gin_trgm_ops' in sql for sql in statements)
+    assert any("to_tsvector('portuguese_unaccent'" in sql for sql in statements)
+
+
+def test_install_search_triggers_is_noop_off_postgres():
+    sender = type('Sender', (), {'label': 'quotes', 'get_models': lambda self: [Quote]})()
+
+    # SQLite has no tsvector/pg_trgm support; the handler must not touch it.
+    search.install_search_triggers(sender, using='default')
+
+
+@pytest.mark.django_db
+def test_search_falls_back_to_icontains_with_rank_ordering():
+    user = get_user_model().objects.create_user(username='searcher', password='pass12345')
+    Client.objects.create(
+        name='Maria Silva', email='maria@example.com', phone='11999999999',
+        document='12345678901', created_by=user,
+    )
+    Client.objects.create(
+        name='João Souza', email='joao@example.com', phone='11988888888',
+        document='98765432101', created_by=user,
+    )
+    api_client = APIClient()
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get('/api/v1/clients/?search=silva&ordering=-search_rank')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [item['name'] for item in response.data['results']] == ['Maria Silva']
@@ -1,69 +1,108 @@
+import threading
 from datetime import datetime
-from types import SimpleNamespace
 
 import pytest
 
-from servicehub.utils import signals
+from servicehub.utils import identifiers, signals
 from servicehub.apps.quotes.models import Proposal, Quote
 from servicehub.apps.services.models import ServiceOrder
+from servicehub.utils.models import IdentifierSequence
 
 
-class _DummyQuerySet:
-    def __init__(self, existing, identifier):
-        self._existing = existing
-        self._identifier = identifier
+@pytest.fixture(autouse=True)
+def _freeze_today(monkeypatch):
+    monkeypatch.setattr(identifiers.timezone, "now", lambda: datetime(2024, 1, 30, 12, 0, 0))
 
-    def exists(self):
-        return self._identifier in self._existing
 
+def _make_allocator(monkeypatch, block_size=3):
+    allocator = identifiers.IdentifierAllocator(block_size=block_size)
+    reserved = []
 
-class _DummyManager:
-    def __init__(self, existing=None):
-        self._existing = existing or set()
+    def reserve_block(prefix, day, using):
+        first = 1 + sum(1 for key in reserved if key == (prefix, day)) * block_size
+        reserved.append((prefix, day))
+        return first
 
-    def filter(self, **kwargs):
-        identifier = next(iter(kwargs.values()))
-        return _DummyQuerySet(self._existing, identifier)
+    monkeypatch.setattr(allocator, "_reserve_block", reserve_block)
+    return allocator, reserved
 
 
-def _make_dummy_model(existing=None):
-    manager = _DummyManager(existing)
-    return SimpleNamespace(_default_manager=manager)
+def test_allocator_formats_value(monkeypatch):
+    allocator, _ = _make_allocator(monkeypatch)
 
+    assert allocator.generate("QT") == "QT-20240130-0001"
+    assert allocator.generate("QT") == "QT-20240130-0002"
 
-@pytest.fixture(autouse=True)
-def _freeze_today(monkeypatch):
-    monkeypatch.setattr(signals.timezone, "now", lambda: datetime(2024, 1, 30, 12, 0, 0))
 
+def test_allocator_restarts_counter_each_day(monkeypatch):
+    allocator, reserved = _make_allocator(monkeypatch)
+    allocator.generate("QT")
+    allocator.generate("QT")
+    monkeypatch.setattr(identifiers.timezone, "now", lambda: datetime(2024, 1, 31, 9, 0, 0))
+
+    assert allocator.generate("QT") == "QT-20240131-0001"
+    assert reserved == [("QT", "20240130"), ("QT", "20240131")]
+
+
+def test_allocator_reserves_one_block_per_block_size(monkeypatch):
+    allocator, reserved = _make_allocator(monkeypatch, block_size=3)
+
+    values = [allocator.next_value("QT", "20240130") for _ in range(7)]
+
+    assert values == [1, 2, 3, 4, 5, 6, 7]
+    assert len(reserved) == 3
 
-def test_generate_unique_identifier_formats_value(monkeypatch):
-    dummy_model = _make_dummy_model()
-    monkeypatch.setattr(signals.secrets, "randbelow", lambda upper: 42)
 
-    result = signals._generate_unique_identifier(dummy_model, "code", "QT")
+def test_allocator_keeps_prefixes_separate(monkeypatch):
+    allocator, reserved = _make_allocator(monkeypatch, block_size=3)
 
-    assert result == "QT-20240130-0042"
+    allocator.next_value("QT", "20240130")
+    allocator.next_value("SO", "20240130")
+    allocator.next_value("QT", "20240130")
 
+    assert [prefix for prefix, _ in reserved] == ["QT", "SO"]
 
-def test_generate_unique_identifier_skips_collisions(monkeypatch):
-    existing = {"QT-20240130-0001"}
-    dummy_model = _make_dummy_model(existing)
-    attempts = iter([1, 2])
-    monkeypatch.setattr(signals.secrets, "randbelow", lambda upper: next(attempts))
 
-    result = signals._generate_unique_identifier(dummy_model, "code", "QT")
+@pytest.mark.django_db
+def test_allocator_reserves_blocks_from_table():
+    first = identifiers.IdentifierAllocator(block_size=5)
+    second = identifiers.IdentifierAllocator(block_size=5)
 
-    assert result == "QT-20240130-0002"
+    values = [first.generate("QT"), second.generate("QT"), first.generate("QT")]
+
+    assert values == ["QT-20240130-0001", "QT-20240130-0006", "QT-20240130-0002"]
+    assert IdentifierSequence.objects.get(name="QT-20240130").last_value == 10
+
+
+def test_allocator_shares_one_counter_connection(monkeypatch):
+    class FakeConnection:
+        closed = False
+
+        def inc_thread_sharing(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    created = []
+    monkeypatch.setattr(
+        identifiers.connections, "create_connection", lambda using: created.append(FakeConnection()) or created[-1]
+    )
+    allocator = identifiers.IdentifierAllocator()
 
+    def reserve():
+        with allocator._lock:
+            allocator._counter_connection("default")
 
-def test_generate_unique_identifier_raises_when_exhausted(monkeypatch):
-    existing = {"QT-20240130-0001"}
-    dummy_model = _make_dummy_model(existing)
-    monkeypatch.setattr(signals.secrets, "randbelow", lambda upper: 1)
-    monkeypatch.setattr(signals, "MAX_IDENTIFIER_ATTEMPTS", 2)
+    threads = [threading.Thread(target=reserve) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    allocator.reset()
 
-    with pytest.raises(RuntimeError):
-        signals._generate_unique_identifier(dummy_model, "code", "QT")
+    assert len(created) == 1
+    assert created[0].closed
 
 
 @pytest.mark.parametrize(
@@ -76,7 +115,7 @@ def test_generate_unique_identifier_raises_when_exhausted(monkeypatch):
 )
 def test_generate_identifier_handlers_assign_when_missing(monkeypatch, handler, model, attr):
     sentinel = "TEST-ID"
-    monkeypatch.setattr(signals, "_generate_unique_identifier", lambda *args, **kwargs: sentinel)
+    monkeypatch.setattr(signals, "generate_identifier", lambda *args, **kwargs: sentinel)
     instance = model()
     setattr(instance, attr, "")
 
@@ -96,7 +135,7 @@ def test_generate_identifier_handlers_assign_when_missing(monkeypatch, handler,
 def test_generate_identifier_handlers_respect_existing(monkeypatch, handler, model, attr):
     monkeypatch.setattr(
         signals,
-        "_generate_unique_identifier",
+        "generate_identifier",
         lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("should not generate")),
     )
     instance = model()
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+
+from servicehub.utils.sketches import HLL_STANDARD_ERROR, KLL_RANK_ERROR, HyperLogLog, KLLSketch
+
+
+def _rank_error(values, estimate, fraction):
+    return abs(np.searchsorted(values, estimate, side='right') / len(values) - fraction)
+
+
+def test_small_sketch_is_exact():
+    sketch = KLLSketch()
+    sketch.extend(range(1, 101))
+
+    assert sketch.quantiles([0, 0.5, 0.9, 0.99, 1]) == [1, 50, 90, 99, 100]
+    assert len(sketch.levels) == 1
+
+
+def test_merged_sketches_stay_within_rank_error():
+    random.seed(7)
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(mean=7, sigma=1, size=60000)
+
+    merged = KLLSketch()
+    for chunk in np.array_split(values, 40):
+        part = KLLSketch()
+        part.extend(chunk)
+        merged.merge(KLLSketch.from_dict(part.to_dict()))
+
+    values.sort()
+    assert merged.n == len(values)
+    assert sum(len(items) for items in merged.levels) < 4 * merged.k
+    for fraction in (0.5, 0.9, 0.99):
+        assert _rank_error(values, merged.quantile(fraction), fraction) <= KLL_RANK_ERROR
+    assert merged.quantile(0) == values[0]
+    assert merged.quantile(1) == values[-1]
+
+
+def test_hyperloglog_counts_small_sets_exactly():
+    counter = HyperLogLog()
+    counter.update([1, 2, 3, 2, 1, 'client-4'])
+
+    assert counter.count() == 4
+    assert HyperLogLog().count() == 0
+    assert HyperLogLog.from_bytes(counter.to_bytes()).count() == 4
+
+
+def test_hyperloglog_merge_estimates_union():
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(range(0, 60000))
+    second.update(range(40000, 100000))
+
+    union = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+
+    assert abs(union.count() - 100000) / 100000 <= 3 * HLL_STANDARD_ERROR
+    assert abs(first.count() - 60000) / 60000 <= 3 * HLL_STANDARD_ERROR
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.asgi import application
+from servicehub.consumers import INVALID_FILTER_CLOSE_CODE, SLOW_CONSUMER_CLOSE_CODE, NotificationConsumer
+from servicehub.utils.websocket import get_token_user
+
+
+@pytest.fixture
+def channel_layers(settings):
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+def _token(user_id=7, role="manager"):
+    token = AccessToken()
+    token["user_id"] = user_id
+    token["role"] = role
+    return str(token)
+
+
+@pytest.mark.django_db
+def test_token_user_is_built_from_claims_only(django_assert_num_queries):
+    with django_assert_num_queries(0):
+        user = get_token_user({"query_string": f"token={_token()}".encode(), "headers": []})
+    assert (user.is_authenticated, user.id, user.role) == (True, 7, "manager")
+
+    header = [(b"authorization", f"Bearer {_token(8)}".encode())]
+    assert get_token_user({"query_string": b"", "headers": header}).id == 8
+    assert not get_token_user({"query_string": b"token=invalid", "headers": []}).is_authenticated
+    assert not get_token_user({"query_string": b"", "headers": []}).is_authenticated
+
+
+@pytest.mark.asyncio
+async def test_notifications_route_requires_a_token(channel_layers):
+    communicator = WebsocketCommunicator(application, "/ws/notifications/", headers=[(b"origin", b"http://localhost")])
+    connected, _ = await communicator.connect()
+    assert not connected
+
+    communicator = WebsocketCommunicator(
+        application, f"/ws/notifications/?token={_token()}", headers=[(b"origin", b"http://localhost")]
+    )
+    connected, _ = await communicator.connect()
+    assert connected
+    await get_channel_layer().group_send("notifications_7", {
+        "type": "notification.message", "title": "Novo Orçamento", "message": "ORC-1",
+    })
+    assert (await communicator.receive_json_from())["title"] == "Novo Orçamento"
+    await communicator.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_quote_subscriptions_join_filter_groups(channel_layers):
+    origin = [(b"origin", b"http://localhost")]
+    communicator = WebsocketCommunicator(application, f"/ws/quotes/?token={_token()}&status=bogus", headers=origin)
+    connected, code = await communicator.connect()
+    assert (connected, code) == (False, INVALID_FILTER_CLOSE_CODE)
+
+    communicator = WebsocketCommunicator(
+        application, f"/ws/quotes/?token={_token()}&status=sent,approved&client=3", headers=origin
+    )
+    connected, _ = await communicator.connect()
+    assert connected
+    seller = WebsocketCommunicator(application, f"/ws/quotes/?token={_token(8, 'salesperson')}", headers=origin)
+    connected, _ = await seller.connect()
+    assert connected
+
+    layer = get_channel_layer()
+    assert set(layer.groups) == {"quotes_client_3", "quotes_assigned_to_8"}
+    event = {
+        "quote_id": 1, "client": 3, "assigned_to": 8, "old_assigned_to": 8, "value": "10.00",
+        "timestamp": "2024-01-01T10:00:00",
+    }
+    for group in ("quotes_client_3", "quotes_assigned_to_8"):
+        await layer.group_send(group, {**event, "type": "quote.updated", "action": "updated",
+                                       "status": "draft", "old_status": "draft"})
+        await layer.group_send(group, {**event, "type": "quote.status_changed", "status": "sent",
+                                       "old_status": "draft", "new_status": "sent"})
+
+    assert (await communicator.receive_json_from())["type"] == "quote_status_changed"
+    assert await communicator.receive_nothing()
+    assert [(await seller.receive_json_from())["type"] for _ in range(2)] == ["quote_updated", "quote_status_changed"]
+    await communicator.disconnect()
+    await seller.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_full_send_queue_drops_oldest_frames(settings):
+    settings.WEBSOCKET_SEND_QUEUE_SIZE = 2
+    settings.WEBSOCKET_OVERFLOW = "drop"
+    consumer = NotificationConsumer()
+    consumer.channel_name = "test!channel"
+    sent, release = [], asyncio.Event()
+
+    async def slow_send(message):
+        await release.wait()
+        sent.append(message)
+
+    consumer.base_send = slow_send
+    for index in range(5):
+        await consumer.send(text_data=str(index))
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.sleep(0.01)
+    assert [message.get("text") for message in sent] == ["0", "3", "4", json.dumps({"type": "dropped", "count": 2})]
+    consumer.writer.cancel()
+    await asyncio.gather(consumer.writer, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_full_send_queue_closes_in_close_mode(settings):
+    settings.WEBSOCKET_SEND_QUEUE_SIZE = 1
+    settings.WEBSOCKET_OVERFLOW = "close"
+    consumer = NotificationConsumer()
+    consumer.channel_name = "test!channel"
+    sent, release = [], asyncio.Event()
+
+    async def slow_send(message):
+        if message["type"] == "websocket.send":
+            await release.wait()
+        sent.append(message)
+
+    consumer.base_send = slow_send
+    for index in range(3):
+        await consumer.send(text_data=str(index))
+        await asyncio.sleep(0)
+    assert sent == [{"type": "websocket.close", "code": SLOW_CONSUMER_CLOSE_CODE}]
+    consumer.writer.cancel()
+    await asyncio.gather(consumer.writer, return_exceptions=True)
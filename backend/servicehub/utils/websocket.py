@@ -0,0 +1,71 @@
+"""
+Stateless JWT authentication for WebSocket connections.
+
+``JWTAuthMiddleware`` reads a SimpleJWT access token from the ``token`` query
+parameter (browsers cannot set headers on a WebSocket handshake) or from an
+``Authorization: Bearer`` header. It validates the signature and expiry once,
+at the handshake, and puts a ``TokenAuthUser`` built from the claims into
+``scope['user']``. The user is never loaded from the database, neither at
+connect nor for later frames. Tokens carry ``username`` and ``role`` claims
+(see ``AuthTokenObtainPairSerializer``). A missing or invalid token leaves an
+``AnonymousUser``, which the consumers reject.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class TokenAuthUser(TokenUser):
+    """``TokenUser`` exposing the ``role`` claim and an integer ``id``."""
+
+    @property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def role(self):
+        return self.token.get('role', 'salesperson')
+
+
+def get_raw_token(scope):
+    """Return the access token of a handshake, or ``None``."""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            parts = value.decode().split()
+            if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+                return parts[1]
+    return None
+
+
+def get_token_user(scope):
+    raw_token = get_raw_token(scope)
+    if raw_token is None:
+        return AnonymousUser()
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+    if api_settings.USER_ID_CLAIM not in token:
+        return AnonymousUser()
+    return TokenAuthUser(token)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Populate ``scope['user']`` from a SimpleJWT access token."""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope, user=get_token_user(scope))
+        return await super().__call__(scope, receive, send)
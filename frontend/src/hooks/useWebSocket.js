@@ -9,11 +9,23 @@ const useWebSocket = (url, onMessage, onError) => {
   const reconnectAttempts = useRef(0);
   const maxReconnectAttempts = 5;
   const reconnectDelay = useRef(1000);
+  // Last notification sequence number seen; sent as ?last_seq= to replay the gap.
+  const lastSeq = useRef(null);
+  // Heartbeat keeping the user's presence alive (the server's PRESENCE_TTL is 60 s).
+  const heartbeat = useRef(null);
+  const heartbeatInterval = 25000;
 
   const connect = useCallback(() => {
     try {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-      const wsUrl = `${protocol}//${window.location.host}${url}`;
+      // Browsers cannot set headers on the handshake; the server reads ?token=.
+      const token = localStorage.getItem('access_token');
+      const separator = url.includes('?') ? '&' : '?';
+      const params = new URLSearchParams();
+      if (token) params.set('token', token);
+      if (lastSeq.current !== null) params.set('last_seq', lastSeq.current);
+      const query = params.toString() ? `${separator}${params}` : '';
+      const wsUrl = `${protocol}//${window.location.host}${url}${query}`;
       
       ws.current = new WebSocket(wsUrl);
 
@@ -21,10 +33,20 @@ const useWebSocket = (url, onMessage, onError) => {
         console.log('WebSocket connected');
         reconnectAttempts.current = 0;
         reconnectDelay.current = 1000;
+        clearInterval(heartbeat.current);
+        heartbeat.current = setInterval(() => {
+          if (ws.current && ws.current.readyState === WebSocket.OPEN) {
+            ws.current.send(JSON.stringify({ type: 'ping' }));
+          }
+        }, heartbeatInterval);
       };
 
       ws.current.onmessage = (event) => {
         const data = JSON.parse(event.data);
+        // "resync" means missed messages expired: the handler should reload from the API.
+        if (typeof data.seq === 'number') {
+          lastSeq.current = data.seq;
+        }
         if (onMessage) {
           onMessage(data);
         }
@@ -39,6 +61,7 @@ const useWebSocket = (url, onMessage, onError) => {
 
       ws.current.onclose = () => {
         console.log('WebSocket disconnected');
+        clearInterval(heartbeat.current);
         
         // Attempt to reconnect
         if (reconnectAttempts.current < maxReconnectAttempts) {
@@ -60,6 +83,7 @@ const useWebSocket = (url, onMessage, onError) => {
     connect();
 
     return () => {
+      clearInterval(heartbeat.current);
       if (ws.current && ws.current.readyState === WebSocket.OPEN) {
         ws.current.close();
       }
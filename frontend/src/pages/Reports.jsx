@@ -75,19 +75,29 @@ const Reports = () => {
 
   const exportReport = async () => {
     try {
-      const response = await apiService.get('/analytics/reports/export/', {
-        params: {
-          start_date: dateRange.startDate,
-          end_date: dateRange.endDate,
-          format: 'pdf',
-        },
+      // The report is built in the background; poll the job until the file is ready.
+      let { data: report } = await apiService.post('/analytics/reports/export/', {
+        report_type: 'sales',
+        start_date: dateRange.startDate,
+        end_date: dateRange.endDate,
+        format: 'xlsx',
+      });
+      while (report.status === 'pending' || report.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        ({ data: report } = await apiService.get(`/analytics/reports/${report.id}/`));
+      }
+      if (report.status !== 'completed') {
+        throw new Error(report.error || 'Report generation failed');
+      }
+
+      const response = await apiService.get(`/analytics/reports/${report.id}/download/`, {
         responseType: 'blob',
       });
 
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement('a');
       link.href = url;
-      link.setAttribute('download', `report_${new Date().toISOString().split('T')[0]}.pdf`);
+      link.setAttribute('download', `report_${new Date().toISOString().split('T')[0]}.xlsx`);
       document.body.appendChild(link);
       link.click();
     } catch (error) {
@@ -120,7 +130,7 @@ const Reports = () => {
             startIcon={<DownloadIcon />}
             onClick={exportReport}
           >
-            Exportar PDF
+            Exportar XLSX
           </Button>
         </Box>
 